@@ -0,0 +1,63 @@
+'''
+    Benchmark of the parallel optimization and code generation of a
+    program (tonyc.py -j N, see tony/parallel.py):
+
+        $ python3 benchmarks/parallel.py [--jobs N] [--functions N] [--statements N] [-O N]
+
+    The statistics printed by -j compare the CPU time of the workers with
+    the wall time of the step, which says how busy the workers were but
+    not how much faster the step got. This compiles the same generated
+    program (the one of scanner.py) from the AST to the object code with
+    one job and with --jobs jobs, and reports the best wall time of
+    --repeat runs of each and the speedup.
+'''
+
+import os
+import gc
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tony import new_lexer, new_parser, SymbolTable, emit_object, parallel_emit
+
+from scanner import generate
+
+def compile_program(source, level, jobs):
+    ''' The wall time from the checked AST to the object code '''
+    ast = new_parser().parse(source, lexer=new_lexer())
+    ast.sem(SymbolTable())
+    gc.collect()
+
+    start = time.perf_counter()
+    module = ast.codegen(opt_level=level, jobs=jobs)
+
+    if jobs > 1:
+        parallel_emit(module, jobs)
+    else:
+        emit_object(module)
+
+    return time.perf_counter() - start
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark of tonyc.py -j N')
+    argparser.add_argument('--jobs', type=int, default=max(os.cpu_count(), 2))
+    argparser.add_argument('--functions', type=int, default=16)
+    argparser.add_argument('--statements', type=int, default=500, help='statements per function')
+    argparser.add_argument('-O', type=int, default=2, dest='level', help='optimization level')
+    argparser.add_argument('--repeat', type=int, default=3)
+    args = argparser.parse_args()
+
+    source = generate(args.functions, args.statements)
+    print(f'{args.functions} functions of {args.statements} statements at -O{args.level}, '
+          f'{os.cpu_count()} CPUs')
+
+    serial   = min(compile_program(source, args.level, 1) for _ in range(args.repeat))
+    parallel = min(compile_program(source, args.level, args.jobs) for _ in range(args.repeat))
+
+    print(f'{"-j 1":<8} {serial:>8.2f} s')
+    print(f'{f"-j {args.jobs}":<8} {parallel:>8.2f} s  speedup {serial / parallel:.2f}')
+
+if __name__ == '__main__':
+    main()
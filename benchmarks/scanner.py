@@ -0,0 +1,104 @@
+'''
+    Benchmark of the lexer (tony/lexer.py) on a generated program of a few
+    megabytes:
+
+        $ python3 benchmarks/scanner.py [--functions N] [--statements N] [--parse]
+
+    It reports the best of --repeat runs and the peak memory (tracemalloc)
+    of scanning the program to a list of tokens with the PLY lexer that
+    the Scanner replaced (ply_lexer.py), to a list of Tokens and to
+    TokenArrays (Scanner.arrays), and with --parse of parsing it through
+    the Scanner and through an ArrayLexer. The program is a main with a few long
+    nested functions, so that its AST is not deeper than Python allows.
+'''
+
+import os
+import gc
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tony import new_lexer, new_parser, ArrayLexer
+
+import ply_lexer
+
+STATEMENTS = [
+    '    x := x + {i}',
+    '    y := y * 3 - x mod 7 % the remainder',
+    '    if x > y and not (x = y): x := x - y elsif x <> y: skip end',
+    '    y := y + x / 5',
+    '    if y >= 1000: puts("y is big") end',
+    '    <* y <= 0 *> t := {i} # t',
+]
+
+def generate(functions, statements):
+    ''' The source of the program, with the given numbers of functions and statements in each '''
+    lines = ['def main():']
+
+    for f in range(functions):
+        lines += [f'  def int f{f}(int a):', '    int x, y', '    list[int] t', '    x := a', '    y := 0']
+        lines += [STATEMENTS[i % len(STATEMENTS)].format(i=i) for i in range(statements)]
+        lines += ['    return x + y', '  end']
+
+    lines += ['  int s', '  s := 0']
+    lines += [f'  s := s + f{f}(s mod 13)' for f in range(functions)]
+    lines += ['  puti(s)', 'end']
+
+    return '\n'.join(lines) + '\n'
+
+def measure(name, run, repeat, count=None):
+    ''' Prints the best time of repeat runs and the peak memory of one more '''
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    rate = f'{count(result) / best / 1e6:>6.2f} M tokens/s' if count != None else ' ' * 17
+    print(f'{name:<18} {best:>8.2f} s  {rate}  peak {peak / 2**20:>8.1f} MiB')
+
+def scan_ply(source):
+    lexer = ply_lexer.lexer
+    lexer.lineno = 1
+    lexer.begin('INITIAL')
+    lexer.input(source)
+    return list(iter(lexer.token, None))
+
+def scan_tokens(source):
+    lexer = new_lexer()
+    lexer.input(source)
+    return list(lexer)
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark of the Tony lexer')
+    argparser.add_argument('--functions', type=int, default=8)
+    argparser.add_argument('--statements', type=int, default=12500, help='statements per function')
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--parse', action='store_true', help='also parse through the Scanner and an ArrayLexer')
+    args = argparser.parse_args()
+
+    source = generate(args.functions, args.statements)
+    print(f'{len(source) / 2**20:.1f} MiB of source, {args.functions} functions of {args.statements} statements')
+
+    measure('PLY lexer', lambda: scan_ply(source), args.repeat, len)
+    measure('Token list', lambda: scan_tokens(source), args.repeat, len)
+    measure('TokenArrays', lambda: new_lexer().arrays(source), args.repeat, len)
+
+    if args.parse:
+        measure('parse (Scanner)', lambda: new_parser().parse(source, lexer=new_lexer()), args.repeat)
+        measure('parse (arrays)', lambda: new_parser().parse(lexer=ArrayLexer(new_lexer().arrays(source))), args.repeat)
+
+if __name__ == '__main__':
+    main()
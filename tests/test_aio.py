@@ -0,0 +1,88 @@
+import os
+import asyncio
+import pytest
+from context import *
+
+SUBMISSIONS = 200
+
+LOOP = 'def main(): for skip; true; skip: puts("x") end end'
+
+def running(executable):
+    ''' The processes that run the given executable '''
+    pids = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            if os.readlink(f'/proc/{pid}/exe') == executable:
+                pids.append(pid)
+        except OSError:
+            pass
+    return pids
+
+@pytest.mark.aio
+def test_compile_and_run(tmp_path):
+    source = readFile('helloworld.tony')
+    with open(TEST_INPUTS + 'helloworld/output_1.txt', 'rb') as f:
+        expected = f.read()
+
+    async def submit(compiler, i):
+        executable = str(tmp_path / f'helloworld_{i}.out')
+        result = await compiler.compile(source, executable)
+        assert result['ok'] and result['executable'] == executable and 'link' in result['timings']
+
+        return await compiler.run(executable, timeout=10)
+
+    async def main():
+        compiler = AsyncCompiler(concurrency=8)
+        runs = await asyncio.gather(*[submit(compiler, i) for i in range(SUBMISSIONS)])
+
+        # every slot of the semaphore was given back
+        assert compiler.semaphore._value == 8
+        return runs
+
+    for run in asyncio.run(main()):
+        assert (run['stdout'], run['timed_out']) == (expected, False)
+
+@pytest.mark.aio
+def test_compile_errors():
+    async def main():
+        return await compile_async('def main(): x := 1 end', '/nonexistent/a.out')
+
+    result = asyncio.run(main())
+    assert not result['ok'] and result['diagnostics'] == ['Undefined variable x.']
+    assert result['executable'] == None
+
+@pytest.mark.aio
+def test_timeout_and_cancellation(tmp_path):
+    executable = str(tmp_path / 'loop.out')
+
+    async def main():
+        result = await compile_async(LOOP, executable, optimization=0)
+        assert result['ok']
+
+        run = await run_async(executable, timeout=0.2)
+        assert run['timed_out'] and run['returncode'] == -9 and run['stdout'].startswith(b'x')
+
+        task = asyncio.create_task(run_async(executable))
+        await asyncio.sleep(0.2)
+        assert running(executable) != []
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert running(executable) == []
+
+@pytest.mark.aio
+def test_compiler_outside_loop():
+    # made before any event loop runs, and used by two of them
+    compiler = AsyncCompiler(concurrency=1)
+    source = readFile('helloworld.tony')
+
+    async def main():
+        results = await asyncio.gather(*[compiler.compile(source) for _ in range(3)])
+        assert all(result['ok'] for result in results)
+        assert compiler.semaphore._value == 1
+
+    asyncio.run(main())
+    asyncio.run(main())
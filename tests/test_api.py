@@ -0,0 +1,55 @@
+import os
+import pytest
+import subprocess
+from context import *
+
+@pytest.mark.api
+def test_compile_source(tmp_path):
+    before = set(os.listdir('.'))
+
+    source = readFile('quicksort.tony')
+    executable = str(tmp_path / 'quicksort.out')
+    result = compile_source(source, optimization=2, ast=True, ir=True, optimized_ir=True, executable=executable)
+
+    assert result['ok'] and result['diagnostics'] == []
+    assert result['ast'] == str(parser.parse(source, lexer=lexer.clone()))
+    assert 'define' in result['ir'] and len(result['optimized_ir']) < len(result['ir'])
+    assert result['object_code'][:4] == b'\x7fELF'
+    assert result['executable'] == executable
+    assert ['lex', 'parse', 'sem', 'codegen', 'ir-parse', 'optimize', 'emit', 'link'] == list(result['timings'])
+
+    output = subprocess.run([executable], stdout=subprocess.PIPE).stdout
+    with open(TEST_INPUTS + 'quicksort/output_1.txt', 'rb') as f:
+        assert output == f.read()
+
+    # nothing was written to the working directory
+    assert set(os.listdir('.')) == before
+
+@pytest.mark.api
+def test_compile_source_outputs():
+    with open(CORRECT_PROGRAMS + 'helloworld.tony', 'rb') as f:
+        source = f.read()
+
+    result = compile_source(source, object_code=False)
+    assert result['ok'] and result['object_code'] == None and result['ir'] == None
+
+    # bytes are decoded like the files of tonyc.py
+    result = compile_source(source, ir=True, object_code=False)
+    assert 'Hello world!\\0A' in result['ir']
+    assert result['ir'] == compile_source(readFile('helloworld.tony'), ir=True)['ir']
+
+@pytest.mark.api
+@pytest.mark.parametrize('source, diagnostic', [
+    ('def main(): x := 1 end', 'Undefined variable x.'),
+    ('def main(): $ end', "Illegal character '$' in line 1"),
+    ('def main(): skip', 'Syntax error, unexpected end of input'),
+])
+def test_compile_source_errors(capsys, source, diagnostic):
+    result = compile_source(source)
+
+    assert not result['ok']
+    assert any(d.startswith(diagnostic) for d in result['diagnostics'])
+    assert result['object_code'] == None and 'parse' in result['timings']
+
+    # the errors are only reported in the result
+    assert capsys.readouterr().out == ''
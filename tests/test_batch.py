@@ -0,0 +1,54 @@
+import os
+import pytest
+import tempfile
+import subprocess
+from context import *
+
+@pytest.mark.batch
+def test_collect_sources():
+    sources = collect_sources([CORRECT_PROGRAMS, SEMANTICS_TESTS + 'program_w_params.tony'])
+
+    assert CORRECT_PROGRAMS + 'hanoi.tony' in sources
+    assert sources[-1] == SEMANTICS_TESTS + 'program_w_params.tony'
+    assert all(s.endswith('.tony') for s in sources)
+
+@pytest.mark.batch
+def test_executable_name():
+    assert executable_name('progs/hanoi.tony') == os.path.abspath('progs/hanoi.out')
+    assert executable_name('progs/hanoi.tony', 'out') == os.path.abspath('out/hanoi.out')
+
+@pytest.mark.batch
+@pytest.mark.end2end
+def test_batch_compilation():
+    output_dir = tempfile.mkdtemp()
+    programs = ['helloworld', 'bubblesort', 'quicksort', 'scopes', 'function_call']
+    sources = [CORRECT_PROGRAMS + f'{p}.tony' for p in programs] +\
+              [SEMANTICS_TESTS + 'program_w_return_type.tony']
+
+    results = compile_batch(sources, jobs=3, output_dir=output_dir)
+
+    assert [r[0] for r in results] == sources
+    assert [r[1] for r in results] == [True] * len(programs) + [False]
+    assert len(results[-1][2]) == 1
+
+    for p in programs:
+        result = subprocess.run(os.path.join(output_dir, f'{p}.out'), stdout=subprocess.PIPE)
+
+        with open(TEST_INPUTS + f'{p}/output_1.txt', 'r') as f:
+            expected_output = f.read()
+
+        assert result.stdout.decode("utf-8") == expected_output
+
+    # failed compilations leave no executable behind
+    assert not os.path.exists(os.path.join(output_dir, 'program_w_return_type.out'))
+
+@pytest.mark.batch
+def test_duplicate_executables(tmp_path):
+    sources = [str(tmp_path / d / 'prog.tony') for d in ['a', 'b']]
+
+    assert executable_names(sources) == [os.path.abspath(s[:-len('tony')] + 'out') for s in sources]
+
+    with pytest.raises(Exception, match='would both be compiled to'):
+        compile_batch(sources, jobs=1, output_dir=str(tmp_path / 'out'))
+
+    assert not os.path.exists(tmp_path / 'out')
@@ -0,0 +1,154 @@
+import os
+import sys
+import pytest
+import tempfile
+import subprocess
+from context import *
+
+def generate_ir(input):
+    ast = parser.parse(input, lexer=lexer)
+    ast.sem(SymbolTable())
+    return str(ast.codegen(opt_level=3))
+
+@pytest.mark.cache
+def test_deterministic_ir():
+    # dfs.tony has nested functions with several hidden parameters
+    input = readFile('dfs.tony')
+
+    assert generate_ir(input) == generate_ir(input)
+
+@pytest.mark.cache
+def test_deterministic_ir_across_processes():
+    outputs = set()
+
+    for _ in range(3):
+        result = subprocess.run(
+            f'{sys.executable} tonyc.py -i < {CORRECT_PROGRAMS}scopes.tony',
+            shell=True, stdout=subprocess.PIPE
+        )
+        outputs.add(result.stdout)
+
+    assert len(outputs) == 1
+
+@pytest.mark.cache
+def test_cache_key():
+    cache = CompilationCache(tempfile.mkdtemp())
+    input = readFile('hanoi.tony')
+
+    assert cache.key(input, 1) == cache.key(input, 1)
+    assert cache.key(input, 1) != cache.key(input, 3)
+    assert cache.key(input, 1) != cache.key(input + '\n', 1)
+
+@pytest.mark.cache
+def test_cache_hits_and_misses():
+    cache = CompilationCache(tempfile.mkdtemp())
+    key = cache.key(readFile('hanoi.tony'), 1)
+
+    assert cache.lookup(key, 'ir') == None
+
+    cache.store(key, ir='; some ir', object_code=b'\x7fELF')
+
+    with open(cache.lookup(key, 'ir'), 'r') as f:
+        assert f.read() == '; some ir'
+
+    assert cache.lookup(key, 'executable') == None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['entries'] == 1
+
+@pytest.mark.cache
+def test_cache_lru_eviction():
+    cache = CompilationCache(tempfile.mkdtemp(), max_size=2500)
+    keys = [cache.key(str(i), 1) for i in range(3)]
+
+    cache.store(keys[0], object_code=bytes(1000))
+    os.utime(os.path.join(cache.entries, keys[0]), (0, 0))
+    cache.store(keys[1], object_code=bytes(1000))
+    os.utime(os.path.join(cache.entries, keys[1]), (1, 1))
+
+    assert cache.lookup(keys[0], 'object') != None # keys[1] is now the oldest
+
+    cache.store(keys[2], object_code=bytes(1000))
+
+    assert cache.lookup(keys[1], 'object') == None
+    assert cache.lookup(keys[0], 'object') != None
+    assert cache.lookup(keys[2], 'object') != None
+    assert cache.stats()['evictions'] == 1
+
+@pytest.mark.cache
+@pytest.mark.end2end
+def test_cached_executable():
+    cache = CompilationCache(tempfile.mkdtemp())
+
+    for hits in range(2):
+        compile(CORRECT_PROGRAMS + 'helloworld.tony', testing=True, cache=cache)
+        assert cache.stats()['hits'] == hits
+
+        result = subprocess.run('./a.out', shell=True, stdout=subprocess.PIPE)
+
+        with open(TEST_INPUTS + 'helloworld/output_1.txt', 'r') as f:
+            expected_output = f.read()
+
+        assert result.stdout.decode("utf-8") == expected_output
+
+        os.remove('a.out')
+
+@pytest.mark.cache
+def test_failed_link_not_cached(tmp_path, monkeypatch, capsys):
+    cache = CompilationCache(tempfile.mkdtemp())
+    executable = tmp_path / 'prog.out'
+    executable.write_text('stale')
+
+    tonyc = sys.modules['tonyc']
+    monkeypatch.setattr(tonyc, 'link_objects', lambda objects, executable, show_commands: False)
+
+    compile(CORRECT_PROGRAMS + 'helloworld.tony', exec_name=str(executable), cache=cache)
+
+    assert f'Linking {executable} failed' in capsys.readouterr().out
+    assert executable.read_text() == 'stale'
+
+    key = cache.key(readFile('helloworld.tony'), 1, [target_description(), ''])
+    assert cache.lookup(key, 'executable') == None
+
+@pytest.mark.cache
+def test_cache_key_compiler_sources(monkeypatch):
+    cache = CompilationCache(tempfile.mkdtemp())
+    input = readFile('hanoi.tony')
+    key = cache.key(input, 1)
+
+    assert os.path.abspath('tonyc.py') in compiler_sources()
+    assert os.path.abspath('tony/cache.py') in compiler_sources()
+
+    # another version of the compiler
+    monkeypatch.setattr(sys.modules['tony.cache'], '_compiler_digest', 'changed')
+    assert cache.key(input, 1) != key
+
+@pytest.mark.cache
+def test_store_keeps_artifacts():
+    cache = CompilationCache(tempfile.mkdtemp())
+    key = cache.key(readFile('hanoi.tony'), 1)
+
+    cache.store(key, ir='; some ir')
+    cache.store(key, object_code=b'\x7fELF')
+    cache.store(key, ir='; other ir')
+
+    with open(cache.lookup(key, 'ir'), 'r') as f:
+        assert f.read() == '; other ir'
+
+    with open(cache.lookup(key, 'object'), 'rb') as f:
+        assert f.read() == b'\x7fELF'
+
+@pytest.mark.cache
+def test_evicted_before_copy(tmp_path, monkeypatch):
+    cache = CompilationCache(tempfile.mkdtemp())
+    executable = tmp_path / 'helloworld.out'
+
+    # the entry is gone by the time the executable is copied
+    monkeypatch.setattr(cache, 'lookup', lambda key, artifact='executable': str(tmp_path / 'evicted'))
+    compile(CORRECT_PROGRAMS + 'helloworld.tony', exec_name=str(executable), cache=cache)
+
+    output = subprocess.run([str(executable)], stdout=subprocess.PIPE).stdout
+    with open(TEST_INPUTS + 'helloworld/output_1.txt', 'rb') as f:
+        assert output == f.read()
@@ -1,7 +1,8 @@
 import os
+import sys
 import pytest
 import subprocess
-from context import compile, CORRECT_PROGRAMS, TEST_INPUTS
+from context import compile, binding, write_ir, CORRECT_PROGRAMS, TEST_INPUTS
 
 @pytest.mark.end2end
 def test_array_addition():
@@ -238,3 +239,125 @@ def test_string_reverse():
     assert result.stdout.decode("utf-8") == expected_output
 
     os.remove('a.out')
+
+@pytest.mark.end2end
+def test_in_process_emission():
+    compile(CORRECT_PROGRAMS + 'primes.tony', testing=True, in_process=True)
+
+    # no intermediate files are written unless asked for
+    assert not os.path.exists('a.ll')
+    assert not os.path.exists('a.s')
+
+    for i in range(1,4):
+        output_file = TEST_INPUTS + f'primes/output_{i}.txt'
+        input_file  = TEST_INPUTS + f'primes/input_{i}.txt'
+
+        result = subprocess.run(f'./a.out < {input_file}', shell=True, stdout=subprocess.PIPE)
+
+        with open(output_file, 'r') as f:
+            expected_output = f.read()
+
+        assert result.stdout.decode("utf-8") == expected_output
+
+    os.remove('a.out')
+
+@pytest.mark.end2end
+def test_in_process_save_temps():
+    compile(CORRECT_PROGRAMS + 'helloworld.tony', testing=True,
+            in_process=True, save_temps=True)
+
+    result = subprocess.run('./a.out', shell=True, stdout=subprocess.PIPE)
+    output_file = TEST_INPUTS + 'helloworld/output_1.txt'
+
+    with open(output_file, 'r') as f:
+        expected_output = f.read()
+
+    assert result.stdout.decode("utf-8") == expected_output
+
+    for f in ['a.ll', 'a.s', 'a.out']:
+        assert os.path.exists(f)
+        os.remove(f)
+
+@pytest.mark.end2end
+def test_llc_emission():
+    compile(CORRECT_PROGRAMS + 'helloworld.tony', testing=True, in_process=False)
+
+    # llc reads the module as bitcode, the IR is never written as text
+    assert not os.path.exists('a.ll')
+
+    result = subprocess.run('./a.out', shell=True, stdout=subprocess.PIPE)
+    output_file = TEST_INPUTS + 'helloworld/output_1.txt'
+
+    with open(output_file, 'r') as f:
+        expected_output = f.read()
+
+    assert result.stdout.decode("utf-8") == expected_output
+
+    os.remove('a.out')
+
+@pytest.mark.end2end
+def test_files_next_to_program(tmp_path):
+    program = tmp_path / 'helloworld.tony'
+    program.write_text(open(CORRECT_PROGRAMS + 'helloworld.tony').read())
+
+    # only the executable, the assembly stays in the workspace
+    compile(str(program))
+    assert sorted(os.listdir(tmp_path)) == ['helloworld.out', 'helloworld.tony']
+
+    compile(str(program), save_temps=True)
+    assert sorted(os.listdir(tmp_path)) == ['helloworld.ll', 'helloworld.out', 'helloworld.s', 'helloworld.tony']
+
+@pytest.mark.end2end
+def test_emit_bitcode(tmp_path):
+    bitcode = tmp_path / 'quicksort.bc'
+    compile(CORRECT_PROGRAMS + 'quicksort.tony', exec_name=str(bitcode), emit_bc=True, optimization=2)
+
+    module = binding.parse_bitcode(bitcode.read_bytes())
+    module.verify()
+    assert 'main' in [f.name for f in module.functions if not f.is_declaration]
+
+    # the text IR written through llvm-dis is the one LLVM prints
+    write_ir(module, str(tmp_path / 'quicksort.ll'))
+    text, printed = (tmp_path / 'quicksort.ll').read_text(), str(module)
+    assert text[text.index('target datalayout'):].strip() == printed[printed.index('target datalayout'):].strip()
+
+@pytest.mark.end2end
+def test_long_statement_list(tmp_path):
+    # longer than the recursion limit of Python
+    source = tmp_path / 'long.tony'
+    source.write_text('def main():\n  int x\n  x := 0\n' +\
+                      '  x := x + 1\n' * 5000 +\
+                      '  puti(x)\nend\n')
+
+    compile(str(source), testing=True)
+
+    result = subprocess.run('./a.out', shell=True, stdout=subprocess.PIPE)
+    assert result.stdout.decode("utf-8") == '5000'
+
+    os.remove('a.out')
+
+@pytest.mark.end2end
+def test_jit_run():
+    # (program, input file or None, output file)
+    cases = [
+        ('primes', 'primes/input_2.txt', 'primes/output_2.txt'),
+        ('dfs', 'dfs/input_1.txt', 'dfs/output_1.txt'),
+        ('quicksort', None, 'quicksort/output_1.txt'),
+        ('string_reverse', None, 'string_reverse/output_1.txt'),
+    ]
+
+    for program, input_file, output_file in cases:
+        cmd = f'{sys.executable} tonyc.py --run {CORRECT_PROGRAMS}{program}.tony'
+        if input_file != None:
+            cmd += f' < {TEST_INPUTS}{input_file}'
+
+        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE)
+
+        with open(TEST_INPUTS + output_file, 'r') as f:
+            expected_output = f.read()
+
+        assert result.stdout.decode("utf-8") == expected_output
+
+    # nothing is written to disk
+    assert not os.path.exists('a.out')
+    assert not os.path.exists('a.ll')
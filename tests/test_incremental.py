@@ -0,0 +1,96 @@
+import os
+import sys
+import pytest
+import subprocess
+from context import *
+
+PROGRAM = '''def main():
+  int total
+
+  def int square(int n):
+    return n * n
+  end
+
+  def int offset(int n):
+    return n + total
+  end
+
+  def report():
+    puti(square(total))
+  end
+
+  total := square(3) + offset(4)
+  report()
+end
+'''
+
+def fingerprints(source):
+    ast = parser.parse(source, lexer=lexer)
+    ast.sem(SymbolTable())
+
+    return { f.header.function_name: function_fingerprint(f, ast.source, 1)
+             for f in walk_functions(ast.main) }
+
+def build(tmp_path, source, name):
+    path = tmp_path / f'{name}.tony'
+    path.write_text(source)
+
+    result = subprocess.run(
+        [sys.executable, 'tonyc.py', '--commands', '--incremental',
+         '--cache', str(tmp_path / 'cache'), '-o', str(tmp_path / f'{name}.out'), str(path)],
+        stdout=subprocess.PIPE, check=True
+    )
+
+    run = subprocess.run([str(tmp_path / f'{name}.out')], stdout=subprocess.PIPE)
+    return result.stdout.decode('utf-8').splitlines()[0], run.stdout.decode('utf-8')
+
+@pytest.mark.incremental
+def test_fingerprints_of_an_edit():
+    before = fingerprints(PROGRAM)
+    assert before == fingerprints(PROGRAM)
+
+    # only the edited function changes
+    after = fingerprints(PROGRAM.replace('return n * n', 'return n * n * 1'))
+    assert after['square'] != before['square']
+    assert [after[f] == before[f] for f in ['main', 'offset', 'report']] == [True] * 3
+
+    # offset loses its hidden parameter, which changes its caller too
+    after = fingerprints(PROGRAM.replace('return n + total', 'return n + 1'))
+    assert after['offset'] != before['offset']
+    assert after['main'] != before['main']
+    assert [after[f] == before[f] for f in ['square', 'report']] == [True] * 2
+
+@pytest.mark.incremental
+def test_incremental_compilation(tmp_path):
+    assert build(tmp_path, PROGRAM, 'first') == ('0 functions reused, 4 compiled', '169')
+    assert build(tmp_path, PROGRAM, 'second') == ('4 functions reused, 0 compiled', '169')
+
+    edited = PROGRAM.replace('return n * n', 'return n * n + 1')
+    assert build(tmp_path, edited, 'edited') == ('3 functions reused, 1 compiled', '197')
+
+@pytest.mark.incremental
+def test_incremental_matches_serial(tmp_path):
+    for program in ['dfs', 'quicksort', 'string_reverse', 'scopes']:
+        source = readFile(f'{program}.tony')
+        compile(CORRECT_PROGRAMS + f'{program}.tony', exec_name=str(tmp_path / 'serial.out'))
+        _, output = build(tmp_path, source, program)
+
+        serial = subprocess.run([str(tmp_path / 'serial.out')], stdout=subprocess.PIPE)
+        assert output == serial.stdout.decode('utf-8')
+
+@pytest.mark.incremental
+def test_ignored_options(tmp_path):
+    path = tmp_path / 'program.tony'
+    path.write_text(PROGRAM)
+
+    def warnings(*flags):
+        result = subprocess.run([sys.executable, 'tonyc.py', *flags, '-o', str(tmp_path / 'a.out'), str(path)],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        return result.stderr.decode('utf-8')
+
+    cache = ['--cache', str(tmp_path / 'cache')]
+
+    assert warnings('--incremental', '--run', '--opt-report', str(tmp_path / 'report.json')) ==\
+        'warning: --incremental is ignored with --run, --opt-report\n'
+    assert warnings('--emit-bc', *cache) == 'warning: --cache is ignored with --emit-bc\n'
+    assert warnings('--incremental', *cache) == ''
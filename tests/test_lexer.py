@@ -1,5 +1,5 @@
 import pytest
-from context import lexer
+from context import lexer, new_lexer, readFile
 
 
 def output(lexer, input):
@@ -207,3 +207,65 @@ def test_HelloWorld():
         ('END', 'end')
     ]
     assert tokens == expectedTokens
+
+@pytest.mark.lexer
+def test_nested_comments():
+    input = '''x <* a <* b
+        *> c *> y
+        <* <* *> *> nil? nil'''
+    lexer.lineno = 1
+    lexer.input(input)
+    tokens = [(tok.type, tok.value, tok.lineno) for tok in lexer]
+    expectedTokens = [
+        ('NAME', 'x', 1),
+        ('NAME', 'y', 2),
+        ('NIL2', 'nil?', 3),
+        ('NIL', 'nil', 3),
+    ]
+    assert tokens == expectedTokens
+    assert lexer.lineno == 3
+
+@pytest.mark.lexer
+def test_illegal_characters():
+    input = 'x $\n y ! z'
+    lexer.lineno = 1
+    lexer.diagnostics = []
+    try:
+        tokens = output(lexer, input)
+        diagnostics = lexer.diagnostics
+    finally:
+        lexer.diagnostics = None
+
+    assert tokens == [('NAME', 'x'), ('NAME', 'y'), ('NAME', 'z')]
+    assert diagnostics == ["Illegal character '$' in line 1", "Illegal character '!' in line 2"]
+
+@pytest.mark.lexer
+def test_token_arrays():
+    input = '''x <* a <* b
+        *> c *> y := 42 + x
+        "s" 'c' $ nil? x'''
+    scanner = new_lexer(diagnostics=[])
+    scanner.input(input)
+    expectedTokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in scanner]
+
+    arrays = new_lexer(diagnostics=[])
+    stream = arrays.arrays(input)
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in stream]
+
+    assert tokens == expectedTokens
+    assert arrays.diagnostics == scanner.diagnostics == ["Illegal character '$' in line 3"]
+    assert arrays.lineno == scanner.lineno == 3
+    assert len(stream) == len(tokens)
+    assert stream.table.count('x') == 1
+    assert stream.kinds.itemsize == 1 and stream.offsets.itemsize >= 4
+
+@pytest.mark.lexer
+def test_token_arrays_in_pieces():
+    input = readFile('quicksort.tony') + '\n<* a <* b *> c *> "s" \'c\' % end'
+    expectedTokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in new_lexer().arrays(input)]
+
+    for size in [1, 3, 64]:
+        stream = new_lexer().arrays([input[i:i + size] for i in range(0, len(input), size)])
+
+        assert [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in stream] == expectedTokens
+        assert stream.source == None
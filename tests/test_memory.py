@@ -0,0 +1,84 @@
+import sys
+import json
+import time
+import pytest
+import subprocess
+import tracemalloc
+from context import *
+
+@pytest.mark.memory
+def test_memory_phases():
+    profiler = start_memory_profile()
+
+    try:
+        ast = parse_timed(parser, readFile('dfs.tony'), lexer)
+        with phase('sem'):
+            ast.sem(SymbolTable())
+        ast.codegen(opt_level=1)
+    finally:
+        assert stop_memory_profile() == profiler
+
+    assert list(profiler.phases) == ['parse', 'sem', 'codegen', 'ir-parse', 'optimize']
+
+    parse = profiler.phases['parse']
+    assert parse['peak'] >= parse['retained'] > 0
+    assert parse['ast_nodes'] > 0
+    assert any('parser.py' in s['site'] for s in parse['sites'])
+
+    summary = profiler.summary()
+    classes = [n['class'] for n in summary['ast_nodes']]
+    assert 'VarAtom' in classes
+    assert all(n['count'] > 0 and n['bytes'] > 0 for n in summary['ast_nodes'])
+
+@pytest.mark.memory
+def test_no_profile_without_profiler():
+    with phase('sem'):
+        pass
+
+    assert stop_memory_profile() == None
+
+@pytest.mark.memory
+def test_mem_report_flag(tmp_path):
+    output = tmp_path / 'memory.json'
+
+    result = subprocess.run(
+        [sys.executable, 'tonyc.py', '--mem-report', str(output),
+         '-o', str(tmp_path / 'dfs.out'), CORRECT_PROGRAMS + 'dfs.tony'],
+        stderr=subprocess.PIPE, check=True
+    )
+
+    table = result.stderr.decode('utf-8').splitlines()
+    assert table[0].split()[0] == 'phase'
+    assert [line.split()[0] for line in table[1:8]] ==\
+           ['parse', 'sem', 'codegen', 'ir-parse', 'optimize', 'llc', 'gcc']
+
+    with open(output) as f:
+        summary = json.load(f)
+
+    assert list(summary['phases']) == ['parse', 'sem', 'codegen', 'ir-parse', 'optimize', 'llc', 'gcc']
+    assert summary['max_rss'] >= summary['peak'] > 0
+
+@pytest.mark.memory
+def test_sampled_peaks(monkeypatch):
+    # Python 3.8 has no tracemalloc.reset_peak
+    monkeypatch.delattr(tracemalloc, 'reset_peak')
+
+    MiB = 1024 * 1024
+    profiler = start_memory_profile()
+
+    try:
+        assert profiler.samples == []
+
+        with phase('large'):
+            data = bytearray(16 * MiB)
+            del data
+
+        with phase('small'):
+            data = bytearray(2 * MiB)
+            time.sleep(0.05)
+            del data
+    finally:
+        stop_memory_profile()
+
+    assert profiler.phases['large']['peak'] >= 16 * MiB
+    assert 2 * MiB <= profiler.phases['small']['peak'] < 16 * MiB
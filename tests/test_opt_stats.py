@@ -0,0 +1,70 @@
+import sys
+import json
+import pytest
+import subprocess
+from context import *
+
+SAMPLE_TIMINGS = '''===-------------------------------------------------------------------------===
+                      ... Pass execution timing report ...
+===-------------------------------------------------------------------------===
+  Total Execution Time: 0.0030 seconds (0.0030 wall clock)
+
+   ---User Time---   --System Time--   --User+System--   ---Wall Time---  --- Name ---
+   0.0010 ( 40.0%)   0.0000 (  0.0%)   0.0010 ( 33.3%)   0.0010 ( 33.3%)  Combine redundant instructions
+   0.0005 ( 20.0%)   0.0005 (100.0%)   0.0010 ( 33.3%)   0.0015 ( 50.0%)  Loop Vectorization
+   0.0005 ( 20.0%)   0.0000 (  0.0%)   0.0005 ( 16.7%)   0.0005 ( 16.7%)  Dominator Tree Construction #2
+   0.0025 (100.0%)   0.0005 (100.0%)   0.0030 (100.0%)   0.0030 (100.0%)  Total
+'''
+
+@pytest.mark.optimization
+def test_parse_pass_timings():
+    passes = parse_pass_timings(SAMPLE_TIMINGS)
+
+    assert [p['pass'] for p in passes] ==\
+           ['Loop Vectorization', 'Combine redundant instructions', 'Dominator Tree Construction #2']
+    assert passes[0] == {
+        'pass': 'Loop Vectorization',
+        'user': 0.0005, 'system': 0.0005, 'user+system': 0.001, 'wall': 0.0015
+    }
+
+@pytest.mark.optimization
+@pytest.mark.parametrize('level', [0, 2])
+def test_optimization_report(level):
+    ast = parser.parse(readFile('dfs.tony'), lexer=lexer)
+    ast.sem(SymbolTable())
+    ast.codegen(opt_level=level, opt_report=True)
+
+    report = ast.optimization_report
+    assert report['optimization'] == level
+
+    functions = report['functions']
+    for name in ['main', '__main_readGraph', '__main_dfs']:
+        before, after = functions[name]['before'], functions[name]['after']
+        assert before['instructions'] > 0 and before['blocks'] > 0
+
+        if level == 0:
+            assert before == after
+
+    totals = report['totals']
+    if level == 0:
+        assert report['passes'] == []
+    else:
+        assert len(report['passes']) > 0
+        assert totals['after']['instructions'] < totals['before']['instructions']
+
+@pytest.mark.optimization
+def test_opt_report_flag(tmp_path):
+    output = tmp_path / 'report.json'
+
+    subprocess.run(
+        [sys.executable, 'tonyc.py', '-O2', '--opt-report', str(output),
+         '-o', str(tmp_path / 'dfs.out'), CORRECT_PROGRAMS + 'dfs.tony'],
+        check=True
+    )
+
+    with open(output) as f:
+        report = json.load(f)
+
+    assert report['optimization'] == 2
+    assert report['pass_seconds'] >= 0
+    assert all('wall' in p for p in report['passes'])
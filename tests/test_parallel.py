@@ -0,0 +1,70 @@
+import sys
+import pytest
+import subprocess
+from context import *
+
+def defined_functions(module):
+    return sorted(f.name for f in module.functions if not f.is_declaration)
+
+@pytest.mark.parallel
+def test_partition():
+    sizes = [5, 1, 8, 3, 3, 7, 2]
+    partitions = partition(sizes, 3)
+
+    assert partitions == partition(sizes, 3)
+    assert sorted(i for p in partitions for i in p) == list(range(len(sizes)))
+    assert [sum(sizes[i] for i in p) for p in partitions] == [10, 10, 9]
+
+    # never more partitions than functions
+    assert partition([4, 2], 8) == [[0], [1]]
+
+@pytest.mark.parallel
+def test_parallel_codegen():
+    modules = []
+    for jobs in [1, 2]:
+        ast = parser.parse(readFile('quicksort.tony'), lexer=lexer)
+        ast.sem(SymbolTable())
+        modules.append(ast.codegen(opt_level=3, jobs=jobs))
+
+    serial, parallel = modules
+    assert defined_functions(serial) == defined_functions(parallel)
+
+    assert ast.parallel_stats['jobs'] == 2
+    assert ast.parallel_stats['functions'] == 4
+    assert ast.parallel_stats['partitions'] == 4
+
+@pytest.mark.parallel
+def test_parallel_compilation(tmp_path):
+    executable = tmp_path / 'dfs.out'
+
+    result = subprocess.run(
+        [sys.executable, 'tonyc.py', '-O3', '-j', '2', '-o', str(executable),
+         CORRECT_PROGRAMS + 'dfs.tony'],
+        stderr=subprocess.PIPE, check=True
+    )
+
+    lines = result.stderr.decode('utf-8').splitlines()
+    assert lines[0].startswith('function passes: 3 functions in 3 partitions on 2 jobs')
+    assert lines[1].startswith('code generation: ')
+    assert 'on 2 jobs' in lines[1] and 'CPU utilization' in lines[1]
+
+    with open('tests/test-inputs/dfs/input_1.txt') as i, open('tests/test-inputs/dfs/output_1.txt') as o:
+        output = subprocess.run([str(executable)], stdin=i, stdout=subprocess.PIPE)
+        assert output.stdout.decode('utf-8') == o.read()
+
+@pytest.mark.parallel
+def test_parallel_emit(tmp_path):
+    ast = parser.parse(readFile('quicksort.tony'), lexer=lexer)
+    ast.sem(SymbolTable())
+    module = ast.codegen(opt_level=1)
+
+    objects, stats = parallel_emit(module, 2)
+    assert len(objects) == stats['partitions'] == 2
+    assert parallel_emit(module, 2)[0] == objects
+
+    link_objects([emit_object(module)], str(tmp_path / 'serial.out'))
+    link_objects(objects, str(tmp_path / 'split.out'))
+
+    serial = subprocess.run([str(tmp_path / 'serial.out')], stdout=subprocess.PIPE)
+    split  = subprocess.run([str(tmp_path / 'split.out')], stdout=subprocess.PIPE)
+    assert split.stdout == serial.stdout != b''
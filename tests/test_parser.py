@@ -1,5 +1,5 @@
 import pytest
-from context import parser, readFile
+from context import parser, readFile, new_lexer, ArrayLexer
 
 @pytest.mark.parser
 def test_bubblesort():
@@ -42,3 +42,11 @@ def test_random_input():
 
     with pytest.raises(Exception):
         parser.parse('lol')
+
+@pytest.mark.parser
+def test_token_arrays():
+    for program in ['bubblesort', 'hanoi', 'quicksort', 'string_reverse']:
+        input = readFile(f'{program}.tony')
+        stream = new_lexer().arrays(input)
+
+        assert str(parser.parse(lexer=ArrayLexer(stream))) == str(parser.parse(input))
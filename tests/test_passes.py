@@ -0,0 +1,62 @@
+import sys
+import pytest
+import subprocess
+from context import *
+
+def optimized(program, level=1, passes=None):
+    ast = parser.parse(readFile(program), lexer=lexer)
+    ast.sem(SymbolTable())
+    return str(ast.codegen(opt_level=level, passes=passes))
+
+@pytest.mark.optimization
+def test_optimization_levels():
+    assert [optimization_levels(l) for l in [1, 3, 's', 'z']] == [(1, 0), (3, 0), (2, 1), (2, 2)]
+    assert [inlining_threshold(l) for l in [2, 3, 's', 'z']] == [225, 250, 75, 25]
+
+    pmb = pass_manager_builder('z')
+    assert (pmb.opt_level, pmb.size_level, pmb.loop_vectorize) == (2, 2, False)
+    assert pass_manager_builder(3).slp_vectorize
+
+@pytest.mark.optimization
+@pytest.mark.parametrize('program', ['array_addition.tony', 'bubblesort.tony'])
+def test_vectorization(program):
+    assert ' x i32>' not in optimized(program, 1)
+    assert ' x i32>' in optimized(program, 3)
+
+@pytest.mark.optimization
+def test_pass_list():
+    assert parse_pass_list('sroa, instruction_combining,gvn') == ['sroa', 'instruction-combining', 'gvn']
+
+    with pytest.raises(Exception, match='Unknown pass loop-vectorize'):
+        parse_pass_list('sroa,loop-vectorize')
+
+    unoptimized = optimized('dfs.tony', 0)
+    assert optimized('dfs.tony', passes=[]) == unoptimized
+    assert len(optimized('dfs.tony', passes=['sroa', 'instruction-combining'])) < len(unoptimized)
+
+@pytest.mark.optimization
+def test_target_cpu():
+    set_target_cpu('native')
+    try:
+        cpu, features = target_cpu()
+        assert cpu == binding.get_host_cpu_name()
+        assert features != '' and cpu in target_description()
+        assert target_machine() != None
+    finally:
+        set_target_cpu()
+
+    assert target_cpu() == ('', '')
+
+@pytest.mark.optimization
+@pytest.mark.parametrize('flags', [['-Os'], ['-Oz'], ['-O3', '-march=native'], ['--passes=sroa,gvn']])
+def test_optimization_flags(tmp_path, flags):
+    executable = tmp_path / 'quicksort.out'
+
+    subprocess.run(
+        [sys.executable, 'tonyc.py', *flags, '-o', str(executable), CORRECT_PROGRAMS + 'quicksort.tony'],
+        check=True
+    )
+
+    output = subprocess.run([str(executable)], stdout=subprocess.PIPE)
+    with open(TEST_INPUTS + 'quicksort/output_1.txt') as f:
+        assert output.stdout.decode('utf-8') == f.read()
@@ -0,0 +1,86 @@
+import sys
+import struct
+import pytest
+import subprocess
+from context import *
+
+def record(checksum, counters):
+    return struct.pack(f'=qqq{len(counters)}Q', MAGIC, checksum, len(counters), *counters)
+
+def compile_dfs(tmp_path, *flags):
+    executable = tmp_path / 'dfs.out'
+
+    subprocess.run(
+        [sys.executable, 'tonyc.py', '-O2', *flags, '-o', str(executable), CORRECT_PROGRAMS + 'dfs.tony'],
+        check=True
+    )
+
+    return executable
+
+def run(executable, input, cwd):
+    with open(TEST_INPUTS + f'dfs/input_{input}.txt') as i:
+        return subprocess.run([str(executable)], stdin=i, stdout=subprocess.PIPE, cwd=cwd).stdout
+
+@pytest.mark.pgo
+def test_summary_entries():
+    entries = summary_entries([0, 50, 30, 10, 10])
+
+    assert entries[0] == (10000, 50, 1)
+    assert (500000, 50, 1) in entries and (600000, 30, 2) in entries
+    assert entries[-1] == (999999, 10, 4)
+
+@pytest.mark.pgo
+def test_read_profile(tmp_path):
+    profile = tmp_path / 'profile'
+    profile.write_bytes(record(7, [1, 2, 3]) + record(8, [5, 5, 5]) + record(7, [1, 0, 1]))
+
+    assert read_profile(str(profile), 7, 3) == ([2, 2, 4], 2)
+    assert read_profile(str(profile), 9, 3) == (None, 0)
+
+    profile.write_bytes(record(7, [1, 2, 3])[:-8])
+    with pytest.raises(Exception, match='corrupt'):
+        read_profile(str(profile), 7, 3)
+
+@pytest.mark.pgo
+def test_pgo_workflow(tmp_path):
+    profile = tmp_path / 'dfs.tonyprof'
+    expected = [open(TEST_INPUTS + f'dfs/output_{i}.txt', 'rb').read() for i in [1, 2]]
+
+    # every run of the instrumented program appends a record
+    instrumented = compile_dfs(tmp_path, '--pgo-gen', str(profile))
+    assert [run(instrumented, i, tmp_path) for i in [1, 2]] == expected
+
+    ast = parser.parse(readFile('dfs.tony'), lexer=lexer)
+    symbol_table = SymbolTable()
+    ast.sem(symbol_table)
+
+    counters, runs = read_profile(str(profile), source_checksum(ast.source), symbol_table.counters)
+    assert runs == 2
+    assert counters[ast.main.counter] == 2
+
+    ast.codegen(opt_level=0, pgo_use=str(profile))
+    llvm_ir = str(ast.module)
+    assert '!"function_entry_count", i64 2' in llvm_ir
+    assert '!"branch_weights"' in llvm_ir and '!"ProfileSummary"' in llvm_ir
+
+    optimized = compile_dfs(tmp_path, '--pgo-use', str(profile))
+    assert [run(optimized, i, tmp_path) for i in [1, 2]] == expected
+
+@pytest.mark.pgo
+def test_runtime_only_instrumented():
+    ast = parser.parse(readFile('dfs.tony'), lexer=lexer)
+    ast.sem(SymbolTable())
+    ast.codegen(opt_level=0)
+
+    assert '_pgo_register' not in str(ast.module) and 'atexit' not in str(ast.module)
+
+@pytest.mark.pgo
+def test_parallel_pgo_gen(tmp_path):
+    profiles = [tmp_path / 'serial.tonyprof', tmp_path / 'parallel.tonyprof']
+
+    for profile, jobs in zip(profiles, ['1', '4']):
+        instrumented = compile_dfs(tmp_path, '-j', jobs, '--pgo-gen', str(profile))
+        run(instrumented, 1, tmp_path)
+
+    # the partitions share one array of counters
+    assert profiles[0].read_bytes() == profiles[1].read_bytes()
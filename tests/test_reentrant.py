@@ -0,0 +1,91 @@
+import sys
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from context import *
+
+SOURCES = 1000
+THREADS = 16
+PROGRAMS = ['helloworld', 'quicksort', 'primes', 'dfs', 'hanoi', 'bubblesort']
+
+def source(i):
+    '''
+        The i-th source and what parsing it must report: a correct program,
+        one with an illegal character or one with a syntax error, at a line
+        that depends on i.
+    '''
+    program = readFile(f'{PROGRAMS[i % len(PROGRAMS)]}.tony')
+    code = '\n' * (i % 40) + program
+
+    if i % 3 == 0:
+        return code, [], None
+
+    if i % 3 == 1:
+        line = code.count('\n', 0, i % 40) + 1
+        return code[:i % 40] + '$' + code[i % 40:], [f"Illegal character '$' in line {line}"], None
+
+    # the newlines in string literals are not counted, so the last line
+    # of the program is the one its lexer ends on
+    lexer = new_lexer()
+    lexer.input(program)
+    list(lexer)
+    line = i % 40 + lexer.lineno + i % 7 + 1
+
+    code += '\n' * (i % 7) + '\nend'
+    return code, [], f'Syntax error in line {line}, unexpected token end'
+
+def parse(code, lexer, parser):
+    diagnostics = lexer.diagnostics = []
+    try:
+        return str(parser.parse(code, lexer=lexer)), diagnostics, None
+    except Exception as e:
+        return None, diagnostics, str(e)
+
+@pytest.mark.concurrency
+def test_line_numbers_restart():
+    code = 'def main ():\n  skip\nend\nend'
+
+    with pytest.raises(Exception, match='line 4,'):
+        parser.parse(code, lexer=lexer)
+
+    with pytest.raises(Exception, match='line 4,'):
+        parser.parse(code, lexer=lexer)
+
+@pytest.mark.concurrency
+def test_new_instances():
+    assert new_lexer() is not new_lexer()
+    assert new_parser() is not parser
+    assert new_parser().action is parser.action
+
+@pytest.mark.concurrency
+def test_concurrent_parsing():
+    sources = [source(i) for i in range(SOURCES)]
+
+    # the ASTs of the correct programs, parsed one at a time
+    expected = {
+        code: parse(code, new_lexer(), new_parser())[0]
+        for code, _, error in sources if error == None
+    }
+
+    # one lexer and parser per thread, each parsing many sources
+    local = threading.local()
+
+    def parse_in_thread(code):
+        if not hasattr(local, 'parser'):
+            local.lexer, local.parser = new_lexer(), new_parser()
+        return parse(code, local.lexer, local.parser)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5) # switch threads in the middle of the parses
+    try:
+        with ThreadPoolExecutor(THREADS) as pool:
+            results = list(pool.map(parse_in_thread, [code for code, _, _ in sources]))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for (code, diagnostics, error), (ast, got_diagnostics, got_error) in zip(sources, results):
+        assert got_diagnostics == diagnostics
+        assert got_error == error
+
+        if error == None:
+            assert ast == expected[code]
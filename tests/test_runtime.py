@@ -0,0 +1,94 @@
+import subprocess
+import pytest
+from context import *
+
+# the programs of the tests, and the same calls of builtins.c in C
+READ_BOOLS = '''def main():
+  int i
+  for i := 0; i < 6; i := i + 1:
+    putb(getb())
+    puts(" ")
+  end
+end
+'''
+
+READ_STRINGS = '''def main():
+  char[] s
+  s := new char[8]
+  gets({size}, s)
+  puts(s)
+  puts("|")
+  gets({size}, s)
+  puts(s)
+  puts("|")
+end
+'''
+
+DRIVER = r'''
+#include <stdlib.h>
+#include <stdint.h>
+#include <stdbool.h>
+
+void _puts(int8_t *s);
+void _putb(bool b);
+bool _getb();
+void _gets(int32_t size, int8_t *s);
+
+int main(int argc, char **argv) {
+  int8_t s[8];
+
+  if (argv[1][0] == 'b') {
+    for (int i = 0; i < 6; i++) {
+      _putb(_getb());
+      _puts((int8_t *) " ");
+    }
+  } else {
+    for (int i = 0; i < 2; i++) {
+      _gets(atoi(argv[2]), s);
+      _puts(s);
+      _puts((int8_t *) "|");
+    }
+  }
+}
+'''
+
+@pytest.fixture(scope='module')
+def driver(tmp_path_factory):
+    ''' The calls of the programs, linked with builtins.c by gcc '''
+    path = tmp_path_factory.mktemp('runtime')
+    with open(path / 'driver.c', 'w') as f:
+        f.write(DRIVER)
+
+    subprocess.run(['gcc', str(path / 'driver.c'), 'tony/builtins.c', '-o', str(path / 'driver')], check=True)
+    return str(path / 'driver')
+
+def run(command, stdin):
+    return subprocess.run(command, input=stdin, stdout=subprocess.PIPE).stdout
+
+def compiled(source, tmp_path):
+    executable = str(tmp_path / 'a.out')
+    assert compile_source(source, optimization=0, executable=executable)['ok']
+    return executable
+
+@pytest.mark.runtime
+def test_read_bool(tmp_path, driver):
+    executable = compiled(READ_BOOLS, tmp_path)
+    stdin = b'0 1 2 -1 256 7\n'
+
+    # any number but 0 is true
+    assert run([executable], stdin) == run([driver, 'b'], stdin) == b'false true true true true true '
+
+@pytest.mark.runtime
+@pytest.mark.parametrize('size, stdin, expected', [
+    (8, b'hello world\nab\n', b'hello w|orld|'),
+    (4, b'hello world\nab\n', b'hel|lo |'),
+    (4, b'ab\ncd\n', b'ab|cd|'),
+    (8, b'ab', b'ab||'),
+    (1, b'ab\n', b'||'),
+    (3, b'\n\xffb\n', b'|\xffb|'),
+])
+def test_read_string(tmp_path, driver, size, stdin, expected):
+    executable = compiled(READ_STRINGS.format(size=size), tmp_path)
+
+    # at most size-1 characters, until a newline (dropped) or the end of the input
+    assert run([executable], stdin) == run([driver, 's', str(size)], stdin) == expected
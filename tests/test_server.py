@@ -0,0 +1,94 @@
+import os
+import sys
+import pytest
+import tempfile
+import threading
+import subprocess
+from context import *
+
+@pytest.fixture(scope='module')
+def server():
+    socket_path = os.path.join(tempfile.mkdtemp(), 'tonyc.sock')
+    compile_server = CompileServer(socket_path)
+
+    thread = threading.Thread(target=compile_server.serve_forever, daemon=True)
+    thread.start()
+
+    yield socket_path
+
+    compile_server.shutdown()
+    compile_server.server_close()
+
+@pytest.mark.server
+def test_server_ir(server):
+    response = send_request(server, readFile('helloworld.tony'), mode='ir')
+
+    assert response['ok']
+    assert response['diagnostics'] == []
+    assert 'define void @main()' in response['ir']
+
+@pytest.mark.server
+def test_server_ast(server):
+    response = send_request(server, readFile('hanoi.tony'), mode='ast')
+
+    assert response['ok']
+    assert response['ast'].startswith('Program:')
+
+@pytest.mark.server
+def test_server_semantic_error(server):
+    input = readFile('function_call_wrong_type.tony', prefix = SEMANTICS_TESTS)
+    response = send_request(server, input, mode='check')
+
+    assert not response['ok']
+    assert len(response['diagnostics']) == 1
+
+@pytest.mark.server
+def test_server_syntax_error_line(server):
+    # line numbers must not carry over from previous requests
+    for _ in range(2):
+        response = send_request(server, 'def main():\n  skip\n  skip )\nend', mode='check')
+
+        assert not response['ok']
+        assert 'line 3' in response['diagnostics'][0]
+
+@pytest.mark.server
+def test_server_isolation(server):
+    # list types are created per request, so compiling the same
+    # program twice in the same process must not rename them
+    input = readFile('dfs.tony')
+
+    first  = send_request(server, input, mode='ir')
+    second = send_request(server, input, mode='ir')
+
+    assert first['ok'] and second['ok']
+    assert '%list.int = type' in first['ir']
+    assert '%list.int = type' in second['ir']
+
+@pytest.mark.server
+@pytest.mark.end2end
+def test_server_executable(server):
+    output = os.path.abspath('a.out')
+    response = send_request(server, readFile('helloworld.tony'), output=output)
+
+    assert response['ok']
+    assert response['executable'] == output
+
+    result = subprocess.run('./a.out', shell=True, stdout=subprocess.PIPE)
+
+    with open(TEST_INPUTS + 'helloworld/output_1.txt', 'r') as f:
+        expected_output = f.read()
+
+    assert result.stdout.decode("utf-8") == expected_output
+
+    os.remove('a.out')
+
+@pytest.mark.server
+def test_link_failure(monkeypatch):
+    driver = sys.modules['tony.driver']
+    monkeypatch.setattr(driver, 'link_executable', lambda object_code, executable: False)
+
+    response = compile_request({ 'source': readFile('helloworld.tony') })
+
+    assert not response['ok']
+    assert response['diagnostics'][0].startswith('Linking ')
+    assert not os.path.exists(response['diagnostics'][0].split()[1])
@@ -0,0 +1,87 @@
+import os
+import sys
+import pytest
+import subprocess
+import tracemalloc
+from context import *
+
+PROGRAMS = sorted(os.listdir(CORRECT_PROGRAMS))
+
+def scan(data, lexer=None):
+    lexer = lexer or new_lexer(diagnostics=[])
+    lexer.input(data)
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in lexer]
+    return tokens, lexer.diagnostics, lexer.lineno, lexer.lexpos
+
+def pieces(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.source
+def test_chunked_scanning():
+    inputs = [readFile(program) for program in PROGRAMS] + [
+        'x <* a <* b\n *> c *> y <* <*> *> *> z',
+        '"a string\nover lines" \'c\' "unterminated',
+        'a:=b<=c>=d<>e $ nil? % comment\n% last',
+        "' ' x'",
+        '<* never closed\n',
+    ]
+
+    for input in inputs:
+        expected = scan(input)
+
+        for size in [1, 2, 3, 7, 64]:
+            assert scan(pieces(input, size)) == expected
+
+@pytest.mark.source
+def test_decode_chunks(tmp_path):
+    sources = [open(CORRECT_PROGRAMS + program, 'rb').read() for program in PROGRAMS] + [
+        b'"a\\nb\\x41\\101\\N{LATIN SMALL LETTER A}\\\\" \\t \xe9\r\nx\ry\r',
+        b'\\\\\\\\n\\\\',
+        b'',
+    ]
+
+    for source in sources:
+        path = tmp_path / 'source.tony'
+        path.write_bytes(source)
+        expected = readFile(str(path), prefix='')
+
+        for size in [1, 2, 3, 5, 8, 4096]:
+            assert ''.join(decode_chunks(pieces(source, size))) == expected
+            assert ''.join(read_source(str(path), chunk_size=size)) == expected
+
+@pytest.mark.source
+def test_parse_stream():
+    for program in PROGRAMS:
+        streamed = new_parser().parse(read_source(CORRECT_PROGRAMS + program, chunk_size=100), lexer=new_lexer())
+        assert str(streamed) == str(new_parser().parse(readFile(program), lexer=new_lexer()))
+
+@pytest.mark.source
+def test_stdin():
+    source = readFile('quicksort.tony')
+    count = 'from tony import *; lexer = new_lexer(); lexer.input(read_source()); print(len(list(lexer)))'
+
+    output = subprocess.run([sys.executable, '-c', count],
+        input=open(CORRECT_PROGRAMS + 'quicksort.tony', 'rb').read(),
+        stdout=subprocess.PIPE, check=True).stdout
+
+    assert int(output) == len(scan(source)[0])
+
+@pytest.mark.source
+def test_bounded_memory(tmp_path):
+    # about 1 MB of Tony
+    path = tmp_path / 'big.tony'
+    program = open(CORRECT_PROGRAMS + 'quicksort.tony', 'rb').read()
+    path.write_bytes(program * (1024 * 1024 // len(program)))
+
+    lexer = new_lexer()
+    lexer.input(read_source(str(path), chunk_size=16 * 1024))
+
+    tracemalloc.start()
+    try:
+        tokens = sum(1 for _ in lexer)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert tokens > 250000
+    assert peak < 256 * 1024 # a quarter of the source
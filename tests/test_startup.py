@@ -0,0 +1,87 @@
+import os
+import sys
+import pytest
+import subprocess
+from context import *
+
+# a cold `import tony` took ~420 ms when it loaded LLVM and rebuilt the
+# parser tables; it now takes ~70 ms. The budget only catches regressions
+# of that size, not noise.
+IMPORT_BUDGET = 0.25 # seconds
+
+def importtime(code):
+    ''' Runs the code in a fresh interpreter with -X importtime and returns
+        the cumulative import time (in seconds) of every imported module
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stderr=subprocess.PIPE, check=True
+    )
+
+    modules = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative) / 1e6
+
+    return modules
+
+def loaded_modules(code):
+    ''' Runs the code in a fresh interpreter and returns the names of the
+        modules that were actually executed (lazy ones are skipped)
+    '''
+    script = code + '\n' +\
+        'import sys, types\n' +\
+        'print(" ".join(n for n, m in list(sys.modules.items()) if type(m) is types.ModuleType))'
+
+    result = subprocess.run([sys.executable, '-c', script],
+                            stdout=subprocess.PIPE, check=True)
+
+    return result.stdout.decode('utf-8').split()
+
+@pytest.mark.startup
+def test_cold_import_time():
+    import_tony = 'import tony'
+    importtime(import_tony) # the tables are generated if they are missing
+
+    modules = importtime(import_tony)
+
+    assert modules['tony'] < IMPORT_BUDGET
+    assert 'tony.parsetab' not in modules
+    assert 'llvmlite.binding' not in modules
+
+@pytest.mark.startup
+def test_no_llvm_before_codegen():
+    check = 'from tony import *\n' +\
+        f'src = open("{CORRECT_PROGRAMS}dfs.tony", encoding="unicode_escape").read()\n' +\
+        'ast = parser.parse(src, lexer=lexer)\n' +\
+        'ast.sem(SymbolTable())\n' +\
+        'str(ast)\n'
+
+    modules = loaded_modules(check)
+    assert 'llvmlite.ir' not in modules
+    assert 'llvmlite.binding' not in modules
+
+    modules = loaded_modules(check + 'ast.codegen()\n')
+    assert 'llvmlite.ir' in modules
+    assert 'llvmlite.binding' in modules
+
+@pytest.mark.startup
+def test_prebuilt_tables(tmp_path):
+    tables_dir = str(tmp_path / 'tables')
+
+    generated = build_parser(tables_dir)
+    assert os.listdir(tables_dir) == [f'parsetab-{tables_version()}.pickle']
+
+    loaded = build_parser(tables_dir)
+
+    input = readFile('dfs.tony')
+    assert str(generated.parse(input, lexer=lexer.clone())) ==\
+           str(loaded.parse(input, lexer=lexer.clone()))
+
+    # PLY's debug and table files are never written in the package
+    package_dir = os.path.dirname(sys.modules['tony.parser'].__file__)
+    assert not os.path.exists(os.path.join(package_dir, 'parser.out'))
+    assert not os.path.exists(os.path.join(package_dir, 'parsetab.py'))
@@ -0,0 +1,84 @@
+import sys
+import json
+import pytest
+import threading
+import subprocess
+from context import *
+
+@pytest.mark.timing
+def test_phase_spans():
+    timer = start_timing()
+
+    try:
+        ast = parse_timed(parser, readFile('dfs.tony'), lexer)
+        with phase('sem'):
+            ast.sem(SymbolTable())
+        ast.codegen(opt_level=1)
+    finally:
+        assert stop_timing() == timer
+
+    assert list(timer.phases) == ['lex', 'parse', 'sem', 'codegen', 'ir-parse', 'optimize']
+
+    for wall, cpu in timer.phases.values():
+        assert wall >= 0 and cpu >= 0
+
+    # one span per nested function for both sem and codegen
+    spans = [(e['cat'], e['name']) for e in timer.events]
+    for category in ['FuncDef.sem', 'FuncDef.codegen']:
+        for function in ['main', 'readGraph', 'dfs']:
+            assert (category, function) in spans
+
+@pytest.mark.timing
+def test_no_spans_without_timer():
+    ast = parser.parse(readFile('dfs.tony'), lexer=lexer)
+    ast.sem(SymbolTable())
+
+    assert stop_timing() == None
+
+@pytest.mark.timing
+def test_time_phases_and_trace(tmp_path):
+    trace = tmp_path / 'trace.json'
+
+    result = subprocess.run(
+        [sys.executable, 'tonyc.py', '--time-phases', '--trace', str(trace),
+         '-o', str(tmp_path / 'dfs.out'), CORRECT_PROGRAMS + 'dfs.tony'],
+        stderr=subprocess.PIPE, check=True
+    )
+
+    table = result.stderr.decode('utf-8').splitlines()
+    assert table[0].split()[0] == 'phase'
+    assert [line.split()[0] for line in table[1:]] ==\
+           ['lex', 'parse', 'sem', 'codegen', 'ir-parse', 'optimize', 'llc', 'gcc', 'total']
+
+    with open(trace) as f:
+        events = json.load(f)['traceEvents']
+
+    for e in events:
+        assert e['ph'] == 'X'
+        assert e['dur'] >= 0
+
+    phases = [e['name'] for e in events if e['cat'] == 'phase']
+    assert 'optimize' in phases and 'gcc' in phases
+    assert ('FuncDef.codegen', 'dfs') in [(e['cat'], e['name']) for e in events]
+
+@pytest.mark.timing
+def test_phases_of_other_threads():
+    entered, done = threading.Event(), threading.Event()
+
+    def other():
+        entered.wait()
+        with phase('llc'):
+            pass
+        done.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+
+    with recording_phases() as timer:
+        entered.set()
+        done.wait()
+        with phase('sem'):
+            pass
+
+    thread.join()
+    assert list(timer.phases) == ['sem']
@@ -0,0 +1,98 @@
+import io
+import sys
+import time
+import pytest
+import subprocess
+from context import *
+
+def read_until(process, text, timeout=60):
+    ''' The lines the process prints until one of them contains text '''
+    lines = []
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        line = process.stdout.readline().decode('utf-8')
+        if line == '':
+            break
+
+        lines.append(line)
+        if text in line:
+            return lines
+
+    raise AssertionError(f'{text} was never printed, only {lines}')
+
+def edit(path, old, new):
+    source = path.read_text()
+    # a new mtime, even on file systems with a coarse clock
+    time.sleep(0.05)
+    path.write_text(source.replace(old, new))
+
+@pytest.mark.watch
+def test_memory_function_cache():
+    cache = MemoryFunctionCache()
+    cache.store('a', b'A')
+    cache.store('b', b'B')
+    cache.evict()
+
+    assert cache.lookup('a') == b'A' and cache.lookup('c') == None
+    cache.evict()
+
+    # only what the last compilation used is kept
+    assert cache.lookup('a') == b'A' and cache.lookup('b') == None
+
+@pytest.mark.watch
+def test_watch(tmp_path):
+    program = tmp_path / 'quicksort.tony'
+    program.write_text(readFile('quicksort.tony'))
+    executable = tmp_path / 'quicksort.out'
+
+    process = subprocess.Popen(
+        [sys.executable, 'tonyc.py', '--watch', '--run', '--input', '/dev/null', '-o', str(executable), str(program)],
+        stdout=subprocess.PIPE)
+
+    try:
+        lines = read_until(process, 'watching')
+        assert '0 functions reused' in lines[0]
+        assert any(line.startswith('Sorted list') for line in lines)
+
+        # a one line edit only compiles the function that changed
+        edit(program, 'Sorted list', 'Sorted  list')
+        lines = read_until(process, 'Sorted')
+        assert lines[0].startswith('rebuilt') and '3 functions reused, 1 compiled' in lines[0]
+        assert lines[-1].startswith('Sorted  list')
+
+        # an error is reported and the next save is built again
+        edit(program, 'Sorted  list', 'Sorted  list" +')
+        assert 'Syntax error' in read_until(process, 'error')[-1]
+
+        edit(program, 'Sorted  list" +', 'Sorted list')
+        assert read_until(process, 'rebuilt')[-1].startswith('rebuilt')
+
+    finally:
+        process.terminate()
+        assert process.wait(timeout=10) == 0
+
+@pytest.mark.watch
+def test_build_failures(tmp_path, monkeypatch):
+    program = tmp_path / 'helloworld.tony'
+    program.write_text(readFile('helloworld.tony'))
+    executable = tmp_path / 'helloworld.out'
+    out = io.StringIO()
+    watcher = Watcher(str(program), str(executable), out=out)
+
+    monkeypatch.setattr(sys.modules['tony.watch'], 'link_objects', lambda objects, executable: False)
+    assert not watcher.build()
+    assert out.getvalue() == f'Linking {executable} failed\n'
+
+    # illegal characters are skipped, but reported
+    program.write_text(readFile('helloworld.tony').replace('def', 'def $', 1))
+    out.seek(0)
+    out.truncate()
+    assert not watcher.build()
+    assert out.getvalue() == f"Illegal character '$' in line 1\nLinking {executable} failed\n"
+
+    monkeypatch.undo()
+    program.write_text(readFile('helloworld.tony').replace('end', '', 1))
+    out.seek(0)
+    out.truncate()
+    assert not watcher.build() and 'Syntax error' in out.getvalue()
@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from context import *
+
+COMPILATIONS = 64
+PROGRAMS = ['helloworld', 'quicksort', 'primes', 'dfs']
+
+def compile_in_thread(program, executable):
+    compile(CORRECT_PROGRAMS + f'{program}.tony', exec_name=str(executable), show_commands=False)
+
+def compile_in_process(program, executable):
+    subprocess.run(
+        [sys.executable, 'tonyc.py', '-o', str(executable), CORRECT_PROGRAMS + f'{program}.tony'],
+        check=True, stdout=subprocess.DEVNULL
+    )
+
+def expected_output(program):
+    with open(TEST_INPUTS + f'{program}/output_1.txt', 'rb') as f:
+        return f.read()
+
+def run(program, executable):
+    input_file = TEST_INPUTS + f'{program}/input_1.txt'
+    stdin = open(input_file) if os.path.exists(input_file) else subprocess.DEVNULL
+    return subprocess.run([str(executable)], stdin=stdin, stdout=subprocess.PIPE).stdout
+
+@pytest.mark.concurrency
+def test_install_executable(tmp_path):
+    with workspace() as path:
+        linked = os.path.join(path, 'a.out')
+        with open(linked, 'w') as f:
+            f.write('#!/bin/sh\necho new\n')
+        os.chmod(linked, 0o755)
+
+        (tmp_path / 'prog').write_text('old')
+        install_executable(linked, str(tmp_path / 'prog'))
+
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == ['prog']
+    assert subprocess.run([str(tmp_path / 'prog')], stdout=subprocess.PIPE).stdout == b'new\n'
+
+@pytest.mark.concurrency
+def test_concurrent_compilations(tmp_path):
+    before = set(os.listdir('.'))
+
+    # half of the compilations are threads of this process, half are
+    # tonyc.py processes, all of them in the same working directory
+    jobs = []
+    for i in range(COMPILATIONS):
+        program = PROGRAMS[i % len(PROGRAMS)]
+        executable = tmp_path / f'{program}_{i}.out'
+        jobs.append((compile_in_thread if i % 2 == 0 else compile_in_process, program, executable))
+
+    with ThreadPoolExecutor(max_workers=COMPILATIONS) as pool:
+        for future in [pool.submit(*job) for job in jobs]:
+            future.result()
+
+    for _, program, executable in jobs:
+        assert run(program, executable) == expected_output(program)
+
+    # no intermediate files were left in the working directory
+    assert set(os.listdir('.')) == before
@@ -1,3 +1,21 @@
+from .version              import __version__
 from .abstract_syntax_tree import *
 from .lexer                import *
+from .source               import *
 from .parser               import *
+from .target               import *
+from .server               import *
+from .cache                import *
+from .driver               import *
+from .batch                import *
+from .jit                  import *
+from .timing               import *
+from .memory               import *
+from .passes               import *
+from .parallel             import *
+from .incremental          import *
+from .opt_stats            import *
+from .pgo                  import *
+from .workspace            import *
+from .aio                  import *
+from .watch                import *
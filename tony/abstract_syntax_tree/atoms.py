@@ -3,7 +3,7 @@ from .data_types   import *
 from .llvm_types   import LLVM_Types
 
 import re
-from llvmlite import ir
+from ..llvm import ir
 
 escape_newline = lambda x: re.sub('\n', lambda _: '\\n', str(x))
 
@@ -49,15 +49,18 @@ class StringAtom(Atom):
 
     def codegen(self, module, builder, symbol_table):
         '''
-            1) Registers a new global variable of type LLVM_Type.Char *
+            1) Registers a new private global variable of type LLVM_Type.Char *
             2) Allocates space and writes the given string
             3) Returns the cvalue of the ptr
         '''
         length   = len(self.value)
         str_type = ir.ArrayType(LLVM_Types.Char, length)
-        llvm_value = ir.GlobalVariable(module, str_type,
-                                       f'str_literal_{symbol_table.get_id()}'
-                                       )
+
+        # the names only depend on the function, so that its code does
+        # not change when other functions change (see incremental.py)
+        name = module.get_unique_name(f'{builder.function.name}.str')
+        llvm_value = ir.GlobalVariable(module, str_type, name)
+        llvm_value.linkage = 'private'
         llvm_value.initializer = ir.Constant(str_type, bytearray(self.value.encode("utf-8")))
         char_ptr = LLVM_Types.Char.as_pointer()
         str_ptr  = builder.bitcast(llvm_value, char_ptr)
@@ -4,7 +4,7 @@ from .llvm_types   import LLVM_Types, BaseType_to_LLVM
 from .symbol_table import FunctionParam
 from .atoms        import VarAtom
 
-from llvmlite import ir
+from ..llvm import ir
 
 def should_load_or_store(expression, symbol_table):
     # global variables, arrays, lists and function params that
@@ -500,23 +500,27 @@ class NewArray(Expression):
             raise Exception(errormsg)
 
         type = self.type.sem(symbol_table)
-        self.llvm_array_type = BaseType_to_LLVM(type, var_definition = True)
+        self.array_type = type
         return Array(type)
 
     def codegen(self, module, builder, symbol_table):
+        self.llvm_array_type = BaseType_to_LLVM(self.array_type, var_definition = True)
+
         expr_cvalue = self.expr.codegen(module, builder, symbol_table)
 
         if should_load_or_store(self.expr, symbol_table):
             expr_cvalue = builder.load(expr_cvalue)
 
-        malloc_entry  = symbol_table.lookup('malloc')
-        malloc_cvalue = malloc_entry.cvalue
+        # the elements are zero-initialized, so that arrays of lists
+        # start with empty lists
+        calloc_entry  = symbol_table.lookup('calloc')
+        calloc_cvalue = calloc_entry.cvalue
 
-        byte_size  = self.llvm_array_type.get_abi_size(symbol_table.getTargetData())
-        byte_sz_ir = ir.Constant(LLVM_Types.Int, byte_size)
+        byte_size  = self.llvm_array_type.get_abi_size(symbol_table.getTargetData(), module.context)
+        byte_sz_ir = ir.Constant(LLVM_Types.Size, byte_size)
 
-        size  = builder.mul(expr_cvalue, byte_sz_ir)
-        m_ptr = builder.call(malloc_cvalue, [size])
+        length = builder.sext(expr_cvalue, LLVM_Types.Size)
+        m_ptr  = builder.call(calloc_cvalue, [length, byte_sz_ir])
         ptr   = builder.bitcast(m_ptr, self.llvm_array_type.as_pointer())
 
         return ptr
@@ -624,8 +628,8 @@ class ListOperator(Expression):
         malloc_entry  = symbol_table.lookup('malloc')
         malloc_cvalue = malloc_entry.cvalue
 
-        byte_size  = list_node.get_abi_size(symbol_table.getTargetData())
-        byte_sz_ir = ir.Constant(LLVM_Types.Int, byte_size)
+        byte_size  = list_node.get_abi_size(symbol_table.getTargetData(), module.context)
+        byte_sz_ir = ir.Constant(LLVM_Types.Size, byte_size)
         ptr = builder.call(malloc_cvalue, [byte_sz_ir])
 
         new_block = builder.bitcast(ptr, list_node.as_pointer())
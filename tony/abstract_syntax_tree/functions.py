@@ -3,14 +3,22 @@ from .symbol_table import *
 from .llvm_types   import BaseType_to_LLVM
 from .data_types   import List
 from .statements   import ExitStatement
-from llvmlite      import ir
+from ..llvm        import ir
+from ..timing      import traced
 
 class FuncDef(Node): # function definition
-    def __init__(self, header, funcdefhelp, stmt, stmtlist):
+    def __init__(self, header, funcdefhelp, stmt, stmtlist, span=None):
         self.header      = header      # type FunctionHeader
         self.funcdefhelp = funcdefhelp # type FuncDefHelp
         self.stmt        = stmt        # type Statement
         self.stmtlist    = stmtlist
+        self.span        = span        # (start, end) in the source
+
+        self.callees = [] # the FunctionEntries called in the body, set by sem
+        self.reuse   = False # set when the object code of the function is
+                             # reused by an incremental compilation
+        self.llvm_name = None # set by codegen
+        self.counter   = None # the profile counter of its entries, set by sem
 
         self.vardefs   = []
         self.funcdefs  = []
@@ -28,6 +36,7 @@ class FuncDef(Node): # function definition
 
         self.statements = [self.stmt] + self.stmtlist.getStatements()
 
+    @traced('FuncDef.sem', lambda self: self.header.function_name)
     def sem(self, symbol_table):
         '''
             1) Calls the sem() function of the header declaring that it is
@@ -36,6 +45,7 @@ class FuncDef(Node): # function definition
         '''
 
         return_type = self.header.sem(symbol_table, decl=False)
+        self.counter = symbol_table.allocate_counters(1, entry=True)
 
         for v in self.vardefs:
             v.sem(symbol_table)
@@ -62,17 +72,19 @@ class FuncDef(Node): # function definition
 
         for entry in global_accesses:
             name_ = entry.name
-            type_ = BaseType_to_LLVM(entry.type, var_definition = True).as_pointer()
+            type_ = entry.type # passed by reference, see FunctionHeader.codegen
             ref_ = True
 
             extra_params.append((name_, type_, ref_))
 
         self.header.extra_accesses = extra_params
+        self.callees = symbol_table.get_calls()
 
         symbol_table.closeScope()
 
         return True
 
+    @traced('FuncDef.codegen', lambda self: self.header.function_name)
     def codegen(self, module, builder, symbol_table, main=False):
         '''
             1) Calls the codegen() function of the header to register the function,
@@ -82,19 +94,39 @@ class FuncDef(Node): # function definition
 
             3) Changes the builder to write in the function's entry block and
             calls the codegen() of all the statements
+
+            4) Hands the finished function to the module writer, if there is one
+
+            If the function is reused, it is only declared and only its
+            nested functions are generated.
         '''
 
         func = self.header.codegen(module, builder, symbol_table, main=main)
+        self.llvm_name = func.name
+
+        if self.reuse:
+            for decl in self.funcdecls:
+                decl.codegen(module, builder, symbol_table)
+
+            for f_def in self.funcdefs:
+                f_def.codegen(module, builder, symbol_table)
+
+            symbol_table.closeScope()
+            return func
 
         entry_block = func.append_basic_block(f'{self.header.function_name}_entry')
 
-        if main:
+        if main or builder == None:
+            # builder is None in functions nested in a reused function
             builder = ir.IRBuilder(entry_block)
 
         with builder.goto_block(entry_block):
 
             self.allocate_parameters(builder, symbol_table)
 
+            profile = symbol_table.getProfile()
+            if profile != None: profile.entry(builder, func, self.counter, main=main)
+
             for v in self.vardefs:
                 v.codegen(module, builder, symbol_table)
 
@@ -119,6 +151,10 @@ class FuncDef(Node): # function definition
 
             symbol_table.closeScope()
 
+        writer = symbol_table.getModuleWriter()
+        if writer != None:
+            writer.write_function(func)
+
         return func
 
     def allocate_parameters(self, builder, symbol_table):
@@ -226,11 +262,14 @@ class FunctionHeader(Node):
             for name in f.names:
                 self.params.append((name, f.type, f.reference))
 
+        self.return_type = None
+        self.param_types = []
         self.return_type_llvm = None
         self.param_types_llvm = []
 
         self.extra_accesses = []
         self.name_prefix = ''
+        self.scope_names = '' # the names of the enclosing scopes, set by sem
 
     def sanitize(self, name):
         '''
@@ -278,15 +317,11 @@ class FunctionHeader(Node):
             name, t, ref = p
             type = t.sem(symbol_table) # calculate the actual type
             parameters.append((name,type,ref))
-
-            llvm_type = BaseType_to_LLVM(type, var_definition = True)
-            if ref:
-                llvm_type = llvm_type.as_pointer()
-
-            self.param_types_llvm.append(llvm_type)
+            self.param_types.append((type,ref))
 
         return_type = self.function_type.sem(symbol_table)
-        self.return_type_llvm = BaseType_to_LLVM(return_type, var_definition = True)
+        self.return_type = return_type
+        self.scope_names = symbol_table.get_all_scope_names()
 
         entry = symbol_table.lookup(self.function_name)
         if decl:
@@ -317,10 +352,12 @@ class FunctionHeader(Node):
                 entry.defined = True
 
             else:
-                new_entry = FunctionEntry(self.function_name,\
-                            return_type, parameters, defined=True\
-                            )
-                symbol_table.insert(self.function_name, new_entry)
+                entry = FunctionEntry(self.function_name,\
+                        return_type, parameters, defined=True\
+                        )
+                symbol_table.insert(self.function_name, entry)
+
+            entry.header = self
 
             symbol_table.openScope(self.function_name)
 
@@ -346,12 +383,25 @@ class FunctionHeader(Node):
                 -> We open a new scope and insert all the parameters of the function
         '''
 
+        self.param_types_llvm = []
+        for type, ref in self.param_types:
+            llvm_type = BaseType_to_LLVM(type, var_definition = True)
+            if ref:
+                llvm_type = llvm_type.as_pointer()
+
+            self.param_types_llvm.append(llvm_type)
+
+        self.return_type_llvm = BaseType_to_LLVM(self.return_type, var_definition = True)
+
         self.actual_llvm_params = []
         for p, llvm_t in zip(self.params, self.param_types_llvm):
             n, _, ref = p
             self.actual_llvm_params.append((n,llvm_t,ref))
 
-        self.actual_llvm_params = self.actual_llvm_params + self.extra_accesses
+        # the variables of outer scopes are passed as pointers
+        for n, type, ref in self.extra_accesses:
+            llvm_t = BaseType_to_LLVM(type, var_definition = True).as_pointer()
+            self.actual_llvm_params.append((n,llvm_t,ref))
 
         self.name_prefix = symbol_table.get_all_scope_names()
 
@@ -399,6 +449,16 @@ class FunctionHeader(Node):
 
         return func_cvalue
 
+    def signature(self):
+        '''
+            The resolved signature of a defined function, including its
+            scope and the hidden parameters of extra_accesses
+        '''
+        params = ', '.join(f'{"ref " if ref else ""}{t}' for t, ref in self.param_types)
+        extra  = ', '.join(f'{n}: {t}' for n, t, _ in self.extra_accesses)
+
+        return f'{self.scope_names}_{self.function_name}({params}) [{extra}] -> {self.return_type}'
+
     def pprint(self, indent=0):
         s = f'{indentation(indent)}Function Header\n'+\
             f'{indentation(indent+2)}Name: {self.function_name}\n'+\
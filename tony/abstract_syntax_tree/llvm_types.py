@@ -1,4 +1,4 @@
-from llvmlite import ir
+from ..llvm        import ir
 from .data_types   import BaseType, Array, List
 
 class LLVM_Sizes():
@@ -6,12 +6,26 @@ class LLVM_Sizes():
     Int  = 32 # 4 bytes
     Char = 8  # 1 byte
     Bool = 1  # 1 bit
+    Size = 64 # size_t, the argument of malloc
 
 class LLVM_Types():
-    Int  = ir.IntType(LLVM_Sizes.Int)
-    Char = ir.IntType(LLVM_Sizes.Char)
-    Bool = ir.IntType(LLVM_Sizes.Bool)
-    Void = ir.VoidType()
+    ''' Set by init_types() when code generation starts '''
+    Int  = None
+    Char = None
+    Bool = None
+    Size = None
+    Void = None
+
+def init_types():
+    ''' Creates the basic LLVM types, the first time it is called '''
+    if LLVM_Types.Int != None:
+        return
+
+    LLVM_Types.Int  = ir.IntType(LLVM_Sizes.Int)
+    LLVM_Types.Char = ir.IntType(LLVM_Sizes.Char)
+    LLVM_Types.Bool = ir.IntType(LLVM_Sizes.Bool)
+    LLVM_Types.Size = ir.IntType(LLVM_Sizes.Size)
+    LLVM_Types.Void = ir.VoidType()
 
 
 def BaseType_to_LLVM(type, var_definition=False):
@@ -35,8 +49,24 @@ def BaseType_to_LLVM(type, var_definition=False):
 
     return None
 
+context = None
 already_instantiated = {}
 
+def reset_types():
+    '''
+        Starts a new LLVM context for the identified list types and
+        forgets the ones created for the previous program, so that
+        programs compiled in the same process do not share any types.
+        Returns the new context.
+    '''
+    global context, already_instantiated
+
+    init_types()
+    context = ir.Context()
+    already_instantiated = {}
+
+    return context
+
 def LLVM_List(type):
     global already_instantiated
 
@@ -47,8 +77,7 @@ def LLVM_List(type):
         return LLVM_List(LLVM_List(type.t))
 
     llvm_type = BaseType_to_LLVM(type)
-    ctx  = ir.global_context
-    node = ctx.get_identified_type(f'list.{type}')
+    node = context.get_identified_type(f'list.{type}')
     node.set_body(llvm_type, node.as_pointer())
     already_instantiated[str(type)] = node
 
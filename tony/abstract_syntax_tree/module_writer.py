@@ -0,0 +1,92 @@
+import re
+from ..llvm import ir
+
+# a reference to a global value in the text of a function: @"name" or @name
+_reference = re.compile(r'@(?:"((?:[^"\\]|\\.)*)"|([-a-zA-Z$._0-9]+))')
+
+class ModuleWriter:
+    '''
+        Serializes an llvmlite ir.Module one function at a time.
+
+        Every function is turned into text as soon as its code generation
+        is over and its instructions are dropped right away, so the Python
+        objects of the whole program never exist at the same time as its
+        text. The text of the module is built only once, by __str__.
+    '''
+
+    def __init__(self, module):
+        self.module = module
+        self.functions = []
+        self.names = [] # the names of self.functions
+        self.written = set()
+
+    def write_function(self, func):
+        ''' Serializes a finished function and frees its instructions '''
+        self.functions.append(str(func))
+        self.names.append(func.name)
+        self.written.add(func.name)
+
+        # the function now prints as a declaration, but it is never
+        # printed again because it is in self.written
+        func.blocks = []
+
+    def header(self):
+        ''' The target and the identified types, which every module text starts with '''
+        module = self.module
+
+        lines = [
+            f'; ModuleID = "{module.name}"',
+            f'target triple = "{module.triple}"',
+            f'target datalayout = "{module.data_layout}"',
+            ''
+        ]
+
+        lines += [t.get_declaration() for t in module.get_identified_types().values()]
+
+        return lines
+
+    def __str__(self):
+        module = self.module
+        lines = self.header()
+
+        for g in module.globals.values():
+            if isinstance(g, ir.Function) and g.name in self.written:
+                continue
+
+            lines.append(str(g))
+
+        lines += self.functions
+        lines += module._get_metadata_lines()
+
+        return '\n'.join(lines)
+
+    def function_module(self, index):
+        '''
+            Returns the text of a module in which the index-th written
+            function is the only definition. The functions it calls are
+            declared and the global variables it uses (its string literals)
+            are defined along with it.
+        '''
+        return self.partition_module([index])
+
+    def partition_module(self, indices):
+        ''' Like function_module, for a list of written functions '''
+        module = self.module
+        names = { self.names[i] for i in indices }
+
+        referenced = {}
+        for i in indices:
+            for quoted, plain in _reference.findall(self.functions[i]):
+                referenced[quoted or plain] = None
+
+        lines = self.header()
+
+        for ref in referenced:
+            g = module.globals.get(ref)
+            if ref not in names and g != None:
+                lines.append(str(g))
+
+        lines += [self.functions[i] for i in indices]
+        lines += module._get_metadata_lines()
+
+        return '\n'.join(lines)
@@ -1,8 +1,16 @@
 from .data_types   import BaseType
 from .symbol_table import SymbolTable, FunctionEntry
-from .llvm_types   import BaseType_to_LLVM, LLVM_Types
-
-from llvmlite import ir, binding
+from .llvm_types   import BaseType_to_LLVM, LLVM_Types, reset_types
+from .module_writer import ModuleWriter
+from ..target      import initialize_llvm, target_machine
+from ..runtime     import link_runtime
+from ..passes      import run_passes
+from ..parallel    import parallel_function_passes
+from ..pgo         import ProfileGen, ProfileUse, read_profile, source_checksum
+from ..timing      import phase
+from ..opt_stats   import function_stats, optimization_report, start_pass_timing, stop_pass_timing
+
+from ..llvm import ir, binding
 
 class Node:
     def __init__(self, type, value, children=None):
@@ -38,28 +46,51 @@ class Node:
 
 
 class Program(Node):
-    def __init__(self, funcdef):
+    def __init__(self, funcdef, source=None):
         self.main = funcdef
+        self.source = source # the text of the program, if it was parsed
         self.symbol_table = None # will be initialized when sem is called
         self.module  = None
+        self.context = None # the LLVM context of the program's types
+        self.llvm_context = None # the context of the parsed module
         self.binding = None
         self.builder = None
         self.c_symbol_table = SymbolTable(skip_builtins=True)
+        self.optimization_report = None # set by optimize_module(report=True)
+        self.parallel_stats = None # set by codegen(jobs > 1)
 
-    def codegen_init(self):
+    def codegen_init(self, pgo_gen=None, pgo_use=None):
         ''' Initializes  llvm '''
         self.binding = binding
-        self.binding.initialize()
-        self.binding.initialize_native_target()
-        self.binding.initialize_native_asmprinter()
+        initialize_llvm()
+
+        self.context = reset_types()
 
-        self.module = ir.Module()
+        self.module = ir.Module(context=self.context)
         self.module.triple = self.binding.get_default_triple()
-        self.target_data = self.binding.Target.from_default_triple().create_target_machine().target_data
+        self.target_data = target_machine().target_data
+        self.module.data_layout = str(self.target_data)
         self.c_symbol_table.setTargetData(self.target_data)
+        self.c_symbol_table.setModuleWriter(ModuleWriter(self.module))
 
         self.builder = None # the builder will be declared inside the function definition
 
+        # profile-guided optimization, with the counters allocated by sem
+        if pgo_gen != None or pgo_use != None:
+            counters = self.symbol_table.counters
+            checksum = source_checksum(self.source or '')
+
+        if pgo_gen != None:
+            self.c_symbol_table.setProfile(ProfileGen(self.module, counters, checksum, pgo_gen))
+
+        elif pgo_use != None:
+            profile, _ = read_profile(pgo_use, checksum, counters)
+
+            if profile != None:
+                profile = ProfileUse(self.module, profile)
+                profile.summary(self.symbol_table.entry_counters)
+                self.c_symbol_table.setProfile(profile)
+
         for f in self.c_symbol_table.builtins:
             name, type, args = f
             arg_types_llvm = list(map(lambda arg: BaseType_to_LLVM(arg[1]), args))
@@ -72,60 +103,111 @@ class Program(Node):
                 cvalue = func_cvalue
             ))
 
-        # register malloc
-        name = 'malloc'
+        # register malloc and calloc
         type = LLVM_Types.Int.as_pointer()
-        args = [('t', LLVM_Types.Int, False)]
-        ftype = ir.FunctionType(type, [LLVM_Types.Int])
-        func_cvalue = ir.Function(self.module, ftype, name=name)
-        self.c_symbol_table.insert(name, FunctionEntry(
-            name,
-            type,
-            args,
-            cvalue = func_cvalue
-        ))
+        allocators = [
+            ('malloc', [('t', LLVM_Types.Size, False)]),
+            ('calloc', [('n', LLVM_Types.Size, False), ('t', LLVM_Types.Size, False)]),
+        ]
+
+        for name, args in allocators:
+            ftype = ir.FunctionType(type, [arg[1] for arg in args])
+            func_cvalue = ir.Function(self.module, ftype, name=name)
+            self.c_symbol_table.insert(name, FunctionEntry(
+                name,
+                type,
+                args,
+                cvalue = func_cvalue
+            ))
 
-    def codegen(self, opt_level=1):
-        # pre-processing
-        self.codegen_init()
+    def codegen_functions(self, pgo_gen=None, pgo_use=None):
+        '''
+            Generates the IR of every function and returns the ModuleWriter
+            that holds their text. With pgo_gen, the code counts its executions
+            into that profile; with pgo_use, the counts of that profile are
+            attached to the IR (see pgo.py).
+        '''
+        with phase('codegen'):
+            # pre-processing
+            self.codegen_init(pgo_gen, pgo_use)
+
+            self.main.codegen(self.module, self.builder, self.c_symbol_table, main=True)
+
+        return self.c_symbol_table.getModuleWriter()
+
+    def codegen(self, opt_level=1, opt_report=False, jobs=1, passes=None, pgo_gen=None, pgo_use=None):
+        '''
+            Generates the IR of the program and optimizes it. With more
+            than one job, the function passes run in parallel on partitions
+            of the program (see parallel.py), before the IR is linked
+            into one module. An explicit list of passes replaces the
+            pipeline of the optimization level.
+        '''
+        writer = self.codegen_functions(pgo_gen, pgo_use)
+        self.c_symbol_table.setModuleWriter(None)
+        self.module = None
+        self.llvm_context = self.binding.create_context()
 
-        self.main.codegen(self.module, self.builder, self.c_symbol_table, main=True)
+        parallel = jobs > 1 and opt_level != 0 and passes == None and len(writer.functions) > 1
 
-        # post-processing
-        self.module = self.binding.parse_assembly(str(self.module))
-        self.module.verify()
+        if parallel:
+            with phase('function-passes', jobs=jobs):
+                self.module, self.parallel_stats = parallel_function_passes(
+                    writer, opt_level, jobs, self.llvm_context)
+                del writer
 
-        self.optimize_module(level=opt_level)
+        # post-processing: the IR is serialized exactly once, and the
+        # llvmlite.ir objects are dropped before LLVM parses the text
+        with phase('ir-parse'):
+            if not parallel:
+                llvm_ir = str(writer)
+                del writer
+
+                self.module = self.binding.parse_assembly(llvm_ir, context=self.llvm_context)
+                del llvm_ir
+
+            runtime = link_runtime(self.module, self.llvm_context, pgo=pgo_gen != None)
+            self.module.verify()
+
+        with phase('optimize'):
+            # only the runtime is left for the function passes, if they ran in parallel
+            functions = set(runtime) if parallel else None
+            self.optimize_module(level=opt_level, report=opt_report, functions=functions, passes=passes)
 
         return self.module
 
 
-    def optimize_module(self, level=1):
-        if level == 0:
+    def optimize_module(self, level=1, report=False, functions=None, passes=None):
+        '''
+            Optimizes the module. With report set, it also measures the time
+            of every pass and the size of every function before and after
+            the passes, and keeps them in self.optimization_report.
+            The function passes only run on the given functions, if any,
+            and an explicit list of passes replaces the pipeline.
+        '''
+        if not report:
+            self.run_passes(level, functions, passes)
             return
 
-        # Initialize pass manager builder
-        pmb = self.binding.PassManagerBuilder()
-
-        # Declare optimization level
-        pmb.opt_level = level
+        before = function_stats(self.module)
 
-        # Run local optimizations on functions
-        fpm = self.binding.FunctionPassManager(self.module)
-        pmb.populate(fpm)
-        fpm.initialize()
+        start_pass_timing()
+        try:
+            self.run_passes(level, functions, passes)
+        finally:
+            timings = stop_pass_timing()
 
-        for func in self.module.functions:
-            fpm.run(func)
+        after = function_stats(self.module)
+        self.optimization_report = optimization_report(level, before, after, timings)
 
-        fpm.finalize()
+        if passes != None:
+            self.optimization_report['pipeline'] = passes
 
-        # Configure module pass manager
-        mpm = binding.ModulePassManager()
-        pmb.populate(mpm)
+        if self.parallel_stats != None:
+            self.optimization_report['parallel'] = self.parallel_stats
 
-        # Run GLOBAL optimizations on the module
-        mpm.run(self.module)
+    def run_passes(self, level=1, functions=None, passes=None):
+        run_passes(self.module, level, functions, passes)
 
     def sem(self, symbol_table):
         '''
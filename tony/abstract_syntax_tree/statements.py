@@ -5,12 +5,31 @@ from .llvm_types   import *
 from .atoms        import VarAtom
 from .expressions  import AtomArray, should_load_or_store
 
-from llvmlite import ir
+from ..llvm import ir
 
 class Statement(Node):
     ''' Generic class for statements '''
     pass
 
+def conditional_branch(builder, symbol_table, cmp, taken_bb, other_bb, counter):
+    '''
+        Emits the conditional branch of a condition that owns the profile
+        counters counter (times evaluated) and counter+1 (times taken),
+        counting the evaluation or attaching the weights of the profile
+    '''
+    profile = symbol_table.getProfile()
+
+    if profile != None: profile.count(builder, counter)
+    branch = builder.cbranch(cmp, taken_bb, other_bb)
+    if profile != None: profile.branch(branch, counter + 1, counter)
+
+    return branch
+
+def count_taken(builder, symbol_table, counter):
+    ''' Counts a taken branch, at the start of its block '''
+    profile = symbol_table.getProfile()
+    if profile != None: profile.count(builder, counter + 1)
+
 class ExitStatement(Statement):
     def __init__(self):
         pass
@@ -111,13 +130,20 @@ class StatementList(Statement):
         self.children = children
 
     def getStatements(self):
-        return [] if self.stmt == None\
-               else [self.stmt] + self.children.getStatements()
+        # iterative, so that long statement lists don't hit the recursion limit
+        statements = []
+        node = self
+        while node.stmt != None:
+            statements.append(node.stmt)
+            node = node.children
+
+        return statements
 
 class IfStatement(Statement):
     def __init__(self, condition, statement, stmtlist):
         self.condition = condition
         self.statements = [statement] + stmtlist.getStatements()
+        self.counter = None # the first of its two profile counters, set by sem
 
     def sem(self, symbol_table):
         '''
@@ -129,6 +155,8 @@ class IfStatement(Statement):
             errormsg = f'The condition of the if clause must be of type {BaseType.Bool}'
             raise Exception(errormsg)
 
+        self.counter = symbol_table.allocate_counters(2)
+
         for s in self.statements:
             s.sem(symbol_table)
 
@@ -144,10 +172,11 @@ class IfStatement(Statement):
 
         then_bb  = builder.function.append_basic_block('then')
         after_bb = ir.Block(builder.function, 'after')
-        builder.cbranch(cmp, then_bb, after_bb) # conditional branch
+        conditional_branch(builder, symbol_table, cmp, then_bb, after_bb, self.counter)
 
         # Building the 'then' block
         builder.position_at_start(then_bb)
+        count_taken(builder, symbol_table, self.counter)
         for s in self.statements:
             s.codegen(module, builder, symbol_table)
 
@@ -207,6 +236,7 @@ class ElsifStatement(Statement):
     def __init__(self, condition, statement, stmtlist):
         self.condition  = condition
         self.statements = [statement] + stmtlist.getStatements()
+        self.counter    = None # the first of its two profile counters, set by sem
 
     def sem(self, symbol_table):
         '''
@@ -218,6 +248,8 @@ class ElsifStatement(Statement):
             errormsg = f'The condition of the if clause must be of type {BaseType.Bool}'
             raise Exception(errormsg)
 
+        self.counter = symbol_table.allocate_counters(2)
+
         for s in self.statements:
             s.sem(symbol_table)
 
@@ -301,10 +333,11 @@ class IfElseStatement(Statement):
         then_bb  = builder.function.append_basic_block('then')
         else_bb  = ir.Block(builder.function, 'else')
         after_bb = ir.Block(builder.function, 'after')
-        builder.cbranch(cmp, then_bb, else_bb) # conditional branch
+        conditional_branch(builder, symbol_table, cmp, then_bb, else_bb, self.ifclause.counter)
 
         # Building the 'then' block
         builder.position_at_start(then_bb)
+        count_taken(builder, symbol_table, self.ifclause.counter)
         for s in self.ifclause.statements:
             s.codegen(module, builder, symbol_table)
         if not builder.block.is_terminated: builder.branch(after_bb)
@@ -365,10 +398,12 @@ class IfFullStatement(Statement):
             elsif_conds.append(ir.Block(builder.function, f'elsif_cond_{i}'))
             elsif_bb.append(ir.Block(builder.function, f'elsif_bb_{i}'))
 
-        builder.cbranch(cmp, then_bb, elsif_conds[0]) # conditional branch for first if
+        # conditional branch for first if
+        conditional_branch(builder, symbol_table, cmp, then_bb, elsif_conds[0], self.ifclause.counter)
 
         # Building the 'then' block
         builder.position_at_start(then_bb)
+        count_taken(builder, symbol_table, self.ifclause.counter)
         for s in self.ifclause.statements:
             s.codegen(module, builder, symbol_table)
         if not builder.block.is_terminated: builder.branch(after_bb)
@@ -389,10 +424,11 @@ class IfFullStatement(Statement):
             else:
                 next = elsif_conds[i+1]
 
-            builder.cbranch(cmp, elsif_bb[i], next)
+            conditional_branch(builder, symbol_table, cmp, elsif_bb[i], next, eif.counter)
 
             builder.function.basic_blocks.append(elsif_bb[i])
             builder.position_at_start(elsif_bb[i])
+            count_taken(builder, symbol_table, eif.counter)
             for s in eif.statements:
                 s.codegen(module, builder, symbol_table)
             if not builder.block.is_terminated: builder.branch(after_bb)
@@ -428,6 +464,7 @@ class ForLoop(Statement):
         self.condition  = condition
         self.ending     = ending
         self.statements = [stmt] + stmtlist.getStatements()
+        self.counter    = None # the first of its two profile counters, set by sem
 
     def sem(self, symbol_table):
         '''
@@ -441,6 +478,8 @@ class ForLoop(Statement):
             errormsg = f'The terminating condition of the for-loop must be of type {BaseType.Bool}'
             raise Exception(errormsg)
 
+        self.counter = symbol_table.allocate_counters(2)
+
         self.initial.sem(symbol_table)
         self.ending.sem(symbol_table)
 
@@ -469,11 +508,12 @@ class ForLoop(Statement):
             cond = builder.load(cond)
 
         cmp  = builder.icmp_unsigned('!=', cond, ir.Constant(LLVM_Types.Bool, 0))
-        builder.cbranch(cmp, loopbody, afterloop)
+        conditional_branch(builder, symbol_table, cmp, loopbody, afterloop, self.counter)
 
         # building the loop body
         builder.function.basic_blocks.append(loopbody)
         builder.position_at_start(loopbody)
+        count_taken(builder, symbol_table, self.counter)
         for s in self.statements:
             s.codegen(module, builder, symbol_table)
         self.ending.codegen(module, builder, symbol_table)
@@ -513,6 +553,7 @@ class FunctionCall(Statement):
     def __init__(self, name, expressions):
         self.name = name
         self.expressions = expressions
+        self.counter = None # its profile counter, set by sem
 
     def sem(self, symbol_table):
         '''
@@ -534,6 +575,9 @@ class FunctionCall(Statement):
             errormsg = f'{self.name} is not a function'
             raise Exception(errormsg)
 
+        symbol_table.register_call(f)
+        self.counter = symbol_table.allocate_counters(1)
+
         params = f.params
 
         if len(params) != len(self.expressions):
@@ -583,7 +627,13 @@ class FunctionCall(Statement):
 
             params.append(cvalue)
 
-        return builder.call(func_cvalue, params)
+        profile = symbol_table.getProfile()
+        if profile != None: profile.count(builder, self.counter)
+
+        call = builder.call(func_cvalue, params)
+        if profile != None: profile.call(call, self.counter)
+
+        return call
 
     def pprint(self, indent=0):
         s = indentation(indent) + 'Function Call\n'
@@ -32,6 +32,7 @@ class FunctionEntry(SymbolEntry):
         self.params      = params
         self.defined     = defined # to distinguish functions that are declared
                                    # but not yet defined
+        self.header      = None    # the FunctionHeader of the definition
     def __str__(self):
         s = f'{"Undefined" if not self.defined else ""} Function with:\n'
         s += f'\tFunction name: {self.func_name}\n'
@@ -44,7 +45,11 @@ class Scope:
         self.locals = dict()
         self.func_name = func_name
         self.returned  = False
-        self.accesses_outside = set()
+        # used as an ordered set: the accesses become hidden parameters
+        # and their order must be the same in every compilation
+        self.accesses_outside = dict()
+        # the functions called from the scope, also an ordered set
+        self.calls = dict()
 
     def lookup(self, s):
         if s in self.locals.keys():
@@ -62,6 +67,10 @@ class SymbolTable:
         self.scopes = []
         self.id = 0
         self.target_data = None
+        self.module_writer = None
+        self.profile = None # ProfileGen or ProfileUse of pgo.py, if any
+        self.counters = 0 # the number of profile counters allocated by sem
+        self.entry_counters = [] # the counters of the function entries
 
         self.builtins = [
             ('puti', BaseType.Void, [('n', BaseType.Int, False)]),
@@ -90,6 +99,28 @@ class SymbolTable:
     def getTargetData(self):
         return self.target_data
 
+    def setModuleWriter(self, w):
+        self.module_writer = w
+
+    def getModuleWriter(self):
+        return self.module_writer
+
+    def setProfile(self, p):
+        self.profile = p
+
+    def getProfile(self):
+        return self.profile
+
+    def allocate_counters(self, n, entry=False):
+        ''' Allocates n profile counters and returns the index of the first '''
+        index = self.counters
+        self.counters += n
+
+        if entry:
+            self.entry_counters.append(index)
+
+        return index
+
     def openScope(self, name=''):
         self.scopes.append(Scope(name))
 
@@ -100,7 +131,7 @@ class SymbolTable:
 
             for entry in self.scopes[-1].accesses_outside:
                 if entry.name not in self.scopes[-2].locals:
-                    self.scopes[-2].accesses_outside.add(entry)
+                    self.scopes[-2].accesses_outside[entry] = None
 
         self.scopes.pop()
 
@@ -122,7 +153,7 @@ class SymbolTable:
                     is_param = isinstance(name, FunctionParam)
 
                     if  is_var or is_param:
-                        self.scopes[-1].accesses_outside.add(name)
+                        self.scopes[-1].accesses_outside[name] = None
                         # register the use of a global variable
                 return name
 
@@ -143,7 +174,13 @@ class SymbolTable:
         return '_' + '_'.join([scope.func_name for scope in self.scopes])
 
     def get_global_accesses(self):
-        return self.scopes[-1].accesses_outside
+        return list(self.scopes[-1].accesses_outside)
+
+    def register_call(self, entry):
+        self.scopes[-1].calls[entry] = None
+
+    def get_calls(self):
+        return list(self.scopes[-1].calls)
 
     def all_funcs_defined(self):
         ''' Checks if all functions that were declared
@@ -3,13 +3,13 @@ from .symbol_table import Variable
 from .llvm_types   import BaseType_to_LLVM
 from .data_types   import List
 
-from llvmlite import ir
+from ..llvm import ir
 
 class VariableDefinition(Node):
     def __init__(self, type, names):
         self.type = type
         self.names = names
-        self.llvm_type = None
+        self.var_type = None
 
     def sem(self, symbol_table):
         '''
@@ -18,7 +18,7 @@ class VariableDefinition(Node):
             2) Inserts the variable to the current scope
         '''
         type = self.type.sem(symbol_table)
-        self.llvm_type = BaseType_to_LLVM(type, var_definition=True)
+        self.var_type = type
 
         for name in self.names:
             if symbol_table.lookup_current_scope(name) != None:
@@ -34,7 +34,7 @@ class VariableDefinition(Node):
             We know from sem() that the name does not exist.
             We add the variable in the symbol table along with its LLVM value
         '''
-        t = self.llvm_type
+        t = BaseType_to_LLVM(self.var_type, var_definition=True)
 
         cvalues = []
         for name in self.names:
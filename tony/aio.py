@@ -0,0 +1,167 @@
+'''
+    asyncio API of the compiler, for services that drive compilations
+    from an event loop.
+
+    compile_async runs the front end (parsing to object code, see
+    compile_source) in a thread, as it holds the GIL and frontend_lock,
+    and links with gcc through asyncio.create_subprocess_exec. run_async
+    runs an executable the same way, with a timeout. Neither blocks the
+    event loop, and both can be cancelled: a cancelled gcc or program is
+    killed. An AsyncCompiler bounds the compilations and runs that are in
+    progress at the same time with a semaphore; the functions of the
+    module use one AsyncCompiler per event loop.
+
+    The semaphore is created inside the running loop, on first use: on
+    Python 3.8 and 3.9 an asyncio.Semaphore is bound to the loop that was
+    current when it was made, so one made in __init__ (before asyncio.run)
+    would fail in the loop that actually uses it.
+'''
+
+import os
+import time
+import asyncio
+import weakref
+import functools
+
+from .driver    import compile_source
+from .workspace import workspace, install_executable
+
+_compilers = weakref.WeakKeyDictionary() # event loop -> AsyncCompiler
+
+class AsyncCompiler:
+    ''' Compiles and runs programs, at most concurrency of them at a time '''
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or os.cpu_count()
+        self.semaphores = weakref.WeakKeyDictionary() # event loop -> asyncio.Semaphore
+
+    @property
+    def semaphore(self):
+        ''' The semaphore of the running event loop '''
+        loop = asyncio.get_running_loop()
+
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        return self.semaphores[loop]
+
+    async def compile(self, source, executable=None, object_code=True, **options):
+        '''
+            Compiles the source and returns the result of compile_source,
+            linking the executable if a path is given. The other options
+            are the ones of compile_source.
+        '''
+        async with self.semaphore:
+            compile = functools.partial(compile_source, source, object_code=True, **options)
+            result = await asyncio.get_running_loop().run_in_executor(None, compile)
+
+            if result['ok'] and executable != None:
+                start = time.perf_counter()
+                errors = await _link(result['object_code'], executable)
+
+                # gcc runs concurrently with other children, so only its wall time is known
+                result['timings']['link'] = { 'wall': time.perf_counter() - start, 'cpu': None }
+
+                if errors == None:
+                    result['executable'] = executable
+                else:
+                    result['diagnostics'].append(f'Linking {executable} failed: {errors}')
+                    result['ok'] = False
+
+            if not object_code:
+                result['object_code'] = None
+
+            return result
+
+    async def run(self, executable, stdin=b'', timeout=None):
+        '''
+            Runs the executable with the given input and returns its
+            returncode, stdout and stderr (bytes). A program that runs for
+            longer than timeout seconds is killed, and timed_out is set.
+        '''
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(executable,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+
+            # the output is read until the pipes close, so what a killed
+            # program wrote before it was killed is kept too
+            io = asyncio.gather(process.stdout.read(), process.stderr.read(), _feed(process, stdin))
+
+            timed_out = False
+            try:
+                await asyncio.wait_for(asyncio.shield(io), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                process.kill()
+            except asyncio.CancelledError:
+                await _kill(process)
+                raise
+
+            stdout, stderr, _ = await io
+            await process.wait()
+
+            return {
+                'returncode': process.returncode,
+                'stdout': stdout,
+                'stderr': stderr,
+                'timed_out': timed_out,
+            }
+
+async def _feed(process, stdin):
+    ''' Writes the input of a process and closes it '''
+    try:
+        process.stdin.write(stdin)
+        await process.stdin.drain()
+        process.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        pass # the program exited without reading all of it
+
+async def _link(object_code, executable):
+    ''' Links the object code with gcc, returns its errors if it fails '''
+    with workspace() as path:
+        object_path = os.path.join(path, '0.o')
+        with open(object_path, 'wb') as f:
+            f.write(object_code)
+
+        output = os.path.join(path, 'a.out')
+        process = await asyncio.create_subprocess_exec('gcc', object_path, '-o', output,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT)
+
+        try:
+            errors, _ = await process.communicate()
+        except asyncio.CancelledError:
+            await _kill(process)
+            raise
+
+        if process.returncode != 0:
+            return errors.decode('utf-8', 'replace')
+
+        install_executable(output, executable)
+
+async def _kill(process):
+    ''' Kills a process and waits for it '''
+    if process.returncode == None:
+        process.kill()
+
+    # shielded, so that the process is reaped even if we are cancelled again
+    await asyncio.shield(process.wait())
+
+def default_compiler():
+    ''' The AsyncCompiler of the running event loop '''
+    loop = asyncio.get_running_loop()
+
+    if loop not in _compilers:
+        _compilers[loop] = AsyncCompiler()
+
+    return _compilers[loop]
+
+async def compile_async(source, executable=None, **options):
+    ''' AsyncCompiler.compile on the AsyncCompiler of the running event loop '''
+    return await default_compiler().compile(source, executable, **options)
+
+async def run_async(executable, stdin=b'', timeout=None):
+    ''' AsyncCompiler.run on the AsyncCompiler of the running event loop '''
+    return await default_compiler().run(executable, stdin, timeout)
@@ -0,0 +1,119 @@
+import os
+import time
+import glob
+
+from .driver    import compile_request
+from .target    import initialize_llvm, target_machine
+from .workspace import workspace, install_executable
+
+def collect_sources(paths):
+    '''
+        Expands the arguments of --batch to a list of Tony programs.
+        Directories contribute all the .tony files they contain.
+    '''
+    sources = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            sources += sorted(glob.glob(os.path.join(path, '*.tony')))
+        else:
+            sources.append(path)
+
+    return sources
+
+def executable_name(source, output_dir=None):
+    ''' The executable of prog.tony is prog.out, next to the source
+        or inside output_dir if one is given '''
+    name = os.path.splitext(os.path.basename(source))[0] + '.out'
+    directory = output_dir if output_dir != None else os.path.dirname(source)
+
+    return os.path.abspath(os.path.join(directory, name))
+
+def executable_names(sources, output_dir=None):
+    '''
+        The executables of the sources, in order. Two sources with the same
+        executable (e.g. a/prog.tony and b/prog.tony with an output_dir)
+        are an error, as one would overwrite the other.
+    '''
+    executables = [executable_name(s, output_dir) for s in sources]
+    first = {}
+
+    for source, executable in zip(sources, executables):
+        if executable in first:
+            errormsg = f'{first[executable]} and {source} would both be compiled to {executable}'
+            raise Exception(errormsg)
+
+        first[executable] = source
+
+    return executables
+
+def init_worker():
+    ''' Runs once in every worker process, before its first job '''
+    initialize_llvm()
+    target_machine()
+
+def compile_job(source, executable, optimization=1):
+    '''
+        Compiles a single file inside its own workspace and installs the
+        executable under its final name only if the compilation succeeded.
+        Returns (source, ok, diagnostics, seconds).
+    '''
+    start = time.perf_counter()
+
+    with workspace() as path:
+        try:
+            with open(source, 'r', encoding='unicode_escape') as f:
+                code = f.read()
+
+            response = compile_request({
+                'source': code,
+                'mode': 'exe',
+                'optimization': optimization,
+                'output': os.path.join(path, 'a.out'),
+            })
+
+            if response['ok']:
+                install_executable(response['executable'], executable)
+
+            ok, diagnostics = response['ok'], response['diagnostics']
+
+        except Exception as e:
+            ok, diagnostics = False, [f'Internal error: {e}']
+
+    return source, ok, diagnostics, time.perf_counter() - start
+
+def compile_batch(sources, jobs=None, optimization=1, output_dir=None):
+    '''
+        Compiles many programs concurrently in a pool of worker processes.
+        Returns the results of compile_job in the order of the sources.
+    '''
+    from concurrent.futures import ProcessPoolExecutor # only needed here
+
+    executables = executable_names(sources, output_dir)
+
+    if output_dir != None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = [
+            pool.submit(compile_job, s, executable, optimization)
+            for s, executable in zip(sources, executables)
+        ]
+
+        return [f.result() for f in futures]
+
+def print_batch_summary(results, elapsed, jobs):
+    width = max([len(r[0]) for r in results] + [len('file')])
+
+    print(f'{"file":<{width}}  status  time (s)')
+
+    for source, ok, diagnostics, seconds in results:
+        status = 'ok' if ok else 'FAILED'
+        print(f'{source:<{width}}  {status:<6}  {seconds:8.3f}')
+
+        for d in diagnostics:
+            print(f'{"":<{width}}    {d}')
+
+    failed = len([r for r in results if not r[1]])
+    print(f'{len(results)} files, {len(results) - failed} ok, {failed} failed '+\
+          f'in {elapsed:.3f}s with {jobs} jobs')
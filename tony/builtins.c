@@ -1,12 +1,20 @@
 /*
   Built-in functions for Tony
+
+  The source of the runtime. `make runtime` compiles it with clang to
+  builtins.bc, which is linked into every program; without clang the
+  compiler uses builtins.ll, its translation to LLVM IR, which must do
+  the same (tests/test_runtime.py runs both on the same inputs).
+  The types are the ones of llvm_types.py: int is i32, char i8, bool i1.
 */
 #include <stdio.h>
 #include <string.h>
 #include <stdlib.h>
+#include <stdint.h>
+#include <stdbool.h>
 
 typedef int32_t integer;
-typedef int8_t boolean;
+typedef bool boolean;
 typedef int8_t character;
 
 void _puti(integer n) {
@@ -14,7 +22,7 @@ void _puti(integer n) {
 }
 
 void _putb(boolean b) {
-  b == 0 ? printf("false") : printf("true");
+  b ? printf("true") : printf("false");
 }
 
 void _putc(character c) {
@@ -26,41 +34,41 @@ void _puts(character* s) {
 }
 
 integer _geti() {
-  integer n;
+  integer n = 0;
   scanf("%d", &n);
   return n;
 }
 
+// any number but 0 is true
 boolean _getb() {
-  integer b;
+  integer b = 0;
   scanf("%d", &b);
-  return (boolean) b;
+  return b != 0;
 }
 
 character _getc() {
-  character c;
+  character c = 0;
   scanf("%c", &c);
   return c;
 }
 
+// reads at most size-1 characters, until a newline (which is dropped)
+// or the end of the input, and terminates them with \0
 void _gets(integer size, character *s) {
   if( size <= 0 ){
     return;
   }
 
-  character buffer[size];
-  memset(buffer, 0, size);
-
-  int bytes_read = 0;
-  character c;
+  integer bytes_read = 0;
+  int c;
 
-  while(bytes_read <= size-1) { // reserving one byte for \0
+  while(bytes_read < size-1) { // reserving one byte for \0
     c = getchar();
     if (c == EOF || c == '\n') break;
-    buffer[bytes_read++] = c;
+    s[bytes_read++] = c;
   }
 
-  strcpy((char *) s, (char *) buffer);
+  s[bytes_read] = '\0';
 }
 
 integer _abs(integer n) {
@@ -0,0 +1,154 @@
+; Built-in functions for Tony
+;
+; A translation of builtins.c, for when it cannot be compiled with clang
+; (make runtime), that must behave the same (see tests/test_runtime.py).
+; The runtime is linked into every program by Program.codegen and its
+; functions are made internal, so that LLVM can inline them.
+; The signatures are the ones of SymbolTable.builtins, with the LLVM types
+; of llvm_types.py (int: i32, char: i8, bool: i1, arrays: pointers).
+
+@.fmt.int  = private unnamed_addr constant [3 x i8] c"%d\00"
+@.fmt.char = private unnamed_addr constant [3 x i8] c"%c\00"
+@.fmt.str  = private unnamed_addr constant [3 x i8] c"%s\00"
+@.true     = private unnamed_addr constant [5 x i8] c"true\00"
+@.false    = private unnamed_addr constant [6 x i8] c"false\00"
+
+declare i32 @printf(i8* nocapture readonly, ...)
+declare i32 @scanf(i8* nocapture readonly, ...)
+declare i32 @putchar(i32)
+declare i32 @getchar()
+declare i64 @strlen(i8* nocapture)
+declare i32 @strcmp(i8* nocapture, i8* nocapture)
+declare i8* @strcpy(i8* returned, i8* nocapture readonly)
+declare i8* @strcat(i8* returned, i8* nocapture readonly)
+
+define void @_puti(i32 %n) {
+  %fmt = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.int, i64 0, i64 0
+  call i32 (i8*, ...) @printf(i8* %fmt, i32 %n)
+  ret void
+}
+
+define void @_putb(i1 %b) {
+  %true  = getelementptr inbounds [5 x i8], [5 x i8]* @.true, i64 0, i64 0
+  %false = getelementptr inbounds [6 x i8], [6 x i8]* @.false, i64 0, i64 0
+  %s     = select i1 %b, i8* %true, i8* %false
+  %fmt   = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.str, i64 0, i64 0
+  call i32 (i8*, ...) @printf(i8* %fmt, i8* %s)
+  ret void
+}
+
+define void @_putc(i8 %c) {
+  %n = sext i8 %c to i32
+  call i32 @putchar(i32 %n)
+  ret void
+}
+
+define void @_puts(i8* %s) {
+  %fmt = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.str, i64 0, i64 0
+  call i32 (i8*, ...) @printf(i8* %fmt, i8* %s)
+  ret void
+}
+
+define i32 @_geti() {
+  %n   = alloca i32
+  store i32 0, i32* %n
+  %fmt = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.int, i64 0, i64 0
+  call i32 (i8*, ...) @scanf(i8* %fmt, i32* %n)
+  %v   = load i32, i32* %n
+  ret i32 %v
+}
+
+define i1 @_getb() {
+  %b   = alloca i32
+  store i32 0, i32* %b
+  %fmt = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.int, i64 0, i64 0
+  call i32 (i8*, ...) @scanf(i8* %fmt, i32* %b)
+  %v   = load i32, i32* %b
+  %r   = icmp ne i32 %v, 0
+  ret i1 %r
+}
+
+define i8 @_getc() {
+  %c   = alloca i8
+  store i8 0, i8* %c
+  %fmt = getelementptr inbounds [3 x i8], [3 x i8]* @.fmt.char, i64 0, i64 0
+  call i32 (i8*, ...) @scanf(i8* %fmt, i8* %c)
+  %v   = load i8, i8* %c
+  ret i8 %v
+}
+
+; Reads at most size-1 characters until a newline (which is dropped)
+; or EOF, reserving one byte for the terminating \0.
+define void @_gets(i32 %size, i8* %s) {
+entry:
+  %limit = sub i32 %size, 1
+  %empty = icmp sle i32 %size, 0
+  br i1 %empty, label %done, label %loop
+
+loop:
+  %i    = phi i32 [ 0, %entry ], [ %next, %store ]
+  %full = icmp sge i32 %i, %limit
+  br i1 %full, label %terminate, label %read
+
+read:
+  %c    = call i32 @getchar()
+  %eof  = icmp eq i32 %c, -1
+  %nl   = icmp eq i32 %c, 10
+  %stop = or i1 %eof, %nl
+  br i1 %stop, label %terminate, label %store
+
+store:
+  %ch   = trunc i32 %c to i8
+  %idx  = sext i32 %i to i64
+  %ptr  = getelementptr inbounds i8, i8* %s, i64 %idx
+  store i8 %ch, i8* %ptr
+  %next = add nsw i32 %i, 1
+  br label %loop
+
+terminate:
+  %end    = sext i32 %i to i64
+  %endptr = getelementptr inbounds i8, i8* %s, i64 %end
+  store i8 0, i8* %endptr
+  br label %done
+
+done:
+  ret void
+}
+
+define i32 @_abs(i32 %n) {
+  %neg = icmp slt i32 %n, 0
+  %m   = sub nsw i32 0, %n
+  %r   = select i1 %neg, i32 %m, i32 %n
+  ret i32 %r
+}
+
+define i32 @_ord(i8 %c) {
+  %r = sext i8 %c to i32
+  ret i32 %r
+}
+
+define i8 @_chr(i32 %n) {
+  %r = trunc i32 %n to i8
+  ret i8 %r
+}
+
+define i32 @_strlen(i8* %s) {
+  %len = call i64 @strlen(i8* %s)
+  %r   = trunc i64 %len to i32
+  ret i32 %r
+}
+
+define i32 @_strcmp(i8* %s1, i8* %s2) {
+  %r = call i32 @strcmp(i8* %s1, i8* %s2)
+  ret i32 %r
+}
+
+define void @_strcpy(i8* %s1, i8* %s2) {
+  call i8* @strcpy(i8* %s1, i8* %s2)
+  ret void
+}
+
+define void @_strcat(i8* %s1, i8* %s2) {
+  call i8* @strcat(i8* %s1, i8* %s2)
+  ret void
+}
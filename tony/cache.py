@@ -0,0 +1,370 @@
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import llvmlite
+
+from .version import __version__
+from .runtime import RUNTIME_DIR, RUNTIME_SOURCE, RUNTIME_IR, RUNTIME_BITCODE
+
+DEFAULT_CACHE_DIR  = os.path.join(os.path.expanduser('~'), '.cache', 'tonyc')
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024 # bytes
+
+
+ARTIFACTS = {
+    'ir'        : 'optimized.ll',
+    'object'    : 'object.o',
+    'executable': 'executable',
+}
+
+def _hash_file(path, h):
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    h.update(b'\0')
+
+def compiler_sources():
+    ''' The Python sources of the compiler: the tony package and tonyc.py '''
+    sources = []
+    for root, dirs, files in os.walk(RUNTIME_DIR):
+        dirs.sort()
+        sources += [os.path.join(root, f) for f in sorted(files) if f.endswith('.py')]
+
+    return sources + [os.path.join(os.path.dirname(RUNTIME_DIR), 'tonyc.py')]
+
+_compiler_digest = None
+
+def compiler_digest():
+    '''
+        The hash of the sources of the compiler, computed once per
+        process, so that a cache never outlives a change of the compiler
+    '''
+    global _compiler_digest
+
+    if _compiler_digest == None:
+        h = hashlib.sha256()
+        for path in compiler_sources():
+            h.update(os.path.relpath(path, RUNTIME_DIR).encode('utf-8') + b'\0')
+            _hash_file(path, h)
+        _compiler_digest = h.hexdigest()
+
+    return _compiler_digest
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+class CompilationCache:
+    '''
+        On-disk, content-addressed cache of compiled Tony programs.
+
+        Every entry is a directory named after the key of the compilation
+        and holds the optimized IR, the object file and the executable.
+        The key is a hash of everything that affects the output: the source,
+        the optimization level, the version and the sources of the compiler,
+        the version of llvmlite, the runtime (builtins.c, .ll and .bc) and
+        any other options of the compilation (the target CPU, an explicit
+        list of passes). Entries may hold only some of the artifacts, and
+        later compilations of the same key add theirs.
+
+        The least recently used entries are evicted when the total size
+        goes over max_size. Hits and misses are kept in stats.json.
+    '''
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size  = max_size
+        self.entries   = os.path.join(directory, 'entries')
+        os.makedirs(self.entries, exist_ok=True)
+
+    def key(self, source, optimization, options=()):
+        h = hashlib.sha256()
+
+        for part in [__version__, compiler_digest(), llvmlite.__version__, str(optimization), *options]:
+            h.update(part.encode('utf-8') + b'\0')
+
+        for path in [RUNTIME_SOURCE, RUNTIME_IR, RUNTIME_BITCODE]:
+            _hash_file(path, h)
+
+        if isinstance(source, str):
+            source = source.encode('utf-8')
+        h.update(source)
+
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.entries, key)
+
+    def lookup(self, key, artifact='executable'):
+        '''
+            Returns the path of the cached artifact ('ir', 'object' or
+            'executable') of a compilation, or None if it is not cached.
+        '''
+        path = os.path.join(self._entry(key), ARTIFACTS[artifact])
+
+        try:
+            os.utime(self._entry(key)) # mark the entry as recently used
+        except OSError:
+            path = None
+
+        if path == None or not os.path.exists(path):
+            self._record('misses')
+            return None
+
+        self._record('hits')
+        return path
+
+    def store(self, key, ir=None, object_code=None, executable=None):
+        '''
+            Stores the artifacts of a compilation, along with the ones
+            already cached for it. The entry is written in a temporary
+            directory and moved in place at the end, so concurrent readers
+            never see a half-written entry.
+        '''
+        tmp = tempfile.mkdtemp(dir=self.directory)
+
+        new = { 'ir': ir, 'object': object_code, 'executable': executable }
+
+        # the other artifacts of earlier compilations of the same key are kept
+        for artifact, name in ARTIFACTS.items():
+            if new[artifact] != None:
+                continue
+
+            try:
+                os.link(os.path.join(self._entry(key), name), os.path.join(tmp, name))
+            except OSError:
+                pass # not cached, or evicted meanwhile
+
+        if ir != None:
+            with open(os.path.join(tmp, ARTIFACTS['ir']), 'w') as f:
+                f.write(ir)
+
+        if object_code != None:
+            with open(os.path.join(tmp, ARTIFACTS['object']), 'wb') as f:
+                f.write(object_code)
+
+        if executable != None:
+            shutil.copy2(executable, os.path.join(tmp, ARTIFACTS['executable']))
+
+        # replacing the older entry, whose artifacts are in tmp too
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+        try:
+            os.rename(tmp, self._entry(key))
+        except OSError:
+            # another process stored the same compilation first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        ''' Removes the least recently used entries until the cache fits in max_size '''
+        entries = []
+        for key in os.listdir(self.entries):
+            path = self._entry(key)
+            try:
+                entries.append((os.path.getmtime(path), _dir_size(path), path))
+            except OSError:
+                pass # evicted by another process
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._record('evictions')
+
+    def _record(self, counter):
+        with open(os.path.join(self.directory, 'stats.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            stats = self._read_stats()
+            stats[counter] = stats.get(counter, 0) + 1
+
+            with open(os.path.join(self.directory, 'stats.json'), 'w') as f:
+                json.dump(stats, f)
+
+    def _read_stats(self):
+        try:
+            with open(os.path.join(self.directory, 'stats.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self):
+        stats = { 'hits': 0, 'misses': 0, 'evictions': 0 }
+        stats.update(self._read_stats())
+
+        keys = os.listdir(self.entries)
+        stats['entries'] = len(keys)
+        stats['size'] = sum(_dir_size(self._entry(k)) for k in keys)
+        stats['max_size'] = self.max_size
+
+        return stats
+
+
+class FunctionCache:
+    '''
+        On-disk cache of the object code of single functions, used by
+        incremental compilations (see incremental.py).
+
+        Every object file is named after the fingerprint of its function
+        and lives in a subdirectory named after the first two characters
+        of the fingerprint. Like CompilationCache, the least recently used
+        objects are evicted when the total size goes over max_size, but
+        only once per compilation, in evict().
+    '''
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, 'functions'),
+                 max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size  = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.o')
+
+    def lookup(self, key):
+        ''' Returns the cached object code (bytes) of a function, or None '''
+        path = self._path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                object_code = f.read()
+            os.utime(path) # mark the object as recently used
+        except OSError:
+            return None # missing, or evicted by another process
+
+        return object_code
+
+    def store(self, key, object_code):
+        ''' Stores the object code of a function, atomically '''
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(object_code)
+
+        os.replace(tmp, path)
+
+    def _objects(self):
+        for sub in os.listdir(self.directory):
+            sub = os.path.join(self.directory, sub)
+            if not os.path.isdir(sub):
+                continue
+
+            for name in os.listdir(sub):
+                path = os.path.join(sub, name)
+                try:
+                    yield os.path.getmtime(path), os.path.getsize(path), path
+                except OSError:
+                    pass # evicted by another process
+
+    def evict(self):
+        ''' Removes the least recently used objects until the cache fits in max_size '''
+        objects = list(self._objects())
+        total = sum(size for _, size, _ in objects)
+
+        for _, size, path in sorted(objects):
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def record(self, hits, misses):
+        ''' Adds the hits and misses of a compilation to stats.json '''
+        with open(os.path.join(self.directory, 'stats.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            stats = self._read_stats()
+            stats['hits']   = stats.get('hits', 0) + hits
+            stats['misses'] = stats.get('misses', 0) + misses
+
+            with open(os.path.join(self.directory, 'stats.json'), 'w') as f:
+                json.dump(stats, f)
+
+    def _read_stats(self):
+        try:
+            with open(os.path.join(self.directory, 'stats.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self):
+        stats = { 'hits': 0, 'misses': 0 }
+        stats.update(self._read_stats())
+
+        objects = list(self._objects())
+        stats['objects'] = len(objects)
+        stats['size'] = sum(size for _, size, _ in objects)
+        stats['max_size'] = self.max_size
+
+        return stats
+
+
+class MemoryFunctionCache:
+    '''
+        In-memory cache of the object code of single functions, for
+        processes that compile the same program again and again
+        (tonyc.py --watch). It can sit in front of a FunctionCache, which
+        is then read on misses and written through.
+
+        Only the objects that the last compilation used are kept, so the
+        objects of the old versions of edited functions do not pile up.
+    '''
+
+    def __init__(self, backing=None):
+        self.backing = backing
+        self.objects = {}
+        self.used    = set()
+        self.hits    = 0
+        self.misses  = 0
+
+    def lookup(self, key):
+        ''' Returns the cached object code (bytes) of a function, or None '''
+        object_code = self.objects.get(key)
+
+        if object_code == None and self.backing != None:
+            object_code = self.backing.lookup(key)
+            if object_code != None:
+                self.objects[key] = object_code
+
+        if object_code != None:
+            self.used.add(key)
+
+        return object_code
+
+    def store(self, key, object_code):
+        self.objects[key] = object_code
+        self.used.add(key)
+
+        if self.backing != None:
+            self.backing.store(key, object_code)
+
+    def record(self, hits, misses):
+        self.hits   += hits
+        self.misses += misses
+
+        if self.backing != None:
+            self.backing.record(hits, misses)
+
+    def evict(self):
+        ''' Drops the objects that the compilation did not use '''
+        self.objects = { key: self.objects[key] for key in self.used }
+        self.used = set()
+
+        if self.backing != None:
+            self.backing.evict()
+
+    def stats(self):
+        return { 'hits': self.hits, 'misses': self.misses, 'objects': len(self.objects) }
@@ -0,0 +1,166 @@
+import os
+import tempfile
+
+from .abstract_syntax_tree import SymbolTable
+from .lexer     import new_lexer
+from .parser    import new_parser
+from .target    import emit_assembly, emit_object, link_executable
+from .timing    import phase, parse_timed, recording_phases
+from .workspace import frontend_lock
+
+MODES = ['check', 'ast', 'ir', 'asm', 'exe']
+
+def compile_request(request):
+    '''
+        Compiles the source of a single request and returns the response,
+        reporting errors as diagnostics instead of exiting.
+        The request and response fields are described in server.py.
+
+        Every request gets its own AST, SymbolTable and LLVM module,
+        so nothing leaks from one compilation to the next.
+    '''
+    mode = request.get('mode', 'exe')
+    optimization = request.get('optimization', 1)
+
+    if mode not in MODES:
+        return { 'ok': False, 'diagnostics': [f'Unknown mode {mode}'] }
+
+    # LLVM is shared by the requests of all threads
+    with frontend_lock:
+        ''' Lexing & Parsing '''
+        try:
+            ast = new_parser().parse(request['source'], lexer=new_lexer())
+        except Exception as e:
+            return { 'ok': False, 'diagnostics': [str(e)] }
+
+        if mode == 'ast':
+            return { 'ok': True, 'diagnostics': [], 'ast': str(ast) }
+
+        ''' Semantic analysis '''
+        try:
+            ast.sem(SymbolTable())
+        except Exception as e:
+            return { 'ok': False, 'diagnostics': [str(e)] }
+
+        if mode == 'check':
+            return { 'ok': True, 'diagnostics': [] }
+
+        ''' LLVM IR Code Generation '''
+        llvm_module = ast.codegen(opt_level=optimization)
+
+        if mode == 'ir':
+            return { 'ok': True, 'diagnostics': [], 'ir': str(llvm_module) }
+
+        if mode == 'asm':
+            return { 'ok': True, 'diagnostics': [], 'asm': emit_assembly(llvm_module) }
+
+        object_code = emit_object(llvm_module)
+
+    executable = request.get('output')
+    temporary = executable == None
+    if temporary:
+        fd, executable = tempfile.mkstemp(suffix='.out')
+        os.close(fd)
+
+    if not link_executable(object_code, executable):
+        if temporary:
+            os.remove(executable)
+        return { 'ok': False, 'diagnostics': [f'Linking {executable} failed'] }
+
+    return { 'ok': True, 'diagnostics': [], 'executable': executable }
+
+def compile_source(source,
+                   optimization=1,
+                   passes=None,
+                   ast=False,
+                   ir=False,
+                   optimized_ir=False,
+                   object_code=True,
+                   executable=None):
+    '''
+        Compiles a program given as text, for programs that embed the
+        compiler, and returns the result as a dictionary:
+
+            ok           : whether the compilation succeeded
+            diagnostics  : the errors, as strings
+            ast          : the printed AST, if ast is set
+            ir           : the IR before the optimization, if ir is set
+            optimized_ir : the IR after the optimization, if optimized_ir is set
+            object_code  : the object code (bytes), if object_code is set
+            executable   : the path of the executable, linked only if one is given
+            timings      : phase -> { 'wall': seconds, 'cpu': seconds }
+
+        Bytes are decoded like the files tonyc.py reads. Nothing is read
+        from or written to the disk, except for the executable that is
+        linked in a private workspace, and errors never exit: they are
+        returned as diagnostics. It can be called from many threads.
+    '''
+    if isinstance(source, bytes):
+        source = source.decode('unicode_escape')
+
+    result = {
+        'ok': False,
+        'diagnostics': [],
+        'ast': None,
+        'ir': None,
+        'optimized_ir': None,
+        'object_code': None,
+        'executable': None,
+        'timings': {},
+    }
+
+    emit = object_code or executable != None
+
+    with frontend_lock, recording_phases() as timer:
+        ''' Lexing & Parsing '''
+        try:
+            program = parse_timed(new_parser(), source, new_lexer(result['diagnostics']))
+
+            if ast:
+                result['ast'] = str(program)
+
+            ''' Semantic analysis '''
+            with phase('sem'):
+                program.sem(SymbolTable())
+
+            ''' LLVM IR Code Generation, optimization and emission '''
+            if ir or optimized_ir or emit:
+                llvm_module = program.codegen(opt_level=0)
+
+                if ir:
+                    result['ir'] = str(llvm_module)
+
+                with phase('optimize'):
+                    program.optimize_module(level=optimization, passes=passes)
+
+                if optimized_ir:
+                    result['optimized_ir'] = str(llvm_module)
+
+                if emit:
+                    with phase('emit'):
+                        result['object_code'] = emit_object(llvm_module)
+
+        except Exception as e:
+            result['diagnostics'].append(str(e))
+            result['timings'] = _timings(timer)
+            return result
+
+    if executable != None:
+        with timer.span('link', 'phase'):
+            linked = link_executable(result['object_code'], executable)
+
+        if linked:
+            result['executable'] = executable
+        else:
+            result['diagnostics'].append(f'Linking {executable} failed')
+
+    if not object_code:
+        result['object_code'] = None
+
+    result['ok'] = result['diagnostics'] == []
+    result['timings'] = _timings(timer)
+
+    return result
+
+def _timings(timer):
+    return { name: { 'wall': wall, 'cpu': cpu } for name, (wall, cpu) in timer.phases.items() }
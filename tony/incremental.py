@@ -0,0 +1,141 @@
+'''
+    Incremental compilation (tonyc.py --incremental).
+
+    Every function of the program is optimized and compiled to an object
+    file of its own, which is kept in a FunctionCache under the fingerprint
+    of the function. The fingerprint covers everything its code depends on:
+
+        1) its own source, without the bodies of its nested functions
+        2) its resolved signature, with the hidden parameters of
+           extra_accesses and the names of its enclosing scopes
+        3) the signatures of the functions it calls
+        4) the compiler, llvmlite, the target (with its CPU), the
+           optimization level and the explicit list of passes, if any
+
+    so after an edit only the functions whose fingerprint changed are
+    generated, optimized and compiled again; the rest are only declared.
+    The runtime is compiled to an object of its own as well.
+
+    Since every function is optimized on its own, calls between Tony
+    functions are never inlined in this mode.
+'''
+
+import hashlib
+import llvmlite
+
+from .version import __version__
+from .runtime import runtime_bitcode
+from .passes  import run_passes
+from .target  import initialize_llvm, emit_object, target_description
+from .timing  import phase
+from .llvm    import binding
+
+def walk_functions(funcdef):
+    ''' Yields the function and all the functions nested in it, parents first '''
+    stack = [funcdef]
+
+    while stack:
+        f = stack.pop()
+        yield f
+        stack += reversed(f.funcdefs)
+
+def own_source(funcdef, source):
+    ''' The source of the function, without the nested function definitions '''
+    start, end = funcdef.span
+    parts = []
+
+    for nested in funcdef.funcdefs:
+        parts.append(source[start:nested.span[0]])
+        start = nested.span[1]
+
+    parts.append(source[start:end])
+    return ''.join(parts)
+
+def _compilation_parts(optimization, passes=None):
+    pipeline = ','.join(passes) if passes != None else ''
+    return [__version__, llvmlite.__version__, target_description(), str(optimization), pipeline]
+
+def function_fingerprint(funcdef, source, optimization, passes=None):
+    ''' The key of the object code of a function in the FunctionCache '''
+    h = hashlib.sha256()
+
+    parts = _compilation_parts(optimization, passes)
+    parts.append(own_source(funcdef, source))
+    parts.append(funcdef.header.signature())
+
+    for entry in funcdef.callees:
+        # builtins have no header, their signature comes with the version
+        parts.append(entry.header.signature() if entry.header != None else entry.func_name)
+
+    for part in parts:
+        h.update(part.encode('utf-8') + b'\0')
+
+    return h.hexdigest()
+
+def compile_function(llvm_ir, optimization=1, passes=None):
+    ''' Optimizes the text of a module and returns its object code '''
+    module = binding.parse_assembly(llvm_ir, context=binding.create_context())
+    module.verify()
+
+    run_passes(module, optimization, passes=passes)
+    return emit_object(module)
+
+def runtime_object(cache, optimization=1, passes=None):
+    ''' Returns the object code of the runtime, compiling it on a miss '''
+    h = hashlib.sha256()
+    for part in _compilation_parts(optimization, passes):
+        h.update(part.encode('utf-8') + b'\0')
+    h.update(runtime_bitcode())
+
+    key = h.hexdigest()
+
+    object_code = cache.lookup(key)
+    if object_code == None:
+        module = binding.parse_bitcode(runtime_bitcode(), context=binding.create_context())
+        module.triple = binding.get_default_triple()
+
+        run_passes(module, optimization, passes=passes)
+        object_code = emit_object(module)
+        cache.store(key, object_code)
+
+    return object_code
+
+def compile_incremental(program, cache, optimization=1, passes=None):
+    '''
+        Compiles a Program (after sem) to a list of object codes, one per
+        function and one for the runtime, reusing the ones in the cache.
+        Returns the objects and the number of cache hits and misses.
+    '''
+    initialize_llvm()
+
+    functions = list(walk_functions(program.main))
+    objects = {}
+
+    with phase('cache-lookup'):
+        keys = [function_fingerprint(f, program.source, optimization, passes) for f in functions]
+
+        for f, key in zip(functions, keys):
+            object_code = cache.lookup(key)
+            f.reuse = object_code != None
+
+            if f.reuse:
+                objects[key] = object_code
+
+    hits = len(objects)
+    writer = program.codegen_functions()
+
+    with phase('functions'):
+        by_name = { f.llvm_name: key for f, key in zip(functions, keys) }
+
+        for index, name in enumerate(writer.names):
+            object_code = compile_function(writer.function_module(index), optimization, passes)
+
+            objects[by_name[name]] = object_code
+            cache.store(by_name[name], object_code)
+
+        runtime = runtime_object(cache, optimization, passes)
+
+    cache.record(hits, len(functions) - hits)
+    cache.evict()
+
+    return [objects[key] for key in keys] + [runtime], hits, len(functions) - hits
@@ -0,0 +1,36 @@
+import sys
+import ctypes
+import ctypes.util
+from .llvm import binding
+
+from .target import jit_target_machine
+
+_libc = None # loaded on the first run, finding libc runs ldconfig
+
+def run_jit(module):
+    '''
+        Compiles the (optimized) llvmlite.binding module with MCJIT and
+        calls its main function directly, in the current process.
+        The program shares stdin and stdout with the compiler.
+
+        The runtime is linked into the module, so the only external
+        symbols are the ones of libc, which the JIT finds in the process.
+    '''
+    global _libc
+
+    if _libc == None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'))
+
+    engine = binding.create_mcjit_compiler(module, jit_target_machine())
+    engine.finalize_object()
+    engine.run_static_constructors()
+
+    main = ctypes.CFUNCTYPE(None)(engine.get_function_address('main'))
+
+    # the program writes through C stdio, so both buffers are flushed
+    # to keep the output of the compiler and the program in order
+    sys.stdout.flush()
+    main()
+    _libc.fflush(None)
+
+    engine.run_static_destructors()
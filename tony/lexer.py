@@ -1,10 +1,33 @@
-import sys
-import ply.lex as lex
+'''
+    The scanner of Tony.
 
-# Declare the state
-states = (
-    ('multicomment','exclusive'),
-)
+    It replaces the PLY lexer it was written after, with the same tokens,
+    the same line numbers and the same reports of illegal characters, but
+    it is built for throughput:
+
+        1) one regular expression matches the blanks in front of a token
+           and the token itself, and its group tells the kind of the token,
+           so there is no Python callback per token or per blank
+        2) line numbers are counted from the blanks that contain newlines,
+           with str.count
+        3) a comment <* ... *> is skipped with one search per delimiter,
+           instead of one match per character, and comments nest
+        4) tokens are small objects with __slots__, produced on demand
+           by a generator
+
+    The tokens have the attributes of the ones of PLY (type, value,
+    lineno, lexpos), and the scanner the methods that yacc uses.
+
+    For sources of many megabytes, Scanner.arrays() keeps the tokens as a
+    struct of arrays instead (TokenArrays), about 13 bytes per token, which
+    the parser reads through an ArrayLexer.
+'''
+
+import re
+import copy
+import functools
+import itertools
+from array import array
 
 # Key words
 reserved = {
@@ -25,7 +48,7 @@ reserved = {
     'list': 'LIST',
     'mod': 'MOD',
     'new': 'NEW',
-    r'nil\?': 'NIL2',
+    'nil?': 'NIL2',
     'nil': 'NIL',
     'not': 'NOT',
     'or': 'OR',
@@ -62,103 +85,345 @@ tokens = [
     'ASSIGN',
 ] + list(reserved.values())
 
-# Names
-def t_NAME(t):
-     r'[a-zA-Z_][a-zA-Z_0-9_\?]*'
-     t.type = reserved.get(t.value, 'NAME') # Check for reserved words
-     if (t.value == 'nil?'): t.type = 'NIL2'
-     return t
-
-# nil?
-def t_NIL2(t):
-    r'nil\?'
-    return t
-
-# Numbers
-def t_NUMBER(t):
-    r'\d+'
-    t.value = int(t.value)
-    return t
-
-# Symbolic operators
-t_PLUS     = r'\+'
-t_MINUS    = r'-'
-t_TIMES    = r'\*'
-t_DIVIDE   = r'/'
-t_EQUAL    = r'='
-t_NOTEQUAL = r'<>'
-t_LESS     = r'<'
-t_GREATER  = r'>'
-t_LEQ      = r'<='
-t_GEQ      = r'>='
-t_HASH     = r'[#]'
-
-# Seperators
-t_LPAREN    = r'\('
-t_RPAREN    = r'\)'
-t_LBRACKET  = r'\['
-t_RBRACKET  = r'\]'
-t_COMMA     = r','
-t_SEMICOLON = r';'
-t_COLON     = r':'
-t_ASSIGN    = r':='
-
-# Char
-t_CHAR = r'\'[^\'\"\\]\''
-
-# Strings
-t_STRING = r'\"[^\'\"\\]*\"'
-
-# Define a rule so we can track line numbers
-def t_newline(t):
-    r'\n+'
-    t.lexer.lineno += len(t.value)
-
-# A string containing ignored characters (spaces and tabs)
-t_ignore  = ' \t'
-
-def t_singlecomment(t):
-     r'\%.*'
-     pass
-     # No return value. Token discarded
-
-def t_multicomment(t):
-    r'<\*'
-    t.lexer.level = 1
-    t.lexer.begin('multicomment')
-    pass
-
-def t_multicomment_open(t):
-    r'<\*'
-    t.lexer.level += 1
-    pass
-
-def t_multicomment_close(t):
-    r'\*>'
-    t.lexer.level -= 1
-    if t.lexer.level == 0:
-        t.lexer.begin('INITIAL')
-    pass
-
-def t_multicomment_symbols(t):
-    r'.'
-    pass
-
-t_multicomment_ignore = ' \t'
-
-def t_multicomment_newline(t):
-    r'\n+'
-    t.lexer.lineno += len(t.value)
-
-def t_multicomment_error(t):
-    print('Comment Error...')
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
-
-def t_error(t):
-    print('Error...')
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
+# Symbolic operators and separators
+operators = {
+    '+' : 'PLUS',
+    '-' : 'MINUS',
+    '*' : 'TIMES',
+    '/' : 'DIVIDE',
+    '=' : 'EQUAL',
+    '<>': 'NOTEQUAL',
+    '<' : 'LESS',
+    '>' : 'GREATER',
+    '<=': 'LEQ',
+    '>=': 'GEQ',
+    '#' : 'HASH',
+    '(' : 'LPAREN',
+    ')' : 'RPAREN',
+    '[' : 'LBRACKET',
+    ']' : 'RBRACKET',
+    ',' : 'COMMA',
+    ';' : 'SEMICOLON',
+    ':' : 'COLON',
+    ':=': 'ASSIGN',
+}
+
+# The groups of _token, in the order they are tried. Spaces and tabs are
+# ignored; a run of blanks with a newline is group _NEWLINES, so that the
+# lines are only counted when there is one. Any other character is
+# _ILLEGAL, so that the whole input is matched by one finditer, which only
+# starts again after a comment.
+_NEWLINES, _NAME, _NUMBER, _COMMENT, _CHAR, _STRING, _OPERATOR, _LINE_COMMENT, _ILLEGAL = range(1, 10)
+
+_token = re.compile(
+    r'[ \t]*(\n[ \t\n]*)?(?:'
+    r'([a-zA-Z_][a-zA-Z_0-9?]*)'          # names, key words and nil?
+    r'|(\d+)'                             # numbers
+    r'|(<\*)'                             # comments, which nest
+    r"|('[^'\"\\]')"                      # characters
+    r'|("[^\'"\\]*")'                     # strings
+    r'|(<>|<=|>=|:=|[-+*/=<>#()\[\],;:])' # operators, the longest first
+    r'|(%[^\n]*)'                         # comments until the end of the line
+    r'|([^ \t\n])'                        # illegal characters
+    r')'
+)
+
+# the delimiters of the nested comments
+_comment = re.compile(r'(<\*)|(\*>)')
+
+# the characters that end a string, or make it illegal
+_string_stop = re.compile(r'[\'"\\]')
+
+class Token:
+    ''' A token, like the LexToken of PLY '''
+
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
+
+class Scanner:
+    '''
+        Splits the source given to input() into tokens, returned one at
+        a time by token() (None at the end), as yacc expects of a lexer.
+
+        Illegal characters are skipped. They are reported in
+        diagnostics, if the caller collects them there, or printed.
+
+        All the state of a scan is reset by input(), so a Scanner can be
+        used for one source after the other, and one Scanner per thread
+        for many sources at the same time.
+    '''
+
+    def __init__(self, diagnostics=None):
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self.diagnostics = diagnostics
+        self.token = _end
+
+    def input(self, data):
+        '''
+            Starts scanning data: the whole source, or an iterable of the
+            consecutive pieces of a source that is too big to be kept
+            (see source.py). Tokens, comments and blanks may run from one
+            piece into the next. The pieces are not kept, so lexdata is
+            None then.
+        '''
+        chunks = (data,) if isinstance(data, str) else data
+
+        self.lexdata = data if isinstance(data, str) else None
+        self.lexpos = 0
+        self.lineno = 1
+        self.token = functools.partial(next, itertools.starmap(Token, self._scan(chunks)), None)
+
+    def begin(self, state):
+        # comments are skipped as a whole, so there is no state between tokens
+        pass
+
+    def clone(self):
+        return copy.copy(self)
+
+    def __iter__(self):
+        return iter(self.token, None)
+
+    def _scan(self, chunks):
+        '''
+            Scans the consecutive pieces of a source and yields the
+            (type, value, lineno, lexpos) of every token, for input()
+            and arrays(). Illegal characters are reported on the way.
+        '''
+        keywords = reserved
+        symbols = operators
+        lineno = self.lineno
+        chunks = iter(chunks)
+        chunk = next(chunks, None)
+        data = ''   # the part of the source being scanned
+        base = 0    # its offset in the source
+        pos = 0
+        level = 0   # the nesting of the comment at pos
+
+        while chunk != None:
+            # the rest of the previous piece is scanned again with this one
+            base += pos
+            data = data[pos:] + chunk
+            pos = 0
+            end = len(data)
+
+            # read ahead, so that the last piece is scanned without checks
+            chunk = next(chunks, None)
+            more = chunk != None
+
+            while True:
+                if level:
+                    pos, lineno, level = _skip_comment(data, pos, lineno, level, final=not more)
+                    if level:
+                        break # it goes on in the next piece
+
+                for m in _token.finditer(data, pos):
+                    kind = m.lastindex
+
+                    if more and _incomplete(m, kind, data, end):
+                        break
+
+                    newlines, value = m.group(_NEWLINES, kind)
+                    start, pos = m.span(kind)
+
+                    if newlines:
+                        lineno += newlines.count('\n')
+
+                    if kind == _NAME:
+                        yield keywords.get(value, 'NAME'), value, lineno, base + start
+
+                    elif kind == _OPERATOR:
+                        yield symbols[value], value, lineno, base + start
+
+                    elif kind == _NUMBER:
+                        yield 'NUMBER', int(value), lineno, base + start
+
+                    elif kind == _STRING:
+                        yield 'STRING', value, lineno, base + start
+
+                    elif kind == _CHAR:
+                        yield 'CHAR', value, lineno, base + start
+
+                    elif kind == _COMMENT:
+                        level = 1
+                        break
+
+                    elif kind == _ILLEGAL:
+                        self.lineno = lineno
+                        self._illegal(value, 'Error...')
+                else:
+                    # only blanks are left
+                    lineno += data.count('\n', pos, end)
+                    pos = end
+                    break
+
+                if not level:
+                    break # a token that may go on in the next piece
+
+        self.lineno = lineno
+        self.lexpos = base + pos
+
+    def arrays(self, data):
+        '''
+            Scans a whole source into a TokenArrays, which takes much less
+            memory than a Token per token. The source may be given in
+            pieces, like to input(). Illegal characters are reported as
+            they are found, like by input().
+
+            It only pays off when the tokens are kept: yacc still gets a
+            Token per token from the ArrayLexer, so parsing through it is
+            a little slower than parsing from input() (see the README).
+        '''
+        chunks = (data,) if isinstance(data, str) else data
+
+        self.lexdata = data if isinstance(data, str) else None
+        self.lexpos = 0
+        self.lineno = 1
+        self.token = _end
+
+        stream = TokenArrays(self.lexdata)
+        kinds, offsets, lines, values = stream.kinds, stream.offsets, stream.lines, stream.values
+        interned = {} # value -> its index in the table
+        intern = interned.setdefault
+        kind_of = _kind_ids
+
+        for type, value, lineno, start in self._scan(chunks):
+            kinds.append(kind_of[type])
+            offsets.append(start)
+            lines.append(lineno)
+            values.append(intern(value, len(interned)))
+
+        stream.table = list(interned)
+        return stream
+
+    def _illegal(self, character, kind):
+        errormsg = "Illegal character '%s'" % character
+
+        if self.diagnostics != None:
+            self.diagnostics.append(f'{errormsg} in line {self.lineno}')
+        else:
+            print(kind)
+            print(errormsg)
+
+def _skip_comment(data, pos, lineno, level=1, final=True):
+    '''
+        Skips the rest of a comment <* ... *> that starts before pos,
+        with the comments nested in it, at the given level of nesting.
+        Returns the position after it, the line number there and 0, or,
+        if data is not the end of the source (not final) and the comment
+        goes on after it, how far it got and the level of nesting there.
+    '''
+    while level > 0:
+        delimiter = _comment.search(data, pos)
+
+        if delimiter == None:
+            if final:
+                # the comment is never closed, it ends with the input
+                return len(data), lineno + data.count('\n', pos), 0
+
+            # the last character may be the start of a delimiter
+            stop = max(pos, len(data) - 1)
+            return stop, lineno + data.count('\n', pos, stop), level
+
+        lineno += data.count('\n', pos, delimiter.start())
+        level += 1 if delimiter.lastindex == 1 else -1
+        pos = delimiter.end()
+
+    return pos, lineno, 0
+
+def _incomplete(m, kind, data, end):
+    '''
+        Whether the token of m may go on after the end of data: when it
+        reaches the end, or when it is a quote whose string or character
+        may be closed after it.
+    '''
+    if m.end() == end:
+        return True
+
+    if kind == _ILLEGAL:
+        quote = m.group(kind)
+
+        if quote == '"':
+            return _string_stop.search(data, m.end()) == None
+
+        if quote == "'":
+            return m.end() + 2 > end
+
+    return False
+
+def _end():
+    return None
+
+# the ids of the kinds of tokens in a TokenArrays
+_kind_ids = { kind: i for i, kind in enumerate(tokens) }
+
+class TokenArrays:
+    '''
+        The tokens of a source as a struct of arrays, for sources too big
+        for a Token per token: the i-th token has the kind tokens[kinds[i]]
+        and the value table[values[i]], and starts at offsets[i], in line
+        lines[i]. The values (names, numbers, strings, key words, ...) are
+        interned in table, so every distinct one is kept once.
+
+        Made by Scanner.arrays(), and parsed through an ArrayLexer. The
+        source is None if it was scanned in pieces.
+    '''
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.offsets = array('I')
+        self.lines = array('I')
+        self.values = array('I')
+        self.table = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        return Token(tokens[self.kinds[i]], self.table[self.values[i]], self.lines[i], self.offsets[i])
+
+    def __iter__(self):
+        types = map(tokens.__getitem__, self.kinds)
+        values = map(self.table.__getitem__, self.values)
+
+        return itertools.starmap(Token, zip(types, values, self.lines, self.offsets))
+
+class ArrayLexer:
+    '''
+        Adapter that hands the tokens of a TokenArrays to yacc, one Token
+        at a time, so that only the tokens on the stack of the parser are
+        objects: parser.parse(lexer=ArrayLexer(stream)).
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lexdata = stream.source
+        self.token = functools.partial(next, iter(stream), None)
+
+    def input(self, data):
+        # yacc only calls it when parse() is given a source
+        self.__init__(Scanner().arrays(data))
+
+    def __iter__(self):
+        return iter(self.token, None)
+
+def new_lexer(diagnostics=None):
+    '''
+        A lexer of its own, to be used with a parser of new_parser() by
+        one thread. Illegal characters are appended to diagnostics, if
+        it is a list, instead of being printed.
+    '''
+    return Scanner(diagnostics)
 
 # Build the lexer
-lexer = lex.lex() # Use parameter debug=1 to debug
+lexer = Scanner()
@@ -0,0 +1,29 @@
+'''
+    llvmlite, imported on first use.
+
+    Loading llvmlite.binding loads the whole of LLVM, which is most of the
+    start up time of tonyc. Everything in tony imports ir and binding from
+    here, so runs that stop before code generation (--ast, syntax and
+    semantic errors) never load llvmlite at all.
+'''
+
+import sys
+import importlib.util
+
+def lazy_import(name):
+    ''' Returns the module, which is executed on its first attribute access '''
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
+
+ir      = lazy_import('llvmlite.ir')
+binding = lazy_import('llvmlite.binding')
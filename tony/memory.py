@@ -0,0 +1,205 @@
+'''
+    Memory profiling of the compilation phases (tonyc.py --mem-report).
+
+    While a MemoryProfiler is active, every `with phase(...)` of the
+    compiler also takes a tracemalloc snapshot when the phase ends, and
+    records the peak of the traced memory during the phase, the memory it
+    retained, the call sites that allocated what it retained and the live
+    AST nodes per class.
+
+    tracemalloc only sees the memory of Python objects; the memory of LLVM
+    itself (after ir-parse) shows up in the max RSS column only.
+
+    The peak of a phase needs tracemalloc.reset_peak, which is only in
+    Python 3.9 and later. Before that, the traced memory is sampled by a
+    thread during the phases instead, and the peak of a phase is the
+    highest sample, or the peak of the process when the phase raised it.
+'''
+
+import gc
+import sys
+import json
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+_profiler = None
+
+TOP_ENTRIES = 10
+
+SAMPLE_INTERVAL = 0.001 # seconds, without tracemalloc.reset_peak
+
+# the allocations of the profiler itself
+IGNORED = { tracemalloc.__file__, __file__ }
+
+def _max_rss():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _site(stat):
+    frame = stat.traceback[0]
+    return f'{frame.filename}:{frame.lineno}'
+
+def ast_census():
+    '''
+        Returns {class name: [count, bytes]} for the live AST nodes,
+        bytes being the size of the nodes and of their attribute dicts
+    '''
+    from .abstract_syntax_tree.node import Node
+
+    classes = {}
+    for o in gc.get_objects():
+        # not isinstance, which would load the lazy modules (llvm.py)
+        # through their __class__
+        cls = type(o)
+        if issubclass(cls, Node):
+            entry = classes.setdefault(cls.__name__, [0, 0])
+            entry[0] += 1
+            entry[1] += sys.getsizeof(o) + sys.getsizeof(o.__dict__)
+
+    return classes
+
+class MemoryProfiler:
+    ''' Records the traced memory of every phase '''
+
+    def __init__(self, frames=1):
+        self.phases = {} # phase -> dict, in the order they ended
+        self.nodes  = {} # the largest AST census seen at a phase boundary
+
+        tracemalloc.start(frames)
+        self.snapshot = tracemalloc.take_snapshot()
+
+        # the highest samples of the phases in progress, innermost last
+        self.samples = None
+        if not hasattr(tracemalloc, 'reset_peak'):
+            self.samples = []
+            self.lock = threading.Lock()
+            self.stopped = threading.Event()
+            self.sampler = threading.Thread(target=self._sample, daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        if self.samples != None:
+            self.stopped.set()
+            self.sampler.join()
+
+        self.snapshot = None
+        tracemalloc.stop()
+
+    def _sample(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            current, _ = tracemalloc.get_traced_memory()
+
+            with self.lock:
+                self.samples[:] = [max(sample, current) for sample in self.samples]
+
+    @contextmanager
+    def phase(self, name):
+        start, peak_before = tracemalloc.get_traced_memory()
+
+        if self.samples == None:
+            tracemalloc.reset_peak()
+        else:
+            with self.lock:
+                self.samples.append(start)
+
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+
+            if self.samples != None:
+                with self.lock:
+                    sampled = self.samples.pop()
+
+                # the peak of the process is the one of the phase if the phase raised it
+                if peak <= peak_before:
+                    peak = max(sampled, current)
+
+            snapshot = tracemalloc.take_snapshot()
+            diff = [
+                d for d in snapshot.compare_to(self.snapshot, 'lineno')
+                if d.traceback[0].filename not in IGNORED
+            ]
+            self.snapshot = snapshot
+
+            nodes = ast_census()
+            if sum(b for _, b in nodes.values()) > sum(b for _, b in self.nodes.values()):
+                self.nodes = nodes
+
+            self.phases[name] = {
+                'peak'     : peak,
+                'retained' : current - start,
+                'current'  : current,
+                'max_rss'  : _max_rss(),
+                'ast_nodes': sum(c for c, _ in nodes.values()),
+                'sites'    : [
+                    { 'site': _site(d), 'bytes': d.size_diff, 'blocks': d.count_diff }
+                    for d in diff[:TOP_ENTRIES] if d.size_diff > 0
+                ],
+            }
+
+    def summary(self):
+        ''' Returns the machine-readable report of --mem-report '''
+        top = sorted(self.nodes.items(), key=lambda n: -n[1][1])[:TOP_ENTRIES]
+
+        return {
+            'phases'   : self.phases,
+            'peak'     : max([p['peak'] for p in self.phases.values()], default=0),
+            'max_rss'  : _max_rss(),
+            'ast_nodes': [
+                { 'class': name, 'count': count, 'bytes': size }
+                for name, (count, size) in top
+            ],
+        }
+
+    def report(self):
+        ''' Returns the table of --mem-report '''
+        MiB = 1024 * 1024
+
+        lines = [f'{"phase":<16} {"peak (MiB)":>12} {"retained (MiB)":>15} {"max rss (MiB)":>14}']
+        for name, p in self.phases.items():
+            lines.append(f'{name:<16} {p["peak"]/MiB:>12.2f} {p["retained"]/MiB:>15.2f} {p["max_rss"]/MiB:>14.2f}')
+
+        summary = self.summary()
+        if summary['ast_nodes']:
+            lines += ['', f'{"AST class":<24} {"count":>10} {"MiB":>10}']
+            for n in summary['ast_nodes']:
+                lines.append(f'{n["class"]:<24} {n["count"]:>10} {n["bytes"]/MiB:>10.2f}')
+
+        for name, p in self.phases.items():
+            if p['sites']:
+                lines += ['', f'top allocations retained by {name}:']
+                for s in p['sites'][:5]:
+                    lines.append(f'  {s["bytes"]/MiB:>10.2f} MiB  {s["site"]}')
+
+        return '\n'.join(lines)
+
+    def write_summary(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+def start_memory_profile(frames=1):
+    ''' Starts tracing allocations, returns the MemoryProfiler '''
+    global _profiler
+    _profiler = MemoryProfiler(frames)
+    return _profiler
+
+def stop_memory_profile():
+    ''' Stops tracing allocations, returns the MemoryProfiler (or None) '''
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler != None:
+        profiler.stop()
+    return profiler
+
+@contextmanager
+def memory_phase(name):
+    ''' Marks a phase of the compilation for the memory profiler '''
+    if _profiler == None:
+        yield
+        return
+
+    with _profiler.phase(name):
+        yield
@@ -0,0 +1,111 @@
+'''
+    Statistics of the LLVM optimizations (tonyc.py --opt-report).
+
+    Program.optimize_module collects them when it is asked for a report:
+    the size of every function before and after the passes, and the time
+    of every pass as measured by LLVM's -time-passes.
+'''
+
+import re
+
+from .llvm import binding
+
+# the columns of LLVM's timing report and their names in our report
+TIMING_COLUMNS = {
+    'User Time'  : 'user',
+    'System Time': 'system',
+    'User+System': 'user+system',
+    'Wall Time'  : 'wall',
+}
+
+_column = re.compile(r'-+\s*([A-Za-z+ ]+?)\s*-+')
+_value  = re.compile(r'([0-9.]+) \(\s*[0-9.]+%\)')
+
+def function_stats(module):
+    '''
+        Returns the number of instructions, basic blocks and calls
+        of every function defined in the llvmlite.binding module
+    '''
+    stats = {}
+
+    for f in module.functions:
+        if f.is_declaration:
+            continue
+
+        blocks = instructions = calls = 0
+        for b in f.blocks:
+            blocks += 1
+            for i in b.instructions:
+                instructions += 1
+                if i.opcode in ('call', 'invoke'):
+                    calls += 1
+
+        stats[f.name] = {
+            'instructions': instructions,
+            'blocks'      : blocks,
+            'calls'       : calls,
+        }
+
+    return stats
+
+def parse_pass_timings(report):
+    '''
+        Parses the text of binding.report_and_reset_timings() into a list
+        of {'pass', 'wall', 'user', ...} dicts (in seconds), slowest first
+    '''
+    passes  = []
+    columns = []
+
+    for line in report.splitlines():
+        if '--- Name ---' in line:
+            columns = [TIMING_COLUMNS.get(c) for c in _column.findall(line)]
+            continue
+
+        values = _value.findall(line)
+        if not values or not columns:
+            continue
+
+        name = _value.sub('', line).strip()
+        if name == 'Total':
+            continue
+
+        entry = { 'pass': name }
+        for column, value in zip(columns, values):
+            if column != None:
+                entry[column] = float(value)
+
+        passes.append(entry)
+
+    return sorted(passes, key=lambda p: -p.get('wall', 0))
+
+def _totals(stats):
+    keys = ['instructions', 'blocks', 'calls']
+    return { k: sum(s[k] for s in stats.values()) for k in keys }
+
+def optimization_report(level, before, after, timings):
+    ''' Combines the statistics of one optimize_module call into a dict '''
+    functions = {}
+    for name in before:
+        functions[name] = { 'before': before[name], 'after': after.get(name) }
+    for name in after:
+        if name not in before:
+            functions[name] = { 'before': None, 'after': after[name] }
+
+    passes = parse_pass_timings(timings)
+
+    return {
+        'optimization': level,
+        'pass_seconds': round(sum(p.get('wall', 0) for p in passes), 6),
+        'passes'      : passes,
+        'totals'      : { 'before': _totals(before), 'after': _totals(after) },
+        'functions'   : functions,
+    }
+
+def start_pass_timing():
+    binding.set_time_passes(True)
+
+def stop_pass_timing():
+    ''' Returns the text of LLVM's timing report and turns the timers off '''
+    timings = binding.report_and_reset_timings()
+    binding.set_time_passes(False)
+    return timings
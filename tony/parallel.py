@@ -0,0 +1,161 @@
+'''
+    Parallel optimization and code generation of a program (tonyc.py -j N).
+
+    The function passes only look at one function at a time, so the
+    functions written by the ModuleWriter are split into partitions,
+    every partition is parsed and optimized as a module of its own in a
+    pool of worker processes, and the optimized partitions are linked
+    back together (as bitcode) before the module passes run on the whole
+    program in the parent process.
+
+    The optimized module is split again for code generation: every worker
+    gets the whole module, keeps the bodies of the functions of its
+    partition and marks the rest available_externally, so that LLVM does
+    not emit them. The internal and private symbols of the module are made
+    external with hidden visibility in every partition, so the partitions
+    can reference each other's, and the global variables are emitted by
+    the first partition. The object files are linked in partition order.
+'''
+
+import time
+
+from .passes import run_function_passes
+from .target import initialize_llvm, set_target_cpu, target_cpu, emit_object
+from .llvm   import binding
+
+# more partitions than workers, so that a slow partition does not
+# leave the other workers idle
+PARTITIONS_PER_JOB = 4
+
+def partition(sizes, count):
+    '''
+        Splits the indices of the sizes into count partitions of about
+        the same total size, biggest first into the smallest partition.
+        Every partition keeps the indices in order, and the result only
+        depends on the sizes, so the output of the compiler is the same
+        in every run.
+    '''
+    partitions = [[] for _ in range(min(count, len(sizes)))]
+    totals = [0] * len(partitions)
+
+    for index in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+        smallest = totals.index(min(totals))
+        partitions[smallest].append(index)
+        totals[smallest] += sizes[index]
+
+    return [sorted(p) for p in partitions if p != []]
+
+def optimize_partition(llvm_ir, level):
+    '''
+        Runs in a worker: parses the text of a partition, runs the function
+        passes on it and returns its bitcode and the CPU time of the passes
+    '''
+    module = binding.parse_assembly(llvm_ir, context=binding.create_context())
+
+    start = time.process_time()
+    run_function_passes(module, level)
+    seconds = time.process_time() - start
+
+    return module.as_bitcode(), seconds
+
+def _initialize_worker(cpu, features):
+    set_target_cpu(cpu, features)
+    initialize_llvm()
+
+def _run_pool(worker, tasks, jobs):
+    ''' Runs the worker on every task in jobs processes, returns the results in order '''
+    from concurrent.futures import ProcessPoolExecutor # only needed here
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_initialize_worker, initargs=target_cpu()) as pool:
+        futures = [pool.submit(worker, *task) for task in tasks]
+        return [f.result() for f in futures]
+
+def _stats(jobs, partitions, functions, results, start):
+    wall = time.perf_counter() - start
+    cpu  = sum(seconds for _, seconds in results)
+
+    return {
+        'jobs'              : jobs,
+        'partitions'        : partitions,
+        'functions'         : functions,
+        'cpu_seconds'       : round(cpu, 6),
+        'wall_seconds'      : round(wall, 6),
+        'cpu_utilization'   : round(cpu / wall, 3) if wall > 0 else None,
+    }
+
+def parallel_function_passes(writer, level, jobs, context):
+    '''
+        Runs the function passes on the functions of the ModuleWriter in
+        jobs worker processes. Returns the linked llvmlite.binding module
+        (in the given context) and the statistics of the run:
+        the CPU seconds of the passes in the workers, the wall seconds of
+        the whole step, and their ratio, the CPU utilization (how many
+        workers were busy on average; it is not compared with a serial run).
+    '''
+    start = time.perf_counter()
+
+    sizes = [len(f) for f in writer.functions]
+    partitions = partition(sizes, jobs * PARTITIONS_PER_JOB)
+
+    results = _run_pool(optimize_partition,
+        [(writer.partition_module(p), level) for p in partitions], jobs)
+
+    module = None
+    for bitcode, _ in results:
+        part = binding.parse_bitcode(bitcode, context=context)
+
+        if module == None:
+            module = part
+        else:
+            module.link_in(part)
+
+    return module, _stats(jobs, len(partitions), len(sizes), results, start)
+
+def emit_partition(bitcode, functions, globals):
+    '''
+        Runs in a worker: emits the object code of the given functions of
+        the module (and of its global variables, if globals is set).
+        Returns the object code and the CPU time of the code generation.
+    '''
+    module = binding.parse_bitcode(bitcode, context=binding.create_context())
+
+    for value in list(module.functions) + list(module.global_variables):
+        if value.is_declaration or value.name.startswith('llvm.'):
+            continue
+
+        if value.linkage in (binding.Linkage.internal, binding.Linkage.private):
+            value.linkage = 'external'
+            value.visibility = 'hidden'
+
+        owned = value.name in functions if value.is_function else globals
+        if not owned:
+            value.linkage = 'available_externally'
+
+    start = time.process_time()
+    object_code = emit_object(module)
+    seconds = time.process_time() - start
+
+    return object_code, seconds
+
+def parallel_emit(module, jobs):
+    '''
+        Emits the object code of the optimized llvmlite.binding module in
+        jobs worker processes. Returns the object codes, in the order they
+        must be linked, and the statistics of the run (as in
+        parallel_function_passes, with the CPU seconds of the workers).
+    '''
+    start = time.perf_counter()
+
+    defined = [f for f in module.functions if not f.is_declaration]
+    names = [f.name for f in defined]
+    sizes = [len(str(f)) for f in defined]
+    partitions = partition(sizes, jobs)
+
+    bitcode = module.as_bitcode()
+    results = _run_pool(emit_partition, [
+        (bitcode, { names[i] for i in p }, index == 0)
+        for index, p in enumerate(partitions)
+    ], jobs)
+
+    objects = [object_code for object_code, _ in results]
+    return objects, _stats(jobs, len(partitions), len(names), results, start)
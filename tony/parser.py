@@ -1,9 +1,14 @@
+import os
 import sys
+import copy
+import hashlib
 import ply.yacc as yacc
 from .abstract_syntax_tree import *
+from .version import __version__
+from .cache   import DEFAULT_CACHE_DIR
 
 # Get the token map from the lexer.
-from .lexer import tokens
+from .lexer import tokens, new_lexer
 
 start = 'program'
 
@@ -20,12 +25,14 @@ precedence = (
 
 def p_program(p):
     '''program : funcdef'''
-    p[0] = Program(p[1])
+    p[0] = Program(p[1], source=p.lexer.lexdata)
 
 #======== Function definition ========
 def p_funcdef(p):
     '''funcdef : DEF header COLON funcdefhelp stmt stmtlist END'''
-    p[0] = FuncDef(p[2], p[4], p[5], p[6])
+    # the span of the source from def to end (used by incremental.py)
+    span = (p.lexpos(1), p.lexpos(7) + len(p[7]))
+    p[0] = FuncDef(p[2], p[4], p[5], p[6], span=span)
 
 def p_funcdefhelp_funcdef(p):
     '''funcdefhelp : funcdef funcdefhelp'''
@@ -341,8 +348,87 @@ def p_empty(p):
 
 #================= Error =================
 def p_error(p):
-    errormsg = f'Syntax error in line {p.lineno}, unexpected token {p.value}'
+    if p == None:
+        errormsg = 'Syntax error, unexpected end of input'
+    else:
+        errormsg = f'Syntax error in line {p.lineno}, unexpected token {p.value}'
     raise Exception(errormsg)
 
+#================ Parser =================
+class Parser(yacc.LRParser):
+    ''' The LR parser of PLY, which makes a lexer of its own if parse() is given none '''
+
+    def parse(self, input=None, lexer=None, *args, **kwargs):
+        if lexer == None:
+            lexer = new_lexer()
+
+        return super().parse(input, lexer, *args, **kwargs)
+
+#================ Tables =================
+TABLES_DIR = os.path.join(DEFAULT_CACHE_DIR, 'tables')
+
+def tables_version():
+    '''
+        The LALR tables stay valid as long as the grammar, the tokens,
+        the compiler and PLY stay the same.
+    '''
+    h = hashlib.sha256()
+    h.update(f'{__version__} {yacc.__version__} {yacc.__tabversion__}'.encode('utf-8'))
+
+    for module in ['tony.parser', 'tony.lexer']:
+        with open(sys.modules[module].__file__, 'rb') as f:
+            h.update(f.read())
+
+    return h.hexdigest()[:16]
+
+def build_parser(tables_dir=TABLES_DIR):
+    '''
+        Loads the prebuilt LALR tables of this version of the grammar from
+        tables_dir and binds them to the p_ functions, without reflecting
+        over the grammar. If there are none yet, PLY generates them once
+        and they are written there for the next runs.
+
+        No parser.out or parsetab.py is ever written.
+    '''
+    tables = os.path.join(tables_dir, f'parsetab-{tables_version()}.pickle')
+
+    try:
+        lr = yacc.LRTable()
+        lr.read_pickle(tables)
+        lr.bind_callables(globals())
+        return Parser(lr, p_error)
+    except Exception:
+        pass # missing or unreadable, generated below
+
+    this_module = sys.modules[__name__]
+
+    try:
+        os.makedirs(tables_dir, exist_ok=True)
+    except OSError:
+        # nowhere to keep the tables, so they are built in memory every time
+        parser = yacc.yacc(module=this_module, debug=False, write_tables=False)
+        parser.__class__ = Parser
+        return parser
+
+    # written under a private name and renamed, so that concurrent
+    # compilers never read half-written tables
+    partial = f'{tables}.{os.getpid()}'
+    parser = yacc.yacc(module=this_module, debug=False, picklefile=partial)
+    parser.__class__ = Parser # yacc makes an LRParser
+
+    if os.path.exists(partial):
+        os.replace(partial, tables)
+
+    return parser
+
+def new_parser():
+    '''
+        A parser of its own, sharing the LALR tables of parser but not
+        the stacks of a parse, which yacc keeps on the parser. Together
+        with a lexer of new_lexer(), one per thread, sources can be
+        parsed by many threads at the same time.
+    '''
+    return copy.copy(parser)
+
 # Build the parser
-parser = yacc.yacc()
+parser = build_parser()
@@ -0,0 +1,114 @@
+from .target import target_machine
+from .llvm   import binding
+
+# -Os and -Oz run the -O2 pipeline, tuned for size
+SIZE_LEVELS = { 's': 1, 'z': 2 }
+
+def optimization_levels(level):
+    ''' Returns the speed and the size level of an optimization level (0-3, 's' or 'z') '''
+    if level in SIZE_LEVELS:
+        return 2, SIZE_LEVELS[level]
+
+    return level, 0
+
+def inlining_threshold(level):
+    ''' The inlining threshold of clang for the optimization level '''
+    opt_level, size_level = optimization_levels(level)
+
+    if size_level == 1:
+        return 75
+    if size_level == 2:
+        return 25
+    if opt_level > 2:
+        return 250
+
+    return 225
+
+def pass_manager_builder(level):
+    opt_level, size_level = optimization_levels(level)
+
+    pmb = binding.PassManagerBuilder()
+    pmb.opt_level = opt_level
+    pmb.size_level = size_level
+    pmb.inlining_threshold = inlining_threshold(level)
+
+    # like clang, the vectorizers run from -O2 up, except at -Oz
+    pmb.loop_vectorize = opt_level > 1 and size_level < 2
+    pmb.slp_vectorize  = opt_level > 1 and size_level < 2
+
+    return pmb
+
+def pass_names():
+    ''' The names of the passes that can be given to --passes '''
+    prefix, suffix = 'add_', '_pass'
+
+    return sorted(
+        name[len(prefix):-len(suffix)].replace('_', '-')
+        for name in dir(binding.ModulePassManager)
+        if name.startswith(prefix) and name.endswith(suffix)
+    )
+
+def parse_pass_list(passes):
+    '''
+        Parses a comma separated list of pass names (as in --passes)
+        into a list, checking that every pass exists
+    '''
+    names = [name.strip() for name in passes.split(',') if name.strip() != '']
+    known = pass_names()
+
+    for name in names:
+        if name.replace('_', '-') not in known:
+            errormsg = f'Unknown pass {name}, the passes are: {", ".join(known)}'
+            raise Exception(errormsg)
+
+    return [name.replace('_', '-') for name in names]
+
+def run_pass_list(module, passes):
+    ''' Runs the given passes, in order, on the whole module '''
+    mpm = binding.ModulePassManager()
+    target_machine().add_analysis_passes(mpm)
+
+    for name in passes:
+        getattr(mpm, f'add_{name.replace("-", "_")}_pass')()
+
+    mpm.run(module)
+
+def run_function_passes(module, level=1, functions=None):
+    '''
+        Runs the function passes of the given level on the functions
+        of the module with the given names (on all of them by default)
+    '''
+    fpm = binding.FunctionPassManager(module)
+    target_machine().add_analysis_passes(fpm)
+    pass_manager_builder(level).populate(fpm)
+    fpm.initialize()
+
+    for func in module.functions:
+        if functions == None or func.name in functions:
+            fpm.run(func)
+
+    fpm.finalize()
+
+def run_passes(module, level=1, functions=None, passes=None):
+    '''
+        Runs the optimization pipeline of the given level on an
+        llvmlite.binding module: the function passes on every function
+        (or on the given ones, if the rest were already optimized),
+        then the module passes. An explicit list of passes replaces
+        the pipeline of the level.
+    '''
+    if passes != None:
+        run_pass_list(module, passes)
+        return
+
+    if level == 0:
+        return
+
+    # Run local optimizations on functions
+    run_function_passes(module, level, functions)
+
+    # Run GLOBAL optimizations on the module
+    mpm = binding.ModulePassManager()
+    target_machine().add_analysis_passes(mpm)
+    pass_manager_builder(level).populate(mpm)
+    mpm.run(module)
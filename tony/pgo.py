@@ -0,0 +1,212 @@
+'''
+    Profile-guided optimization (tonyc.py --pgo-gen / --pgo-use).
+
+    Every function entry, call, if/elsif condition and for loop of the
+    program owns a few counters, numbered by sem in the order of the
+    source. With --pgo-gen the code generation increments them, and
+    the runtime appends them to the profile file when the program exits
+    (see pgo_runtime.ll, which is only linked into these programs). Every
+    run adds a record, so a program can be run on many inputs before its
+    profile is used:
+
+        magic, checksum of the source, n, counter 0, ..., counter n-1
+
+    (64-bit words in the byte order of the machine). With --pgo-use the
+    records of the same source are summed up, and the code generation
+    attaches them to the IR: function_entry_count to every function,
+    branch_weights to every conditional branch and call, and a
+    ProfileSummary to the module, which LLVM uses to lay out the hot
+    paths, inline the hot calls and unroll the hot loops.
+'''
+
+import sys
+import struct
+import hashlib
+
+from .llvm import ir
+
+MAGIC = struct.unpack('<q', b'TONY_PGO')[0]
+
+DEFAULT_PROFILE = 'default.tonyprof'
+
+# the cutoffs (in millionths of the total count) of the detailed summary
+SUMMARY_CUTOFFS = [
+    10000, 100000, 200000, 300000, 400000, 500000, 600000, 700000,
+    800000, 900000, 950000, 990000, 999000, 999900, 999990, 999999,
+]
+
+def source_checksum(source):
+    ''' The checksum of a program that identifies the records of its profile '''
+    digest = hashlib.sha256(source.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & (2**63 - 1)
+
+def read_profile(path, checksum, size):
+    '''
+        Sums up the records of the profile with the given checksum and
+        number of counters. Returns the counters (None if there are no
+        such records) and the number of runs; records of other versions of
+        the program are skipped, with a warning.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    counters = [0] * size
+    runs = stale = 0
+    offset = 0
+
+    while offset + 24 <= len(data):
+        magic, record_checksum, n = struct.unpack_from('=qqq', data, offset)
+        offset += 24
+
+        if magic != MAGIC or offset + 8 * n > len(data):
+            errormsg = f'The profile {path} is corrupt'
+            raise Exception(errormsg)
+
+        if record_checksum == checksum and n == size:
+            for i, c in enumerate(struct.unpack_from(f'={n}Q', data, offset)):
+                counters[i] += c
+            runs += 1
+        else:
+            stale += 1
+
+        offset += 8 * n
+
+    if stale > 0:
+        print(f'warning: {stale} records of {path} are for another version of the program', file=sys.stderr)
+
+    if runs == 0:
+        print(f'warning: {path} has no records of the program, it is not optimized with it', file=sys.stderr)
+        counters = None
+
+    return counters, runs
+
+def summary_entries(counters):
+    ''' The (cutoff, minimum count, number of counts) entries of the detailed summary '''
+    counts = sorted((c for c in counters if c > 0), reverse=True)
+    total = sum(counts)
+
+    entries = []
+    index = cumulative = 0
+
+    for cutoff in SUMMARY_CUTOFFS:
+        while index < len(counts) and cumulative * 1000000 < cutoff * total:
+            cumulative += counts[index]
+            index += 1
+
+        if index > 0:
+            entries.append((cutoff, counts[index - 1], index))
+
+    return entries
+
+class ProfileGen:
+    ''' Generates the code that counts the executions (--pgo-gen) '''
+
+    def __init__(self, module, size, checksum, path):
+        self.size = size
+        self.checksum = checksum
+        self.path = path
+
+        i64 = ir.IntType(64)
+
+        # linkonce_odr, so that the copies of the partitions of tonyc.py -j
+        # are merged into one when they are linked
+        self.counters = ir.GlobalVariable(module, ir.ArrayType(i64, max(size, 1)), '__tony.pgo.counters')
+        self.counters.linkage = 'linkonce_odr'
+        self.counters.initializer = ir.Constant(self.counters.value_type, None)
+
+        self.register = ir.Function(module,
+            ir.FunctionType(ir.VoidType(), [i64.as_pointer(), i64, i64, ir.IntType(8).as_pointer()]),
+            name='_pgo_register')
+
+    def count(self, builder, index):
+        ''' Increments the counter with the given index '''
+        i32 = ir.IntType(32)
+
+        ptr = builder.gep(self.counters, [ir.Constant(i32, 0), ir.Constant(i32, index)], inbounds=True)
+        builder.store(builder.add(builder.load(ptr), ir.Constant(ir.IntType(64), 1)), ptr)
+
+    def entry(self, builder, func, index, main=False):
+        ''' Counts the entries of the function; main also registers the counters '''
+        if main:
+            path = bytearray(self.path.encode('utf-8') + b'\0')
+            text = ir.GlobalVariable(func.module, ir.ArrayType(ir.IntType(8), len(path)),
+                                     func.module.get_unique_name(f'{func.name}.pgo.path'))
+            text.linkage = 'private'
+            text.global_constant = True
+            text.initializer = ir.Constant(text.value_type, path)
+
+            i64 = ir.IntType(64)
+            builder.call(self.register, [
+                builder.bitcast(self.counters, i64.as_pointer()),
+                ir.Constant(i64, self.size),
+                ir.Constant(i64, self.checksum),
+                builder.bitcast(text, ir.IntType(8).as_pointer()),
+            ])
+
+        self.count(builder, index)
+
+    def branch(self, instr, taken, evaluated):
+        pass
+
+    def call(self, instr, index):
+        pass
+
+class ProfileUse:
+    ''' Attaches the counts of a profile to the IR (--pgo-use) '''
+
+    def __init__(self, module, counters):
+        self.module = module
+        self.counters = counters
+
+    def count(self, builder, index):
+        pass
+
+    def entry(self, builder, func, index, main=False):
+        func.set_metadata('prof', self.module.add_metadata([
+            'function_entry_count', ir.Constant(ir.IntType(64), self.counters[index])
+        ]))
+
+    def branch(self, instr, taken, evaluated):
+        '''
+            Attaches the weights of a conditional branch, from the counter of
+            the times it was taken and the one of the times it was evaluated
+        '''
+        taken, evaluated = self.counters[taken], self.counters[evaluated]
+        self._weights(instr, [taken, max(evaluated - taken, 0)])
+
+    def call(self, instr, index):
+        self._weights(instr, [self.counters[index]])
+
+    def _weights(self, instr, weights):
+        # the weights are 32 bits, only their ratios matter
+        scale = max(1, (max(weights) + 2**32 - 2) // (2**32 - 1))
+
+        instr.set_metadata('prof', self.module.add_metadata(
+            ['branch_weights'] + [ir.Constant(ir.IntType(32), w // scale) for w in weights]
+        ))
+
+    def summary(self, functions):
+        '''
+            Adds the ProfileSummary of the counters to the module flags,
+            functions being the indices of the entry counters
+        '''
+        i32, i64 = ir.IntType(32), ir.IntType(64)
+        entries = [self.counters[i] for i in functions]
+        md = self.module.add_metadata
+
+        fields = [
+            md(['ProfileFormat', 'InstrProf']),
+            md(['TotalCount', ir.Constant(i64, sum(self.counters))]),
+            md(['MaxCount', ir.Constant(i64, max(self.counters, default=0))]),
+            md(['MaxInternalCount', ir.Constant(i64, max(self.counters, default=0))]),
+            md(['MaxFunctionCount', ir.Constant(i64, max(entries, default=0))]),
+            md(['NumCounts', ir.Constant(i64, len(self.counters))]),
+            md(['NumFunctions', ir.Constant(i64, len(entries))]),
+            md(['DetailedSummary', md([
+                md([ir.Constant(i32, cutoff), ir.Constant(i64, count), ir.Constant(i32, n)])
+                for cutoff, count, n in summary_entries(self.counters)
+            ])]),
+        ]
+
+        self.module.add_named_metadata('llvm.module.flags',
+            [ir.Constant(i32, 1), 'ProfileSummary', md(fields)])
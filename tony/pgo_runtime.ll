@@ -0,0 +1,50 @@
+; Runtime of the instrumented programs (tonyc.py --pgo-gen)
+;
+; It is only linked into the programs compiled with --pgo-gen, after the
+; runtime of builtins.ll: main registers the counters of the program, and
+; they are appended to the profile file as one record (magic, checksum of
+; the source, number of counters, counters) when the program exits.
+; See pgo.py.
+
+@.pgo.header   = internal global [3 x i64] [i64 5712623022793183060, i64 0, i64 0]
+@.pgo.counters = internal global i64* null
+@.pgo.path     = internal global i8* null
+@.pgo.mode     = private unnamed_addr constant [3 x i8] c"ab\00"
+
+declare i32 @atexit(void ()*)
+declare i8* @fopen(i8* nocapture readonly, i8* nocapture readonly)
+declare i64 @fwrite(i8* nocapture readonly, i64, i64, i8* nocapture)
+declare i32 @fclose(i8* nocapture)
+
+define void @_pgo_dump() {
+  %path = load i8*, i8** @.pgo.path
+  %mode = getelementptr inbounds [3 x i8], [3 x i8]* @.pgo.mode, i64 0, i64 0
+  %file = call i8* @fopen(i8* %path, i8* %mode)
+  %fail = icmp eq i8* %file, null
+  br i1 %fail, label %done, label %write
+
+write:
+  %header   = bitcast [3 x i64]* @.pgo.header to i8*
+  call i64 @fwrite(i8* %header, i64 8, i64 3, i8* %file)
+  %sizeptr  = getelementptr inbounds [3 x i64], [3 x i64]* @.pgo.header, i64 0, i64 2
+  %size     = load i64, i64* %sizeptr
+  %counters = load i64*, i64** @.pgo.counters
+  %data     = bitcast i64* %counters to i8*
+  call i64 @fwrite(i8* %data, i64 8, i64 %size, i8* %file)
+  call i32 @fclose(i8* %file)
+  br label %done
+
+done:
+  ret void
+}
+
+define void @_pgo_register(i64* %counters, i64 %size, i64 %checksum, i8* %path) {
+  %checksumptr = getelementptr inbounds [3 x i64], [3 x i64]* @.pgo.header, i64 0, i64 1
+  store i64 %checksum, i64* %checksumptr
+  %sizeptr     = getelementptr inbounds [3 x i64], [3 x i64]* @.pgo.header, i64 0, i64 2
+  store i64 %size, i64* %sizeptr
+  store i64* %counters, i64** @.pgo.counters
+  store i8* %path, i8** @.pgo.path
+  call i32 @atexit(void ()* @_pgo_dump)
+  ret void
+}
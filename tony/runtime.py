@@ -0,0 +1,71 @@
+import os
+from .llvm import binding
+
+RUNTIME_DIR     = os.path.dirname(os.path.abspath(__file__))
+RUNTIME_SOURCE  = os.path.join(RUNTIME_DIR, 'builtins.c')
+RUNTIME_IR      = os.path.join(RUNTIME_DIR, 'builtins.ll')  # its translation to LLVM IR
+RUNTIME_BITCODE = os.path.join(RUNTIME_DIR, 'builtins.bc')  # built from it by make runtime
+PGO_RUNTIME_IR  = os.path.join(RUNTIME_DIR, 'pgo_runtime.ll')
+
+_bitcode = {}
+
+def _compile(path):
+    with open(path, 'r') as f:
+        runtime = binding.parse_assembly(f.read(), context=binding.create_context())
+    runtime.verify()
+    return runtime.as_bitcode()
+
+def runtime_bitcode():
+    '''
+        Returns the Tony runtime as LLVM bitcode: the builtins.bc that
+        make runtime compiles from builtins.c with clang, if it is up to
+        date, or else builtins.ll, compiled once per process.
+    '''
+    if RUNTIME_IR in _bitcode:
+        return _bitcode[RUNTIME_IR]
+
+    prebuilt = os.path.exists(RUNTIME_BITCODE) and\
+               os.path.getmtime(RUNTIME_BITCODE) >= os.path.getmtime(RUNTIME_SOURCE)
+
+    if prebuilt:
+        with open(RUNTIME_BITCODE, 'rb') as f:
+            _bitcode[RUNTIME_IR] = f.read()
+    else:
+        _bitcode[RUNTIME_IR] = _compile(RUNTIME_IR)
+
+    return _bitcode[RUNTIME_IR]
+
+def pgo_runtime_bitcode():
+    '''
+        Returns the runtime of the instrumented programs (--pgo-gen) as
+        LLVM bitcode, compiled once per process from pgo_runtime.ll.
+    '''
+    if PGO_RUNTIME_IR not in _bitcode:
+        _bitcode[PGO_RUNTIME_IR] = _compile(PGO_RUNTIME_IR)
+
+    return _bitcode[PGO_RUNTIME_IR]
+
+def link_runtime(module, context, pgo=False):
+    '''
+        Links the runtime into the llvmlite.binding module (parsed in the
+        given context) and makes the runtime functions internal, so that the
+        optimizer can inline them and drop the ones that are not used.
+        With pgo set, the runtime of the instrumented programs is linked
+        as well. Returns the names of the runtime functions.
+    '''
+    defined = []
+
+    for bitcode in [runtime_bitcode()] + ([pgo_runtime_bitcode()] if pgo else []):
+        runtime = binding.parse_bitcode(bitcode, context=context)
+        runtime.triple = module.triple
+        runtime.data_layout = module.data_layout
+
+        names = [f.name for f in runtime.functions if not f.is_declaration]
+
+        module.link_in(runtime)
+        defined += names
+
+    for name in defined:
+        module.get_function(name).linkage = 'internal'
+
+    return defined
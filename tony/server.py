@@ -0,0 +1,90 @@
+'''
+    A long-running compile server for tonyc.
+
+    The server keeps the parser tables, LLVM and the target machine warm
+    and compiles the programs it receives over a UNIX socket. Every request
+    and every response is a single line of JSON.
+
+    Request fields:
+        source       : the Tony program (required)
+        mode         : 'check', 'ast', 'ir', 'asm' or 'exe' (default 'exe')
+        optimization : the optimization level (default 1)
+        output       : where to write the executable (mode 'exe' only),
+                       by default a new temporary file
+
+    Response fields:
+        ok          : True if the compilation succeeded
+        diagnostics : a list of error messages
+        ast, ir, asm, executable : the requested output
+'''
+
+import os
+import json
+import signal
+import socket
+import socketserver
+
+from .driver import compile_request
+from .target import initialize_llvm, target_machine
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    ''' Serves the requests of one client connection, one JSON per line '''
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = compile_request(json.loads(line))
+            except Exception as e:
+                response = { 'ok': False, 'diagnostics': [f'Internal error: {e}'] }
+
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class CompileServer(socketserver.UnixStreamServer):
+    ''' UNIX socket server that handles the requests one at a time '''
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        # warming up LLVM before the first request arrives
+        initialize_llvm()
+        target_machine()
+
+        super().__init__(socket_path, CompileRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(socket_path):
+    ''' Runs the compile server on the given UNIX socket until interrupted '''
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    with CompileServer(socket_path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+def send_request(socket_path, source, **options):
+    '''
+        Thin client for the compile server. Sends the source and the options
+        (mode, optimization, output) and returns the response as a dict.
+    '''
+    message = dict(options, source=source)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+        with s.makefile('rb') as f:
+            return json.loads(f.readline())
@@ -0,0 +1,82 @@
+'''
+    Reading sources too big to be kept in memory.
+
+    A source is read in pieces, from an mmap of its file or from stdin,
+    and every piece is decoded like readFile does (unicode_escape, with
+    universal newlines) and handed to the lexer, which takes an iterable
+    of pieces as well as a whole source (Scanner.input). The memory that
+    the source takes is then a piece or two, whatever its size.
+
+    A piece never ends inside an escape: the bytes from the last
+    backslashes near its end on are decoded with the next piece.
+'''
+
+import io
+import os
+import sys
+import mmap
+import codecs
+
+CHUNK_SIZE = 1024 * 1024 # bytes
+
+# no escape is longer, not even \N{...}
+_LONGEST_ESCAPE = 256
+
+def decode_chunks(chunks):
+    '''
+        Decodes consecutive pieces of a source (bytes) with unicode_escape,
+        translating all line ends to newlines, and yields the text of each.
+    '''
+    newlines = io.IncrementalNewlineDecoder(None, translate=True)
+    rest = b''
+
+    for chunk in chunks:
+        data = rest + chunk
+
+        cut = data.rfind(b'\\', max(0, len(data) - _LONGEST_ESCAPE))
+        if cut == -1:
+            cut = len(data)
+
+        # a backslash may be escaped by the one before it
+        while cut > 0 and data[cut - 1] == ord('\\'):
+            cut -= 1
+
+        rest = data[cut:]
+        yield newlines.decode(codecs.unicode_escape_decode(data[:cut])[0])
+
+    yield newlines.decode(codecs.unicode_escape_decode(rest)[0], final=True)
+
+def mapped_chunks(path, chunk_size=CHUNK_SIZE):
+    ''' The bytes of a file in pieces, read through an mmap of it '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return # an empty file cannot be mapped
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start:start + chunk_size]
+
+                # the piece was copied, so its pages can leave the memory of
+                # the process (they stay in the page cache)
+                if hasattr(mmap, 'MADV_DONTNEED') and start % mmap.PAGESIZE == 0:
+                    mapped.madvise(mmap.MADV_DONTNEED, start, min(chunk_size, len(mapped) - start))
+
+def stdin_chunks(chunk_size=CHUNK_SIZE):
+    ''' The bytes of stdin in pieces '''
+    while True:
+        chunk = sys.stdin.buffer.read(chunk_size)
+        if not chunk:
+            return
+
+        yield chunk
+
+def read_source(file=None, chunk_size=CHUNK_SIZE):
+    '''
+        The text of the source in file (stdin if None) in pieces, for
+        parser.parse(read_source(file), lexer=new_lexer()).
+    '''
+    chunks = stdin_chunks(chunk_size) if file == None else mapped_chunks(file, chunk_size)
+    return decode_chunks(chunks)
@@ -0,0 +1,179 @@
+import os
+import sys
+import shutil
+import subprocess
+from .llvm      import binding
+from .workspace import workspace, install_executable
+
+_llvm_initialized = False
+_target_machines  = {}
+
+# the CPU and the features we generate code for ('' is the generic CPU of the triple)
+_target_cpu      = ''
+_target_features = ''
+
+def initialize_llvm():
+    ''' Initializes the native LLVM target. Safe to call more than once,
+        the initialization happens only the first time.
+    '''
+    global _llvm_initialized
+
+    if _llvm_initialized:
+        return
+
+    binding.initialize()
+    binding.initialize_native_target()
+    binding.initialize_native_asmprinter()
+
+    _llvm_initialized = True
+
+def set_target_cpu(cpu='', features=''):
+    '''
+        Selects the CPU (-march/-mcpu) and the extra features of the code
+        we generate. 'native' stands for the CPU of the host and all
+        of its features. The same TargetMachine is used by the optimizer
+        (for its cost models) and for emission.
+    '''
+    global _target_cpu, _target_features
+
+    if cpu == 'native':
+        initialize_llvm()
+        cpu = binding.get_host_cpu_name()
+        features = ','.join(f for f in [binding.get_host_cpu_features().flatten(), features] if f)
+
+    _target_cpu, _target_features = cpu, features
+
+def target_cpu():
+    ''' Returns the CPU and the features selected with set_target_cpu '''
+    return _target_cpu, _target_features
+
+def target_description():
+    ''' The triple, CPU and features we generate code for, as one string '''
+    return f'{binding.get_default_triple()} {_target_cpu} {_target_features}'
+
+def target_machine(codegen_opt_level=2):
+    '''
+        Returns a TargetMachine for the host, creating it on first use.
+        Target machines are expensive to create, so we keep one per
+        code generation optimization level and CPU for the lifetime
+        of the process.
+
+        The machine emits position independent code, the same as
+        running llc with --relocation-model=pic.
+    '''
+    initialize_llvm()
+
+    key = (codegen_opt_level, _target_cpu, _target_features)
+    if key not in _target_machines:
+        target = binding.Target.from_default_triple()
+        _target_machines[key] = target.create_target_machine(
+            cpu = _target_cpu,
+            features = _target_features,
+            opt = codegen_opt_level,
+            reloc = 'pic',
+            codemodel = 'default'
+        )
+
+    return _target_machines[key]
+
+def jit_target_machine():
+    ''' Returns the TargetMachine used by the JIT, creating it on first use '''
+    initialize_llvm()
+
+    if 'jit' not in _target_machines:
+        target = binding.Target.from_default_triple()
+        _target_machines['jit'] = target.create_target_machine(jit=True)
+
+    return _target_machines['jit']
+
+def emit_object(module):
+    ''' Compiles an llvmlite.binding module to a native object file
+        and returns its contents as bytes, without touching the disk.
+    '''
+    return target_machine().emit_object(module)
+
+def emit_assembly(module):
+    ''' Compiles an llvmlite.binding module to native assembly '''
+    return target_machine().emit_assembly(module)
+
+def write_bitcode(module, output):
+    '''
+        Writes an llvmlite.binding module as LLVM bitcode to the file
+        output ('-' for stdout)
+    '''
+    bitcode = module.as_bitcode()
+
+    if output == '-':
+        sys.stdout.flush()
+        sys.stdout.buffer.write(bitcode)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output, 'wb') as f:
+            f.write(bitcode)
+
+def write_ir(module, output):
+    '''
+        Writes an llvmlite.binding module as text LLVM IR to the file
+        output ('-' for stdout).
+
+        The text of the whole module is never built in Python: the module
+        is handed to llvm-dis as bitcode, which is several times smaller,
+        and llvm-dis writes the text out one function at a time. Without
+        llvm-dis the module is printed as a whole.
+    '''
+    llvm_dis = shutil.which('llvm-dis')
+
+    if llvm_dis == None:
+        if output == '-':
+            print(module)
+        else:
+            with open(output, 'w') as f:
+                print(module, file=f)
+        return
+
+    if output == '-':
+        sys.stdout.flush()
+
+    subprocess.run([llvm_dis, '-', '-o', output], input=module.as_bitcode(), check=True)
+
+def link_executable(object_code, executable, show_commands=False):
+    '''
+        Links the given object code (bytes) into an executable.
+        The Tony runtime is already part of the object code, so only libc
+        is linked in. This is the only step that runs an external process;
+        the object file only lives in a temporary file for the duration
+        of the gcc call. Returns whether gcc succeeded.
+    '''
+    return link_objects([object_code], executable, show_commands)
+
+def link_objects(objects, executable, show_commands=False):
+    '''
+        Links a list of object codes (bytes) into an executable, in order.
+        The objects are written to a private workspace and passed to gcc
+        through a response file, as there may be thousands of them. gcc
+        links inside the workspace too, and the executable is then moved
+        to its name in one step (see workspace.py). Returns whether gcc
+        succeeded.
+    '''
+    with workspace() as path:
+        paths = []
+        for i, object_code in enumerate(objects):
+            object_path = os.path.join(path, f'{i}.o')
+            with open(object_path, 'wb') as f:
+                f.write(object_code)
+            paths.append(object_path)
+
+        response = os.path.join(path, 'objects')
+        with open(response, 'w') as f:
+            f.write('\n'.join(paths))
+
+        output = os.path.join(path, 'a.out')
+        cmd_gcc = ['gcc', f'@{response}', '-o', output]
+
+        linked = subprocess.run(cmd_gcc).returncode == 0
+        if show_commands: print(' '.join(cmd_gcc[:-1] + [executable]))
+
+        if linked:
+            install_executable(output, executable)
+
+        return linked
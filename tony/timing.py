@@ -0,0 +1,199 @@
+'''
+    Timing of the compilation phases (tonyc.py --time-phases / --trace).
+
+    The compiler marks its phases with `with phase('sem'):` and the
+    functions of the program with the traced decorator. Nothing is recorded
+    unless a PhaseTimer has been started with start_timing(), so the marks
+    cost almost nothing in normal compilations. The phases are also the
+    boundaries of the memory profiler (memory.py).
+
+    The timer that is recording is a context variable, so a thread (or an
+    asyncio task) only records its own phases: another thread that runs
+    llc or gcc in the meantime does not add them to the timer of a
+    compile_source.
+'''
+
+import os
+import json
+import time
+import resource
+import functools
+from contextvars import ContextVar
+from contextlib  import contextmanager
+
+from .memory import memory_phase
+
+_timer = ContextVar('timer', default=None)
+
+def _cpu_time():
+    # the CPU time of this process and of its finished children (llc, gcc)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+class PhaseTimer:
+    ''' Records the wall and CPU time of every phase and function span '''
+
+    def __init__(self):
+        self.start  = time.perf_counter()
+        self.events = [] # chrome trace events
+        self.phases = {} # phase -> [wall, cpu], in the order they started
+
+    @contextmanager
+    def span(self, name, category, args=None):
+        wall_start = time.perf_counter()
+        cpu_start  = _cpu_time()
+
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu  = _cpu_time() - cpu_start
+
+            self.events.append({
+                'name': name,
+                'cat' : category,
+                'ph'  : 'X',
+                'ts'  : (wall_start - self.start) * 1e6,
+                'dur' : wall * 1e6,
+                'pid' : os.getpid(),
+                'tid' : 0,
+                'args': dict(args or {}, cpu_ms=round(cpu * 1e3, 3)),
+            })
+
+            if category == 'phase':
+                totals = self.phases.setdefault(name, [0.0, 0.0])
+                totals[0] += wall
+                totals[1] += cpu
+
+    def add_phase(self, name, wall, cpu):
+        ''' Adds time that was measured outside of a span (e.g. the lexer) '''
+        totals = self.phases.setdefault(name, [0.0, 0.0])
+        totals[0] += wall
+        totals[1] += cpu
+
+    def report(self):
+        ''' Returns the table of --time-phases '''
+        total_wall = sum(w for w, _ in self.phases.values())
+        total_cpu  = sum(c for _, c in self.phases.values())
+
+        lines = [f'{"phase":<16} {"wall (ms)":>12} {"cpu (ms)":>12} {"wall %":>8}']
+        for name, (wall, cpu) in self.phases.items():
+            share = 100 * wall / total_wall if total_wall > 0 else 0
+            lines.append(f'{name:<16} {wall*1e3:>12.2f} {cpu*1e3:>12.2f} {share:>7.1f}%')
+        lines.append(f'{"total":<16} {total_wall*1e3:>12.2f} {total_cpu*1e3:>12.2f} {100.0:>7.1f}%')
+
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        ''' Writes the spans in the Chrome trace event format '''
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+class TimedLexer:
+    '''
+        Wraps the lexer and adds up the time spent producing tokens,
+        so that lexing and parsing can be told apart even though yacc
+        interleaves them.
+    '''
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.wall  = 0.0
+        self.cpu   = 0.0
+
+    def input(self, data):
+        self.lexer.input(data)
+
+    def token(self):
+        wall_start = time.perf_counter()
+        cpu_start  = time.process_time()
+
+        tok = self.lexer.token()
+
+        self.wall += time.perf_counter() - wall_start
+        self.cpu  += time.process_time() - cpu_start
+        return tok
+
+    def __getattr__(self, name):
+        return getattr(self.lexer, name)
+
+def start_timing():
+    ''' Starts recording phases, returns the PhaseTimer '''
+    timer = PhaseTimer()
+    _timer.set(timer)
+    return timer
+
+def stop_timing():
+    ''' Stops recording phases, returns the PhaseTimer (or None) '''
+    timer = _timer.get()
+    _timer.set(None)
+    return timer
+
+@contextmanager
+def recording_phases():
+    '''
+        Records the phases of the block with a new PhaseTimer, which it
+        yields, and puts back the timer that was recording before it
+    '''
+    timer = PhaseTimer()
+    token = _timer.set(timer)
+
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+@contextmanager
+def phase(name, **args):
+    ''' Marks a phase of the compilation '''
+    timer = _timer.get()
+
+    with memory_phase(name):
+        if timer == None:
+            yield
+            return
+
+        with timer.span(name, 'phase', args):
+            yield
+
+def parse_timed(parser, code, lexer):
+    '''
+        Parses the code, recording the lexer and the parser as two phases
+        when timing is on.
+    '''
+    timer = _timer.get()
+
+    if timer == None:
+        with memory_phase('parse'):
+            return parser.parse(code, lexer=lexer)
+
+    timed_lexer = TimedLexer(lexer)
+    timer.add_phase('lex', 0.0, 0.0) # listed before the parser
+
+    try:
+        with memory_phase('parse'), timer.span('parse', 'phase'):
+            return parser.parse(code, lexer=timed_lexer)
+    finally:
+        # the time of the lexer is moved from the parse phase to its own
+        timer.add_phase('lex', timed_lexer.wall, timed_lexer.cpu)
+        timer.add_phase('parse', -timed_lexer.wall, -timed_lexer.cpu)
+
+def traced(category, name):
+    '''
+        Decorator that records a span for every call of the method,
+        named after name(self). Used for FuncDef.sem and FuncDef.codegen.
+    '''
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            timer = _timer.get()
+
+            if timer == None:
+                return method(self, *args, **kwargs)
+
+            with timer.span(name(self), category):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
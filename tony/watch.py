@@ -0,0 +1,145 @@
+'''
+    Watch mode (tonyc.py --watch).
+
+    The compiler stays up, with the parser, LLVM and the object code of
+    every function in memory, and rebuilds the program every time its
+    file changes. The rebuilds are incremental (see incremental.py): only
+    the functions whose fingerprint changed are compiled again. After
+    every build the program can be run on a list of input files.
+
+    The file is polled, so that nothing but the standard library is
+    needed and editors that replace the file on save are handled too.
+'''
+
+import os
+import sys
+import time
+import signal
+import subprocess
+
+from .abstract_syntax_tree import SymbolTable
+from .cache       import MemoryFunctionCache
+from .incremental import compile_incremental
+from .lexer       import new_lexer
+from .parser      import new_parser
+from .source      import read_source
+from .target      import initialize_llvm, target_machine, link_objects
+from .workspace   import frontend_lock
+
+POLL_INTERVAL = 0.1 # seconds
+
+class Watcher:
+    ''' Rebuilds (and runs) a program when its file changes '''
+
+    def __init__(self, path, executable, optimization=1, passes=None,
+                 run=False, inputs=None, cache=None, out=sys.stdout):
+        self.path = path
+        self.executable = executable
+        self.optimization = optimization
+        self.passes = passes
+        self.run = run
+        self.inputs = inputs or []
+        self.cache = MemoryFunctionCache(backing=cache)
+        self.out = out
+        self.builds = 0
+
+        # warming up LLVM before the first build
+        initialize_llvm()
+        target_machine()
+
+    def _print(self, *args):
+        print(*args, file=self.out, flush=True)
+
+    def _version(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None # being replaced by an editor
+
+        return st.st_mtime_ns, st.st_size
+
+    def build(self):
+        '''
+            Compiles the program, reusing the functions that did not change,
+            and reports the time it took. Returns whether it succeeded.
+        '''
+        start = time.perf_counter()
+        diagnostics = []
+
+        try:
+            # the fingerprints of the functions need the whole source
+            code = ''.join(read_source(self.path))
+
+            with frontend_lock:
+                program = new_parser().parse(code, lexer=new_lexer(diagnostics))
+                program.sem(SymbolTable())
+
+                objects, hits, misses = compile_incremental(program, self.cache, self.optimization, self.passes)
+
+        except Exception as e:
+            for d in diagnostics:
+                self._print(d)
+            self._print(str(e) or f'Compiling {self.path} failed')
+            return False
+
+        for d in diagnostics:
+            self._print(d)
+
+        if not link_objects(objects, self.executable):
+            self._print(f'Linking {self.executable} failed')
+            return False
+
+        self.builds += 1
+        kind = 'built' if self.builds == 1 else 'rebuilt'
+        self._print(f'{kind} {self.executable} in {(time.perf_counter() - start) * 1e3:.0f} ms '
+                    f'({hits} functions reused, {misses} compiled)')
+
+        return True
+
+    def run_program(self):
+        ''' Runs the executable on every input file (on no input if there are none) '''
+        for input_file in self.inputs or [None]:
+            if input_file != None:
+                self._print(f'--- {input_file}')
+
+            stdin = open(input_file, 'rb') if input_file != None else subprocess.DEVNULL
+            try:
+                result = subprocess.run([os.path.abspath(self.executable)], stdin=stdin, stdout=subprocess.PIPE)
+            finally:
+                if input_file != None:
+                    stdin.close()
+
+            self.out.write(result.stdout.decode('utf-8', 'replace'))
+            self.out.flush()
+
+    def watch(self, interval=POLL_INTERVAL):
+        ''' Builds the program, then rebuilds it on every change until interrupted '''
+        version = self._version()
+
+        if self.build() and self.run:
+            self.run_program()
+
+        self._print(f'watching {self.path}')
+
+        try:
+            while True:
+                time.sleep(interval)
+
+                current = self._version()
+                if current == None or current == version:
+                    continue
+
+                version = current
+                if self.build() and self.run:
+                    self.run_program()
+        except KeyboardInterrupt:
+            pass
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def watch(path, executable, interval=POLL_INTERVAL, **options):
+    ''' Runs a Watcher on the program until interrupted (see Watcher for the options) '''
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    Watcher(path, executable, **options).watch(interval)
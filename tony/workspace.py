@@ -0,0 +1,49 @@
+'''
+    What lets many compilations run at the same time, in threads or in
+    processes, in the same directory.
+
+    Every compilation keeps its intermediate files (assembly, objects) in
+    a private temporary workspace, and its executable is moved to its
+    final name in one step, so two compilations never see each other's
+    files and a concurrent reader never sees a half-written executable.
+
+    The LLVM types of the code generation and the timer of the phases are
+    global to the process, so the front end (parsing, sem, codegen and
+    optimization) of one compilation runs at a time in a process, under
+    frontend_lock. Emission and linking run outside of it. Parsing alone
+    needs no lock, with a lexer and a parser of new_lexer() and
+    new_parser() per thread.
+'''
+
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+frontend_lock = threading.RLock()
+
+@contextmanager
+def workspace():
+    ''' A private temporary directory for the files of one compilation '''
+    with tempfile.TemporaryDirectory(prefix='tonyc-') as path:
+        yield path
+
+def install_executable(path, executable):
+    '''
+        Moves the executable at path to its final name atomically: it is
+        first moved next to it (copied, with its mode, if it is on another
+        file system) and then renamed over it
+    '''
+    directory = os.path.dirname(os.path.abspath(executable))
+
+    fd, tmp = tempfile.mkstemp(prefix='.tonyc-', dir=directory)
+    os.close(fd)
+
+    try:
+        shutil.move(path, tmp)
+        os.replace(tmp, executable)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
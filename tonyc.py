@@ -1,109 +1,335 @@
 #!/usr/bin/env python3
 
 import os
+import json
+import time
+import shutil
 import argparse
+import subprocess
 from tony import *
 
-BUILTINS_LIB = 'libbuiltins.so'
 
-
-def readFile(file):
-    with open(file, 'r', encoding = 'unicode_escape') as f:
+def readFile(file, encoding='unicode_escape'):
+    with open(file, 'r', encoding = encoding) as f:
         s = f.read()
     return s
 
+def ignored(option, value, conflicts):
+    '''
+        Returns None, with a warning, if any of the conflicts (option ->
+        whether it is given) rules out the option, or else its value
+    '''
+    given = [name for name, on in conflicts.items() if on]
+    if given == []:
+        return value
+
+    print(f'warning: {option} is ignored with {", ".join(given)}', file=sys.stderr)
+    return None
+
 def compile(file,
             llvm_to_stdout=False,
             as_to_stdout=False,
             print_ast=False,
+            emit_bc=False,
             show_commands=True,
             optimization=1,
             exec_name=None,
-            testing=False):
-
-    if BUILTINS_LIB not in os.listdir():
-        cmd_make_builtins = '$(make) builtins'
-        os.system(cmd_make_builtins)
-
-        if show_commands: print(cmd_make_builtins)
+            testing=False,
+            in_process=False,
+            save_temps=False,
+            cache=None,
+            run=False,
+            opt_report=None,
+            incremental=None,
+            jobs=1,
+            passes=None,
+            pgo_gen=None,
+            pgo_use=None):
 
     if exec_name != None:
         testing = True
         # we use the testing mode to clear the intermediate files
 
     ''' Reading the code '''
+    # the cache, incremental compilation and PGO need the whole source,
+    # otherwise it is read in pieces as the lexer goes
+    whole_source = cache != None or incremental != None or pgo_gen != None or pgo_use != None
+
     if file == None:
         testing = True
-        sys.stdin.reconfigure(encoding='unicode_escape')
-        code = sys.stdin.read()
+        if whole_source:
+            sys.stdin.reconfigure(encoding='unicode_escape')
+            code = sys.stdin.read()
+        else:
+            code = read_source()
     else:
         file_prefix = file.split('.')[0]
-        code = readFile(file)
-
-    ''' Lexing & Parsing '''
-    try:
-        ast = parser.parse(code)
+        code = readFile(file) if whole_source else read_source(file)
 
-    except Exception as e:
-        print(e)
-        exit()
+    executable = 'a.out' if testing else f'{file_prefix}.out'
+    if exec_name != None:
+        executable = exec_name
 
-    ''' Printing the Abstract Syntax Tree '''
-    if print_ast:
-        print(ast)
+    temps_prefix = 'a' if testing else file_prefix
+
+    ''' Looking up the compilation cache '''
+    profile = pgo_gen != None or pgo_use != None
+    if pgo_use != None:
+        # the assembly of llc has .cg_profile directives, which gas does not know
+        in_process = True
+
+    if incremental != None:
+        # there is no single module to print, write, run, report on or profile
+        incremental = ignored('--incremental', incremental, {
+            '-i': llvm_to_stdout, '-f': as_to_stdout, '--emit-bc': emit_bc, '--run': run,
+            '--opt-report': opt_report != None, '--pgo-gen': pgo_gen != None, '--pgo-use': pgo_use != None,
+        })
+
+    if incremental != None:
+        cache = None # the directory of --cache holds the functions of --incremental
+    elif cache != None:
+        cache = ignored('--cache', cache, {
+            '-f': as_to_stdout, '--ast': print_ast, '--emit-bc': emit_bc, '--run': run,
+            '--opt-report': opt_report != None, '--pgo-gen': pgo_gen != None, '--pgo-use': pgo_use != None,
+        })
+
+    if cache != None:
+        in_process = True # the cache stores the object code emitted in process
+        pipeline = ','.join(passes) if passes != None else ''
+        cache_key = cache.key(code, optimization, [target_description(), pipeline])
+
+        # another process may evict the entry before it is read, and then
+        # the program is compiled as if it had not been cached
+        if llvm_to_stdout:
+            cached_ir = cache.lookup(cache_key, 'ir')
+            if cached_ir != None:
+                try:
+                    cached_ir = readFile(cached_ir, encoding=None)
+                except OSError:
+                    cached_ir = None
+
+            if cached_ir != None:
+                print(cached_ir)
+                exit()
+        else:
+            cached_exe = cache.lookup(cache_key, 'executable')
+            if cached_exe != None:
+                with workspace() as path:
+                    try:
+                        shutil.copy2(cached_exe, os.path.join(path, 'a.out'))
+                    except OSError:
+                        cached_exe = None
+                    else:
+                        install_executable(os.path.join(path, 'a.out'), executable)
+
+                if cached_exe != None:
+                    return
+
+    # LLVM is shared by the whole process, so only one thread at a time
+    # gets from the source to the object code or the bitcode for llc.
+    # llc and gcc run outside of the lock.
+    with frontend_lock:
+
+        ''' Lexing & Parsing '''
+        try:
+            ast = parse_timed(new_parser(), code, new_lexer())
+
+        except Exception as e:
+            print(e)
+            exit()
+
+        ''' Printing the Abstract Syntax Tree '''
+        if print_ast:
+            print(ast)
+            exit()
+
+        ''' Semantic analysis '''
+        try:
+            with phase('sem'):
+                ast.sem(SymbolTable())
+
+        except Exception as e:
+            print(e)
+            exit()
+
+        ''' Incremental compilation, reusing the unchanged functions '''
+        if incremental != None:
+            objects, hits, misses = compile_incremental(ast, incremental, optimization, passes)
+            if show_commands: print(f'{hits} functions reused, {misses} compiled')
+
+        else:
+            ''' LLVM IR Code Generation '''
+            llvm_module = ast.codegen(opt_level=optimization, opt_report=opt_report != None, jobs=jobs,
+                                      passes=passes, pgo_gen=pgo_gen, pgo_use=pgo_use)
+
+            if ast.parallel_stats != None:
+                print_parallel_stats('function passes', ast.parallel_stats)
+
+            if opt_report != None:
+                with open(opt_report, 'w') as f:
+                    json.dump(ast.optimization_report, f, indent=2)
+
+            if llvm_to_stdout:
+                if cache != None:
+                    llvm_ir = str(llvm_module)
+                    cache.store(cache_key, ir=llvm_ir)
+                    print(llvm_ir)
+                else:
+                    write_ir(llvm_module, '-')
+                exit()
+
+            if emit_bc:
+                write_bitcode(llvm_module, exec_name if exec_name != None else f'{temps_prefix}.bc')
+                return
+
+            if run:
+                with phase('run'):
+                    run_jit(llvm_module)
+                return
+
+            if in_process or jobs > 1:
+                objects = emit_in_process(llvm_module,
+                    file_prefix = temps_prefix,
+                    as_to_stdout = as_to_stdout,
+                    save_temps = save_temps,
+                    jobs = jobs)
+            else:
+                objects = None
+                bitcode = llvm_module.as_bitcode()
+
+                if save_temps:
+                    write_ir(llvm_module, f'{temps_prefix}.ll')
+
+    ''' Linking the object code emitted in process '''
+    if objects != None:
+        with phase('gcc'):
+            linked = link_objects(objects, executable, show_commands)
+
+        if not linked:
+            print(f'Linking {executable} failed')
+            return
+
+        if cache != None:
+            cache.store(cache_key,
+                object_code = objects[0] if len(objects) == 1 else None,
+                executable = executable)
+        return
+
+    ''' Compiling to Assembly with llc, which reads the module as bitcode '''
+    with workspace() as path:
+        as_output = os.path.join(path, 'a.s')
+
+        cmd_llc = ['llc', '-', '--relocation-model=pic', '-o', as_output]
+
+        cpu, features = target_cpu()
+        if cpu != '':
+            cmd_llc.append(f'-mcpu={cpu}')
+        if features != '':
+            cmd_llc.append(f'-mattr={features}')
+        with phase('llc'):
+            subprocess.run(cmd_llc, input=bitcode)
+        if show_commands: print(' '.join(cmd_llc))
+
+        if as_to_stdout:
+            with open(as_output, 'r') as f:
+                print(f.read())
+            exit()
+
+        if save_temps:
+            shutil.copyfile(as_output, f'{temps_prefix}.s')
+
+        ''' Making the final executable, in the workspace first '''
+        output = os.path.join(path, 'a.out')
+
+        cmd_gcc = ['gcc', as_output, '-o', output]
+        with phase('gcc'):
+            linked = subprocess.run(cmd_gcc).returncode == 0
+        if show_commands: print(' '.join(cmd_gcc[:-1] + [executable]))
+
+        if linked:
+            install_executable(output, executable)
+        else:
+            print(f'Linking {executable} failed')
+
+def emit_in_process(llvm_module,
+                    file_prefix='a',
+                    as_to_stdout=False,
+                    save_temps=False,
+                    jobs=1):
+    '''
+        Emits the object code of the module through a cached LLVM
+        TargetMachine, without calling llc or writing the IR and the
+        assembly to disk. Only linking runs gcc, which is left to the
+        caller (see link_objects).
+
+        With more than one job, the module is split into partitions
+        that are emitted in parallel (see parallel.py).
+
+        The .ll and .s files are written only if save_temps is set.
+        Returns the object codes.
+    '''
+    if as_to_stdout:
+        print(emit_assembly(llvm_module))
         exit()
 
-    ''' Semantic analysis '''
-    try:
-        ast.sem(SymbolTable())
+    if save_temps:
+        write_ir(llvm_module, f'{file_prefix}.ll')
 
-    except Exception as e:
-        print(e)
-        exit()
-
-    ''' LLVM IR Code Generation '''
-    llvm_ir = str(ast.codegen(opt_level=optimization))
+        with open(f'{file_prefix}.s', 'w') as f:
+            print(emit_assembly(llvm_module), file=f)
 
-    if llvm_to_stdout:
-        print(llvm_ir)
-        exit()
+    if jobs > 1:
+        with phase('emit', jobs=jobs):
+            objects, stats = parallel_emit(llvm_module, jobs)
+        print_parallel_stats('code generation', stats)
     else:
-        llvm_output = 'a.ll' if testing else f'{file_prefix}.ll'
-
-        with open(llvm_output, 'w') as f:
-            print(llvm_ir, file=f)
-
-    ''' Compiling to Assembly '''
-    as_output = 'a.s' if testing else f'{file_prefix}.s'
-
-    cmd_llc = f'llc {llvm_output} --relocation-model=pic -o {as_output}'
-    os.system(cmd_llc)
-    if show_commands: print(cmd_llc)
-
-    if as_to_stdout:
-        with open(as_output, 'r') as f:
-            print(f.read())
-
-        os.remove(as_output)
-        os.remove(llvm_output)
-        exit()
-
+        with phase('emit'):
+            objects = [emit_object(llvm_module)]
+
+    return objects
+
+def print_parallel_stats(step, stats):
+    print(f'{step}: {stats["functions"]} functions in {stats["partitions"]} partitions '
+          f'on {stats["jobs"]} jobs, {stats["cpu_seconds"]:.2f} s of work in '
+          f'{stats["wall_seconds"]:.2f} s (CPU utilization {stats["cpu_utilization"]})', file=sys.stderr)
+
+def compile_remote(socket_path,
+                   file,
+                   llvm_to_stdout=False,
+                   as_to_stdout=False,
+                   print_ast=False,
+                   optimization=1,
+                   exec_name=None):
+    '''
+        Sends the program to a running compile server (tonyc.py --serve)
+        and prints the result, instead of compiling in this process.
+    '''
+    if file == None:
+        sys.stdin.reconfigure(encoding='unicode_escape')
+        code = sys.stdin.read()
+        executable = 'a.out'
+    else:
+        code = readFile(file)
+        executable = f"{file.split('.')[0]}.out"
 
-    ''' Making the final executable '''
-    executable = 'a.out' if testing else f'{file_prefix}.out'
     if exec_name != None:
         executable = exec_name
 
-    cmd_gcc = f'gcc {as_output} -L . -Wl,-rpath={os.getcwd()} -lbuiltins -o {executable}'
-    os.system(cmd_gcc)
-    if show_commands: print(cmd_gcc)
+    mode = 'exe'
+    if llvm_to_stdout: mode = 'ir'
+    if as_to_stdout:   mode = 'asm'
+    if print_ast:      mode = 'ast'
+
+    response = send_request(socket_path, code,
+        mode = mode,
+        optimization = optimization,
+        output = os.path.abspath(executable))
 
-    ''' Clean files if running tests '''
-    if testing:
-        os.remove(as_output)
-        os.remove(llvm_output)
+    for d in response['diagnostics']:
+        print(d)
 
-    return
+    if response['ok'] and mode != 'exe':
+        print(response[mode])
 
 
 if __name__ == '__main__':
@@ -113,9 +339,34 @@ if __name__ == '__main__':
     argparser.add_argument('-i', action='store_true')
     argparser.add_argument('-O2', action='store_true')
     argparser.add_argument('-O3', action='store_true')
+    argparser.add_argument('-Os', action='store_true')
+    argparser.add_argument('-Oz', action='store_true')
+    argparser.add_argument('-march', type=str, metavar='CPU')
+    argparser.add_argument('-mcpu', type=str, metavar='CPU')
+    argparser.add_argument('--passes', type=str, metavar='PASS,...')
+    argparser.add_argument('--pgo-gen', type=str, metavar='PROFILE', nargs='?', const=DEFAULT_PROFILE)
+    argparser.add_argument('--pgo-use', type=str, metavar='PROFILE')
     argparser.add_argument('--commands', action='store_true')
     argparser.add_argument('--ast', action='store_true')
+    argparser.add_argument('--emit-bc', action='store_true')
     argparser.add_argument('-o', type=str)
+    argparser.add_argument('--in-process', action='store_true')
+    argparser.add_argument('--save-temps', action='store_true')
+    argparser.add_argument('--serve', type=str, metavar='SOCKET')
+    argparser.add_argument('--connect', type=str, metavar='SOCKET')
+    argparser.add_argument('--cache', type=str, metavar='DIR', nargs='?', const=DEFAULT_CACHE_DIR)
+    argparser.add_argument('--cache-size', type=int, metavar='MB')
+    argparser.add_argument('--cache-stats', action='store_true')
+    argparser.add_argument('--batch', type=str, nargs='+', metavar='DIR|FILE')
+    argparser.add_argument('--run', action='store_true')
+    argparser.add_argument('-j', type=int, metavar='N')
+    argparser.add_argument('--time-phases', action='store_true')
+    argparser.add_argument('--trace', type=str, metavar='FILE')
+    argparser.add_argument('--opt-report', type=str, metavar='FILE')
+    argparser.add_argument('--mem-report', type=str, metavar='FILE')
+    argparser.add_argument('--incremental', action='store_true')
+    argparser.add_argument('--watch', action='store_true')
+    argparser.add_argument('--input', type=str, metavar='FILE', action='append')
 
 
     args = argparser.parse_args()
@@ -125,6 +376,22 @@ if __name__ == '__main__':
         optimization = 2
     if args.O3:
         optimization = 3
+    if args.Os:
+        optimization = 's'
+    if args.Oz:
+        optimization = 'z'
+
+    # -mcpu wins over -march, like in clang for x86
+    if args.march or args.mcpu:
+        set_target_cpu(args.mcpu or args.march)
+
+    passes = None
+    if args.passes != None:
+        try:
+            passes = parse_pass_list(args.passes)
+        except Exception as e:
+            print(e)
+            exit()
 
     if args.f or args.i or args.ast:
         file = None
@@ -137,11 +404,106 @@ if __name__ == '__main__':
 
     exec_name = args.o if args.o else None
 
-    compile(
-        file,
-        show_commands=args.commands,
-        llvm_to_stdout=args.i,
-        as_to_stdout=args.f,
-        print_ast=args.ast,
-        exec_name=exec_name,
-        optimization=optimization)
+    cache_size = DEFAULT_CACHE_SIZE if args.cache_size == None else args.cache_size * 1024 * 1024
+
+    cache = None
+    if args.cache or args.cache_stats:
+        cache = CompilationCache(args.cache or DEFAULT_CACHE_DIR, max_size=cache_size)
+
+    incremental = None
+    if args.incremental or args.cache_stats:
+        incremental = FunctionCache(os.path.join(args.cache or DEFAULT_CACHE_DIR, 'functions'), max_size=cache_size)
+
+    if args.cache_stats:
+        for k, v in cache.stats().items():
+            print(f'{k}: {v}')
+        for k, v in incremental.stats().items():
+            print(f'functions {k}: {v}')
+        exit()
+
+    if args.batch:
+        sources = collect_sources(args.batch)
+
+        start = time.perf_counter()
+        try:
+            results = compile_batch(sources,
+                jobs=args.j or os.cpu_count(),
+                optimization=optimization,
+                output_dir=exec_name)
+        except Exception as e:
+            print(e)
+            exit(1)
+
+        print_batch_summary(results, time.perf_counter() - start, args.j or os.cpu_count())
+        exit(0 if all(r[1] for r in results) else 1)
+
+    if args.serve:
+        serve(args.serve)
+        exit()
+
+    if args.watch:
+        if not file:
+            print('Please specify the program to watch')
+            exit()
+
+        watch(file, exec_name or f"{file.split('.')[0]}.out",
+            optimization=optimization,
+            passes=passes,
+            run=args.run,
+            inputs=args.input,
+            cache=FunctionCache(os.path.join(args.cache, 'functions'), max_size=cache_size) if args.cache else None)
+        exit()
+
+    if args.connect:
+        compile_remote(
+            args.connect,
+            file,
+            llvm_to_stdout=args.i,
+            as_to_stdout=args.f,
+            print_ast=args.ast,
+            optimization=optimization,
+            exec_name=exec_name)
+        exit()
+
+    timing = args.time_phases or args.trace != None
+    if timing:
+        start_timing()
+
+    if args.mem_report:
+        start_memory_profile()
+
+    try:
+        compile(
+            file,
+            show_commands=args.commands,
+            llvm_to_stdout=args.i,
+            as_to_stdout=args.f,
+            print_ast=args.ast,
+            emit_bc=args.emit_bc,
+            exec_name=exec_name,
+            optimization=optimization,
+            in_process=args.in_process,
+            save_temps=args.save_temps,
+            cache=cache,
+            run=args.run,
+            opt_report=args.opt_report,
+            incremental=incremental if args.incremental else None,
+            jobs=args.j or 1,
+            passes=passes,
+            pgo_gen=args.pgo_gen,
+            pgo_use=args.pgo_use)
+    finally:
+        # compile() may have called exit()
+        if timing:
+            timer = stop_timing()
+
+            if args.time_phases:
+                print(timer.report(), file=sys.stderr)
+
+            if args.trace:
+                timer.write_trace(args.trace)
+
+        if args.mem_report:
+            profiler = stop_memory_profile()
+            print(profiler.report(), file=sys.stderr)
+            profiler.write_summary(args.mem_report)